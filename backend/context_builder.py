@@ -0,0 +1,151 @@
+import math
+from datetime import timezone
+
+
+def _epoch_seconds(timestamp):
+    # Accept Neo4j DateTime, aware or naive (UTC) datetimes, or missing values
+    if timestamp is None:
+        return None
+    if hasattr(timestamp, "to_native"):
+        timestamp = timestamp.to_native()
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+class ContextBuilder:
+    """Builds a compact, size-bounded text context for a transaction.
+
+    Related activity is summarised statistically (amount histogram, merchant
+    category mix, velocity) and only the ``top_n`` most relevant related
+    transactions are listed. The output never exceeds ``max_chars`` and is a
+    pure function of its input, so it can be used as a cache key.
+    """
+
+    AMOUNT_BINS = (0.0, 50.0, 200.0, 1000.0, 5000.0, 10000.0, math.inf)
+    VELOCITY_WINDOWS = (("1h", 3600), ("24h", 86400), ("7d", 7 * 86400))
+
+    def __init__(self, max_chars=1200, top_n=5, max_categories=6):
+        self.max_chars = max_chars
+        self.top_n = top_n
+        self.max_categories = max_categories
+
+    @staticmethod
+    def _amount(value):
+        return f"{float(value or 0.0):.2f}"
+
+    @staticmethod
+    def _bin_label(low, high):
+        if high == math.inf:
+            return f">={low:g}"
+        return f"{low:g}-{high:g}"
+
+    def _amount_histogram(self, amounts):
+        counts = [0] * (len(self.AMOUNT_BINS) - 1)
+        for amount in amounts:
+            for i in range(len(counts)):
+                if self.AMOUNT_BINS[i] <= amount < self.AMOUNT_BINS[i + 1]:
+                    counts[i] += 1
+                    break
+        return " ".join(
+            f"{self._bin_label(self.AMOUNT_BINS[i], self.AMOUNT_BINS[i + 1])}:{count}"
+            for i, count in enumerate(counts)
+        )
+
+    def _category_mix(self, related):
+        counts = {}
+        for tx in related:
+            category = tx.get("merchant_category") or "unknown"
+            counts[category] = counts.get(category, 0) + 1
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return " ".join(f"{category}:{count}" for category, count in ranked[:self.max_categories])
+
+    def _velocity(self, related, reference_time):
+        if reference_time is None:
+            return "n/a"
+        parts = []
+        for label, window in self.VELOCITY_WINDOWS:
+            count = sum(
+                1 for tx in related
+                if tx["_ts"] is not None and 0 <= reference_time - tx["_ts"] <= window
+            )
+            parts.append(f"{label}:{count}")
+        return " ".join(parts)
+
+    def _rank_related(self, related, amount, reference_time):
+        # Most relevant first: known fraud, then similar amount, then most recent
+        target = math.log1p(max(amount, 0.0))
+
+        def relevance(tx):
+            age = reference_time - tx["_ts"] if reference_time is not None and tx["_ts"] is not None else math.inf
+            return (
+                0 if tx.get("is_fraudulent") else 1,
+                round(abs(math.log1p(max(float(tx.get("amount") or 0.0), 0.0)) - target), 6),
+                abs(age),
+                str(tx.get("id"))
+            )
+
+        return sorted(related, key=relevance)[:self.top_n]
+
+    def build(self, graph_data):
+        transaction = graph_data.get("transaction") or {}
+        customer = graph_data.get("customer") or {}
+        merchant = graph_data.get("merchant") or {}
+        customer_features = graph_data.get("customer_features")
+        related = [
+            dict(tx, _ts=_epoch_seconds(tx.get("timestamp")))
+            for tx in graph_data.get("related_transactions") or []
+        ]
+
+        amount = float(transaction.get("amount") or 0.0)
+        reference_time = _epoch_seconds(transaction.get("timestamp"))
+        hour = (int(reference_time // 3600) % 24) if reference_time is not None else "n/a"
+        amounts = [float(tx.get("amount") or 0.0) for tx in related]
+
+        lines = [
+            f"transaction id={transaction.get('id')} amount={self._amount(amount)} "
+            f"hour={hour} status={transaction.get('status')}",
+            f"customer id={customer.get('id')} risk={float(customer.get('risk_score') or 0.0):.2f}",
+            f"merchant id={merchant.get('id')} category={merchant.get('category')} "
+            f"risk={float(merchant.get('risk_score') or 0.0):.2f}",
+        ]
+        if customer_features:
+            lines.append(
+                f"customer_history count={customer_features['count']} "
+                f"mean={self._amount(customer_features['mean'])} "
+                f"max={self._amount(customer_features['max_amount'])}"
+            )
+        lines.append(
+            f"related count={graph_data.get('related_count', len(related))} sampled={len(related)} "
+            f"fraudulent={sum(1 for tx in related if tx.get('is_fraudulent'))}"
+        )
+        if related:
+            lines.extend([
+                f"related_amounts mean={self._amount(sum(amounts) / len(amounts))} "
+                f"max={self._amount(max(amounts))}",
+                f"amount_histogram {self._amount_histogram(amounts)}",
+                f"category_mix {self._category_mix(related)}",
+                f"velocity {self._velocity(related, reference_time)}",
+                "top_related:",
+            ])
+            for tx in self._rank_related(related, amount, reference_time):
+                age = (
+                    f"{(reference_time - tx['_ts']) / 3600:.1f}h"
+                    if reference_time is not None and tx["_ts"] is not None else "n/a"
+                )
+                lines.append(
+                    f"- id={tx.get('id')} amount={self._amount(tx.get('amount'))} age={age} "
+                    f"category={tx.get('merchant_category') or 'unknown'} "
+                    f"fraudulent={'yes' if tx.get('is_fraudulent') else 'no'}"
+                )
+
+        # Keep whole lines while they fit; the least important lines come last
+        context = ""
+        for line in lines:
+            candidate = f"{context}\n{line}" if context else line
+            if len(candidate) > self.max_chars:
+                if not context:
+                    context = candidate[:self.max_chars]
+                break
+            context = candidate
+        return context
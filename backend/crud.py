@@ -0,0 +1,63 @@
+import logging
+from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+logger = logging.getLogger(__name__)
+
+# Callables invoked with each newly inserted Transaction row, e.g. to keep
+# derived state such as the feature store in step with writes
+transaction_listeners = []
+
+def register_transaction_listener(listener):
+    transaction_listeners.append(listener)
+
+def get_transaction(db: Session, transaction_id: int):
+    return db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+
+def get_transactions(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(models.Transaction).offset(skip).limit(limit).all()
+
+def get_transactions_by_ids(db: Session, transaction_ids):
+    return db.query(models.Transaction).filter(models.Transaction.id.in_(transaction_ids)).all()
+
+def create_transaction(db: Session, transaction: schemas.TransactionCreate, invalidate_scores=False):
+    db_transaction = models.Transaction(**transaction.model_dump(), timestamp=datetime.utcnow())
+    db.add(db_transaction)
+    if invalidate_scores:
+        # Same commit as the insert, so no reader sees the new row next to a stale persisted score
+        invalidate_fraud_scores(db, db_transaction.customer_id, db_transaction.merchant_id)
+    db.commit()
+    db.refresh(db_transaction)
+
+    for listener in transaction_listeners:
+        # The row is already committed; a failing listener must not turn the create into an error
+        try:
+            listener(db_transaction)
+        except Exception:
+            logger.exception(f"Transaction listener {getattr(listener, '__qualname__', listener)} failed")
+    return db_transaction
+
+def update_fraud_scores(db: Session, fraud_scores):
+    # fraud_scores maps transaction id -> score; ids with a None score are skipped
+    scored_at = datetime.utcnow()
+    mappings = [
+        {"id": transaction_id, "fraud_score": fraud_score, "fraud_scored_at": scored_at}
+        for transaction_id, fraud_score in fraud_scores.items()
+        if fraud_score is not None
+    ]
+    if mappings:
+        db.bulk_update_mappings(models.Transaction, mappings)
+        db.commit()
+
+def invalidate_fraud_scores(db: Session, customer_id, merchant_id):
+    # A write changes the neighbourhood every score of this customer or merchant was computed from
+    db.query(models.Transaction).filter(
+        or_(models.Transaction.customer_id == customer_id, models.Transaction.merchant_id == merchant_id),
+        or_(models.Transaction.fraud_scored_at.isnot(None), models.Transaction.gnn_scored_at.isnot(None))
+    ).update(
+        {models.Transaction.fraud_scored_at: None, models.Transaction.gnn_scored_at: None},
+        synchronize_session=False
+    )
@@ -0,0 +1,195 @@
+import threading
+from contextlib import contextmanager
+from datetime import timezone
+from sqlalchemy import text
+
+
+def _naive_utc(timestamp):
+    # Postgres rows are naive UTC while Neo4j returns zoned datetimes; compare as naive UTC
+    if hasattr(timestamp, "to_native"):
+        timestamp = timestamp.to_native()
+    if getattr(timestamp, "tzinfo", None) is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+class EntityFeatures:
+    """Running aggregates over one customer's or merchant's transactions."""
+
+    __slots__ = ("count", "total", "max_amount", "last_seen")
+
+    def __init__(self, count=0, total=0.0, max_amount=None, last_seen=None):
+        self.count = count
+        self.total = total
+        self.max_amount = max_amount
+        self.last_seen = last_seen
+
+    def update(self, amount, timestamp):
+        amount = float(amount or 0.0)
+        timestamp = _naive_utc(timestamp)
+        self.count += 1
+        self.total += amount
+        self.max_amount = amount if self.max_amount is None else max(self.max_amount, amount)
+        if timestamp is not None and (self.last_seen is None or timestamp > self.last_seen):
+            self.last_seen = timestamp
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max_amount": self.max_amount or 0.0,
+            "last_seen": self.last_seen
+        }
+
+
+class FeatureStore:
+    """In-memory per-customer and per-merchant transaction aggregates.
+
+    Lookups are O(1) dict reads. The store is kept current incrementally via
+    ``on_transaction_created`` and can be rebuilt in bulk from either store.
+    Writes recorded while a rebuild is reading the source are buffered and
+    replayed into the rebuilt tables before they are swapped in, so they are
+    not lost with the old tables.
+    """
+
+    def __init__(self):
+        self._customers = {}
+        self._merchants = {}
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        # Writes made during a rebuild, as (transaction_id, customer_id, merchant_id, amount, timestamp)
+        self._pending = None
+        self.ready = False
+
+    @staticmethod
+    def _apply(customers, merchants, customer_id, merchant_id, amount, timestamp):
+        if customer_id is not None:
+            customers.setdefault(customer_id, EntityFeatures()).update(amount, timestamp)
+        if merchant_id is not None:
+            merchants.setdefault(merchant_id, EntityFeatures()).update(amount, timestamp)
+
+    def record_transaction(self, customer_id, merchant_id, amount, timestamp, transaction_id=None):
+        with self._lock:
+            self._apply(self._customers, self._merchants, customer_id, merchant_id, amount, timestamp)
+            if self._pending is not None:
+                self._pending.append((transaction_id, customer_id, merchant_id, amount, timestamp))
+
+    def on_transaction_created(self, transaction):
+        self.record_transaction(
+            transaction.customer_id,
+            transaction.merchant_id,
+            transaction.amount,
+            transaction.timestamp,
+            transaction_id=transaction.id
+        )
+
+    def get_customer(self, customer_id):
+        features = self._customers.get(customer_id)
+        return features.to_dict() if features is not None else None
+
+    def get_merchant(self, merchant_id):
+        features = self._merchants.get(merchant_id)
+        return features.to_dict() if features is not None else None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "customers": len(self._customers),
+            "merchants": len(self._merchants)
+        }
+
+    @contextmanager
+    def _rebuilding(self):
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def _replace(self, customers, merchants, counted=None):
+        """Swap in freshly built tables after replaying the writes buffered during the rebuild.
+
+        ``counted(transaction_ids)`` returns the ids the rebuild already
+        aggregated, so a write that landed just before the source was read is
+        not counted twice.
+        """
+        # counted() is a database round-trip, so it runs outside the lock that request-path
+        # writes take; writes buffered meanwhile are checked on the next pass
+        already_counted, checked = set(), 0
+        while True:
+            with self._lock:
+                pending = self._pending or []
+                if len(pending) == checked:
+                    # One step under the lock, so readers never see a partial rebuild and no write slips between
+                    for transaction_id, *write in pending:
+                        if transaction_id is None or transaction_id not in already_counted:
+                            self._apply(customers, merchants, *write)
+                    self._pending = None
+                    self._customers = customers
+                    self._merchants = merchants
+                    self.ready = True
+                    return
+                unchecked = pending[checked:]
+                checked = len(pending)
+            ids = [write[0] for write in unchecked if write[0] is not None]
+            if counted is not None and ids:
+                already_counted |= counted(ids)
+
+    def rebuild_from_postgres(self, engine):
+        """Rebuild all aggregates with one GROUP BY per entity type."""
+        tables = {}
+        with self._rebuilding(), engine.connect() as conn:
+            # One snapshot for both aggregates and the check of which buffered writes they saw
+            conn.execution_options(isolation_level="REPEATABLE READ")
+            for column in ("customer_id", "merchant_id"):
+                rows = conn.execute(text(f"""
+                    SELECT {column}, COUNT(*), COALESCE(SUM(amount), 0), MAX(amount), MAX(timestamp)
+                    FROM transactions
+                    WHERE {column} IS NOT NULL
+                    GROUP BY {column}
+                """))
+                tables[column] = {
+                    row[0]: EntityFeatures(row[1], float(row[2]), row[3], _naive_utc(row[4]))
+                    for row in rows
+                }
+
+            def counted(ids):
+                rows = conn.execute(text("SELECT id FROM transactions WHERE id = ANY(:ids)"), {"ids": ids})
+                return {row[0] for row in rows}
+
+            self._replace(tables["customer_id"], tables["merchant_id"], counted)
+
+    def rebuild_from_neo4j(self, driver):
+        """Rebuild all aggregates from the MADE and WITH relationships.
+
+        Transactions created through the API are only written to Postgres, so
+        every write buffered during the rebuild is replayed.
+        """
+        queries = {
+            "customers": """
+            MATCH (c:Customer)-[:MADE]->(t:Transaction)
+            RETURN c.id AS id, count(t) AS count, sum(t.amount) AS total,
+                   max(t.amount) AS max_amount, max(t.timestamp) AS last_seen
+            """,
+            "merchants": """
+            MATCH (t:Transaction)-[:WITH]->(m:Merchant)
+            RETURN m.id AS id, count(t) AS count, sum(t.amount) AS total,
+                   max(t.amount) AS max_amount, max(t.timestamp) AS last_seen
+            """
+        }
+        tables = {}
+        with self._rebuilding(), driver.session() as session:
+            for name, query in queries.items():
+                tables[name] = {}
+                for record in session.run(query):
+                    tables[name][record["id"]] = EntityFeatures(
+                        record["count"],
+                        float(record["total"] or 0.0),
+                        record["max_amount"],
+                        _naive_utc(record["last_seen"])
+                    )
+            self._replace(tables["customers"], tables["merchants"])
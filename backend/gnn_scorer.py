@@ -0,0 +1,327 @@
+import logging
+import threading
+import time
+from datetime import timezone
+import numpy as np
+import pandas as pd
+
+from .graph_builder import customer_features, merchant_features, normalize_features, transaction_features
+
+logger = logging.getLogger(__name__)
+
+# Every transaction has exactly one customer and one merchant, plus its GCN self-loop
+TRANSACTION_DEGREE = 3.0
+
+
+def _epoch_seconds(timestamp):
+    # Postgres rows are naive UTC; missing timestamps score as "now"
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if hasattr(timestamp, "to_native"):
+        timestamp = timestamp.to_native()
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _aggregate(values, src, dst, num_rows):
+    # Row-wise sum of values[src] into dst, one bincount per column
+    return np.stack(
+        [np.bincount(dst, weights=values[src, j], minlength=num_rows) for j in range(values.shape[1])],
+        axis=1
+    ).astype(np.float32) if values.shape[1] else np.zeros((num_rows, 0), dtype=np.float32)
+
+
+def build_scorer_state(weights, x, edge_index, entity_ids, entity_nodes, transaction_ids, feature_stats):
+    """Precompute the per-entity layer-1 state the online scorer needs.
+
+    For every customer and merchant node v this stores ``W1 x_v`` (its own
+    projection), its GCN degree ``d_v`` (neighbours + self-loop) and
+    ``S_v = sum_u W1 x_u / sqrt(d_u)`` over its transaction neighbours.
+    The layer-1 embedding is then ``relu((S_v + W1 x_v / sqrt(d_v)) / sqrt(d_v) + b1)``
+    and both S_v and d_v update in O(hidden) when an edge arrives.
+
+    ``entity_ids``/``entity_nodes`` map ``customer``/``merchant`` to id arrays
+    and their global node indices. Raw features are aggregated before the
+    projection since they are much narrower than the hidden layer.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    src, dst = np.asarray(edge_index[0]), np.asarray(edge_index[1])
+    num_nodes = x.shape[0]
+    degree = np.bincount(dst, minlength=num_nodes).astype(np.float32) + 1.0
+    w1 = weights["conv1_weight"]
+
+    state = {"weights": weights, "feature_stats": feature_stats, "transaction_ids": np.asarray(transaction_ids)}
+    scaled = x / np.sqrt(degree)[:, None]
+    for entity in ("customer", "merchant"):
+        nodes = np.asarray(entity_nodes[entity], dtype=np.int64)
+        # Restrict to edges landing on this entity type, relabelled to entity rows
+        row_of_node = np.full(num_nodes, -1, dtype=np.int64)
+        row_of_node[nodes] = np.arange(len(nodes))
+        edge_rows = row_of_node[dst]
+        mask = edge_rows >= 0
+        aggregated = _aggregate(scaled, src[mask], edge_rows[mask], len(nodes))
+        state[entity] = {
+            "ids": np.asarray(entity_ids[entity]),
+            "projection": x[nodes] @ w1.T,
+            "neighbour_sum": aggregated @ w1.T,
+            "degree": degree[nodes],
+        }
+    return state
+
+
+class _EntityTable:
+    """Growable per-entity arrays keyed by id."""
+
+    def __init__(self, ids, projection, neighbour_sum, degree):
+        self.index = {key: row for row, key in enumerate(pd.Index(ids).astype(str))}
+        self.size = len(self.index)
+        capacity = max(self.size * 2, 1024)
+        hidden = projection.shape[1]
+        self.projection = np.zeros((capacity, hidden), dtype=np.float32)
+        self.neighbour_sum = np.zeros((capacity, hidden), dtype=np.float32)
+        self.degree = np.ones(capacity, dtype=np.float32)
+        self.projection[:self.size] = projection
+        self.neighbour_sum[:self.size] = neighbour_sum
+        self.degree[:self.size] = degree
+
+    def rows(self, ids):
+        return np.fromiter((self.index.get(key, -1) for key in ids), dtype=np.int64, count=len(ids))
+
+    def add(self, key, projection):
+        if self.size == len(self.degree):
+            for name in ("projection", "neighbour_sum", "degree"):
+                array = getattr(self, name)
+                grown = np.zeros((len(array) * 2,) + array.shape[1:], dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                if name == "degree":
+                    grown[self.size:] = 1.0
+                setattr(self, name, grown)
+        row = self.index[key] = self.size
+        self.projection[row] = projection
+        self.size += 1
+        return row
+
+
+class _TransactionIdSet:
+    """Membership over transaction ids stored as sorted 64-bit hashes.
+
+    Costs 8 bytes per id instead of a Python string in a set. Ids added after
+    load sit in a small set of hashes that is merged into the sorted array once
+    it holds ``merge_every`` entries.
+    """
+
+    def __init__(self, ids, merge_every=100000):
+        self.hashes = np.unique(self._hash(ids))
+        self.recent = set()
+        self.merge_every = merge_every
+
+    @staticmethod
+    def _hash(ids):
+        return pd.util.hash_array(np.asarray([str(key) for key in ids], dtype=object))
+
+    def __len__(self):
+        return len(self.hashes) + len(self.recent)
+
+    def contains(self, ids):
+        hashes = self._hash(ids)
+        positions = np.minimum(np.searchsorted(self.hashes, hashes), max(len(self.hashes) - 1, 0))
+        found = self.hashes[positions] == hashes if len(self.hashes) else np.zeros(len(hashes), dtype=bool)
+        if self.recent:
+            found |= np.isin(hashes, np.fromiter(self.recent, dtype=np.uint64, count=len(self.recent)))
+        return found
+
+    def add(self, key):
+        self.recent.add(int(self._hash([key])[0]))
+        if len(self.recent) >= self.merge_every:
+            recent = np.fromiter(self.recent, dtype=np.uint64, count=len(self.recent))
+            self.hashes = np.union1d(self.hashes, recent)
+            self.recent.clear()
+
+
+class GNNScorer:
+    """Online FraudGNN scoring of transactions from cached entity state.
+
+    A transaction's 2-layer GCN receptive field is itself, its customer and
+    merchant, and their other transactions. The last hop is cached per
+    entity (see ``build_scorer_state``), so scoring a batch is a few small
+    matrix products over the batch only, with no graph query. They run in
+    NumPy, or through a TorchScript head (fp32 or int8) when one is loaded. The
+    result equals the full-graph forward pass in eval mode with the new
+    transaction added to the graph; transactions in one batch are each scored
+    as if they were the only new one.
+
+    ``on_transaction_created`` folds new edges into the cache incrementally.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.loaded_at = None
+        self.version = None
+        self.head = None
+        self.scored = 0
+        self.updates = 0
+
+    def load_state(self, state, head=None):
+        """Swap in a scorer state; ``head`` is an optional TorchScript ``ScoringHead``."""
+        weights = state["weights"]
+        tables = {
+            entity: _EntityTable(
+                state[entity]["ids"], state[entity]["projection"],
+                state[entity]["neighbour_sum"], state[entity]["degree"]
+            )
+            for entity in ("customer", "merchant")
+        }
+        known_transactions = _TransactionIdSet(state["transaction_ids"])
+        with self._lock:
+            self.weights = weights
+            self.feature_stats = state["feature_stats"]
+            self.tables = tables
+            # Transactions already folded into the entity sums
+            self.known_transactions = known_transactions
+            self.head = head
+            self.version = state.get("version")
+            self.ready = True
+            self.loaded_at = time.time()
+        logger.info(
+            f"Loaded GNN scorer {self.version or ''} with {tables['customer'].size} customers "
+            f"and {tables['merchant'].size} merchants"
+        )
+
+    def _project(self, x):
+        return normalize_features(x, self.feature_stats) @ self.weights["conv1_weight"].T
+
+    def _entity_state(self, entity, ids, default_projection):
+        # Unknown entities start with no neighbours and default attributes
+        table = self.tables[entity]
+        rows = table.rows(ids)
+        known = rows >= 0
+        projection = np.repeat(default_projection[None, :], len(ids), axis=0)
+        neighbour_sum = np.zeros_like(projection)
+        degree = np.ones(len(ids), dtype=np.float32)
+        projection[known] = table.projection[rows[known]]
+        neighbour_sum[known] = table.neighbour_sum[rows[known]]
+        degree[known] = table.degree[rows[known]]
+        return projection, neighbour_sum, degree
+
+    def score_batch(self, transaction_ids, customer_ids, merchant_ids, amounts, timestamps):
+        """Fraud probabilities for a batch of (possibly unsaved) transactions."""
+        if not self.ready:
+            return [None] * len(customer_ids)
+        customer_ids = [str(key) for key in customer_ids]
+        merchant_ids = [str(key) for key in merchant_ids]
+
+        with self._lock:
+            transaction_x = normalize_features(transaction_features(
+                np.asarray(amounts, dtype=np.float64),
+                np.asarray([_epoch_seconds(ts) for ts in timestamps], dtype=np.float64)
+            ), self.feature_stats)
+            default_customer = self._project(customer_features(np.zeros(1, dtype=np.float32)))[0]
+            default_merchant = self._project(merchant_features(np.zeros(1, dtype=np.float32), ["other"]))[0]
+            customer = self._entity_state("customer", customer_ids, default_customer)
+            merchant = self._entity_state("merchant", merchant_ids, default_merchant)
+            # Transactions already in the graph are already counted in their neighbours' sums
+            saved = np.asarray([transaction_id is not None for transaction_id in transaction_ids], dtype=bool)
+            known = np.zeros(len(saved), dtype=bool)
+            if saved.any():
+                known[saved] = self.known_transactions.contains(
+                    [transaction_id for transaction_id in transaction_ids if transaction_id is not None]
+                )
+            is_new = (~known).astype(np.float32)
+            weights, head = self.weights, self.head
+
+        if head is not None:
+            probabilities = self._forward_head(head, transaction_x, customer, merchant, is_new)
+        else:
+            probabilities = self._forward(weights, transaction_x, customer, merchant, is_new)
+        with self._lock:
+            self.scored += len(probabilities)
+        return probabilities.astype(float).tolist()
+
+    @staticmethod
+    def _forward(w, transaction_x, customer, merchant, is_new):
+        relu = lambda values: np.maximum(values, 0.0)
+        transaction_projection = transaction_x @ w["conv1_weight"].T
+        incoming = transaction_projection / np.sqrt(TRANSACTION_DEGREE)
+        entity_hidden, entity_weight = [], []
+        for projection, neighbour_sum, degree in (customer, merchant):
+            degree = degree + is_new
+            neighbour_sum = neighbour_sum + is_new[:, None] * incoming
+            sqrt_degree = np.sqrt(degree)[:, None]
+            entity_hidden.append(relu((neighbour_sum + projection / sqrt_degree) / sqrt_degree + w["conv1_bias"]))
+            entity_weight.append(1.0 / np.sqrt(TRANSACTION_DEGREE * degree)[:, None])
+
+        # Layer 1 at the transaction, then layer 2 and the classifier
+        transaction_hidden = relu(
+            transaction_projection / TRANSACTION_DEGREE
+            + customer[0] * entity_weight[0] + merchant[0] * entity_weight[1]
+            + w["conv1_bias"]
+        )
+        aggregated = (
+            transaction_hidden / TRANSACTION_DEGREE
+            + entity_hidden[0] * entity_weight[0] + entity_hidden[1] * entity_weight[1]
+        )
+        hidden = aggregated @ w["conv2_weight"].T + w["conv2_bias"]
+        logits = hidden @ w["classifier_weight"].T + w["classifier_bias"]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        return np.exp(logits[:, 1]) / np.exp(logits).sum(axis=1)
+
+    @staticmethod
+    def _forward_head(head, transaction_x, customer, merchant, is_new):
+        import torch
+
+        inputs = [transaction_x, *customer, *merchant, is_new]
+        with torch.no_grad():
+            return head(*(torch.from_numpy(np.ascontiguousarray(a, dtype=np.float32)) for a in inputs)).numpy()
+
+    def score_transactions(self, transactions):
+        """Score ORM rows (or anything with the same attributes)."""
+        return self.score_batch(
+            [t.id for t in transactions],
+            [t.customer_id for t in transactions],
+            [t.merchant_id for t in transactions],
+            [t.amount for t in transactions],
+            [t.timestamp for t in transactions]
+        )
+
+    def on_transaction_created(self, transaction):
+        # Fold the new MADE/WITH edges into both endpoints' cached state
+        if not self.ready:
+            return
+        with self._lock:
+            transaction_id = str(transaction.id)
+            if self.known_transactions.contains([transaction_id])[0]:
+                return
+            projection = self._project(transaction_features(
+                np.asarray([transaction.amount or 0.0], dtype=np.float64),
+                np.asarray([_epoch_seconds(transaction.timestamp)], dtype=np.float64)
+            ))[0]
+            incoming = projection / np.sqrt(TRANSACTION_DEGREE)
+            for entity, key, features in (
+                ("customer", transaction.customer_id, customer_features(np.zeros(1, dtype=np.float32))),
+                ("merchant", transaction.merchant_id, merchant_features(np.zeros(1, dtype=np.float32), ["other"])),
+            ):
+                table = self.tables[entity]
+                key = str(key)
+                row = table.index.get(key)
+                if row is None:
+                    row = table.add(key, self._project(features)[0])
+                table.neighbour_sum[row] += incoming
+                table.degree[row] += 1.0
+            self.known_transactions.add(transaction_id)
+            self.updates += 1
+
+    def stats(self):
+        if not self.ready:
+            return {"ready": 0}
+        return {
+            "ready": 1,
+            "customers": self.tables["customer"].size,
+            "merchants": self.tables["merchant"].size,
+            "known_transactions": len(self.known_transactions),
+            "scored": self.scored,
+            "updates": self.updates,
+        }
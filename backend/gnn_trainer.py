@@ -4,10 +4,26 @@ import torch.nn.functional as F
 from torch_geometric.nn import GCNConv, global_mean_pool
 from torch_geometric.data import Data
 import numpy as np
+import pandas as pd
 from neo4j import GraphDatabase
+import asyncio
+import functools
+import logging
 import os
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from .graph_builder import build_graph_arrays, to_pyg_data, REQUIRED_COLUMNS
+from .graph_snapshot import GraphSnapshot
+from .gnn_scorer import build_scorer_state
+from .model_store import ModelStore
+from .feature_propagation import PropagatedFeatureCache
+from .metrics import metrics
+from .training_data import Neo4jTrainingDataReader
+
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 class FraudGNN(nn.Module):
@@ -17,15 +33,62 @@ class FraudGNN(nn.Module):
         self.conv2 = GCNConv(hidden_channels, hidden_channels)
         self.classifier = nn.Linear(hidden_channels, num_classes)
         
-    def forward(self, x, edge_index, batch):
+    def forward(self, x, edge_index, batch=None):
         x = self.conv1(x, edge_index)
         x = F.relu(x)
         x = F.dropout(x, p=0.2, training=self.training)
         x = self.conv2(x, edge_index)
-        x = global_mean_pool(x, batch)
+        # Without a batch vector the model classifies every node
+        if batch is not None:
+            x = global_mean_pool(x, batch)
         x = self.classifier(x)
         return x
 
+    def export_weights(self):
+        # Plain NumPy copies for torch-free inference (see gnn_scorer)
+        def array(tensor):
+            return tensor.detach().cpu().numpy().astype(np.float32)
+        return {
+            "conv1_weight": array(self.conv1.lin.weight),
+            "conv1_bias": array(self.conv1.bias),
+            "conv2_weight": array(self.conv2.lin.weight),
+            "conv2_bias": array(self.conv2.bias),
+            "classifier_weight": array(self.classifier.weight),
+            "classifier_bias": array(self.classifier.bias),
+        }
+
+class FraudSIGN(nn.Module):
+    """MLP over precomputed ``[X, AX, A^2 X, ...]`` features (SIGN-style).
+
+    Each hop gets its own projection before the shared classifier, so the
+    model can weigh near and far neighbourhoods differently without any
+    message passing at training time.
+    """
+
+    def __init__(self, num_features, hops, hidden_channels, num_classes):
+        super(FraudSIGN, self).__init__()
+        self.num_features = num_features
+        self.hop_projections = nn.ModuleList([nn.Linear(num_features, hidden_channels) for _ in range(hops + 1)])
+        self.hidden = nn.Linear((hops + 1) * hidden_channels, hidden_channels)
+        self.classifier = nn.Linear(hidden_channels, num_classes)
+
+    def forward(self, x):
+        hops = x.split(self.num_features, dim=1)
+        x = torch.cat([F.relu(projection(h)) for projection, h in zip(self.hop_projections, hops)], dim=1)
+        x = F.dropout(x, p=0.2, training=self.training)
+        x = F.relu(self.hidden(x))
+        return self.classifier(x)
+
+class TrainingCancelled(Exception):
+    """Raised inside ``GNNTrainer.fit`` when ``should_stop`` asks it to stop."""
+
+    def __init__(self, epoch):
+        super().__init__(f"Training cancelled at epoch {epoch}")
+        self.epoch = epoch
+
+def _parse_fanouts(value):
+    return [int(fanout) for fanout in str(value).split(",") if fanout.strip()]
+
 class GNNTrainer:
     def __init__(self):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -34,61 +97,408 @@ class GNNTrainer:
             auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password"))
         )
         self.model = None
+        self.scorer_state = None
+        self.model_store = ModelStore(os.getenv("MODEL_DIR", "./data/models"), keep=int(os.getenv("MODEL_KEEP_VERSIONS", "5")))
+        self.snapshot = GraphSnapshot(os.getenv("GRAPH_SNAPSHOT_DIR", "./data/graph_snapshot"))
+        # Defaults for train(); any of them can be overridden per call
+        self.options = {
+            "mode": os.getenv("TRAINING_MODE", "full"),  # full, sampled or sign
+            "source": os.getenv("TRAINING_SOURCE", "neo4j"),  # neo4j or snapshot
+            # Append transactions newer than the snapshot watermark before training from it
+            "refresh_snapshot": os.getenv("TRAINING_SNAPSHOT_REFRESH", "true").lower() == "true",
+            # Persist a versioned checkpoint (plus TorchScript heads) after training
+            "save_checkpoint": os.getenv("MODEL_SAVE_CHECKPOINTS", "true").lower() == "true",
+            "epochs": int(os.getenv("TRAINING_EPOCHS", "100")),
+            "hidden_channels": int(os.getenv("TRAINING_HIDDEN_CHANNELS", "64")),
+            "learning_rate": float(os.getenv("TRAINING_LEARNING_RATE", "0.01")),
+            "fanouts": _parse_fanouts(os.getenv("TRAINING_FANOUTS", "15,10")),
+            "batch_size": int(os.getenv("TRAINING_BATCH_SIZE", "1024")),
+            "num_workers": int(os.getenv("TRAINING_NUM_WORKERS", "0")),
+            "val_ratio": float(os.getenv("TRAINING_VAL_RATIO", "0.1")),
+            "patience": int(os.getenv("TRAINING_PATIENCE", "5")),
+            "seed": int(os.getenv("TRAINING_SEED", "42")),
+            "sign_hops": int(os.getenv("TRAINING_SIGN_HOPS", "2")),
+        }
+        self.propagation_cache = PropagatedFeatureCache(os.getenv("PROPAGATION_CACHE_DIR", "./data/propagation_cache"))
         
-    async def train(self):
-        # Fetch data from Neo4j
-        data = await self._fetch_training_data()
-        
-        # Prepare PyTorch Geometric data
-        graph_data = self._prepare_graph_data(data)
+    async def train(self, **overrides):
+        # Run the CPU-bound fit off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.fit, **overrides))
+
+    def fit(self, callback=None, should_stop=None, **overrides):
+        """Fetch, build and train synchronously.
+
+        ``callback(event)`` receives a dict per stage and per epoch, and
+        ``should_stop()`` is polled between steps; returning True raises
+        ``TrainingCancelled``. Both exist so a job runner in another process
+        can stream progress and cancel cooperatively.
+        """
+        options = self._resolve_options(overrides)
+        if options["source"] not in ("neo4j", "snapshot"):
+            raise ValueError(f"Unknown training data source: {options['source']}")
+        self._callback = callback or (lambda event: None)
+        self._should_stop = should_stop or (lambda: False)
+
+        if options["source"] == "snapshot":
+            graph_data = self._load_snapshot(options["refresh_snapshot"])
+        else:
+            # Fetch data from Neo4j
+            with self._stage("gnn_fetch"):
+                data = self._fetch_training_data()
+            metrics.inc("neo4j_rows", len(data["transaction_id"]), query="training_data")
+            self._check_stop(0)
+            
+            # Prepare PyTorch Geometric data
+            with self._stage("gnn_prepare"):
+                graph_data = self._prepare_graph_data(data)
+        self._check_stop(0)
+        return self.fit_graph(graph_data, callback=callback, should_stop=should_stop, **overrides)
+
+    def _resolve_options(self, overrides):
+        options = {**self.options, **overrides}
+        if options["mode"] not in ("full", "sampled", "sign"):
+            raise ValueError(f"Unknown training mode: {options['mode']}")
+        if options["epochs"] < 1:
+            raise ValueError(f"Training needs at least one epoch, got {options['epochs']}")
+        return options
+
+    def fit_graph(self, graph_data, callback=None, should_stop=None, **overrides):
+        """Train on an already built graph (see ``fit``); also used by offline benchmarks."""
+        options = self._resolve_options(overrides)
+        self._callback = callback or (lambda event: None)
+        self._should_stop = should_stop or (lambda: False)
+        torch.manual_seed(options["seed"])
+
+        if options["mode"] == "sign":
+            # The MLP has no graph layers, so there is no online scorer state or checkpoint for it
+            self.scorer_state = None
+            results = self._train_sign(graph_data, options)
+            return {"status": "success", "mode": options["mode"], **results, "graph": graph_data.build_stats}
         
         # Initialize model
         self.model = FraudGNN(
             num_features=graph_data.num_features,
-            hidden_channels=64,
+            hidden_channels=options["hidden_channels"],
             num_classes=2  # Binary classification (fraudulent or not)
         ).to(self.device)
-        
-        # Training loop
-        optimizer = torch.optim.Adam(self.model.parameters(), lr=0.01)
+
+        if options["mode"] == "sampled":
+            results = self._train_sampled(graph_data, options)
+        else:
+            results = self._train_full(graph_data, options)
+
+        with self._stage("gnn_scorer_state"):
+            self.scorer_state = self._build_scorer_state(graph_data)
+        results = {"status": "success", "mode": options["mode"], **results, "graph": graph_data.build_stats}
+        if options["save_checkpoint"]:
+            with self._stage("gnn_checkpoint"):
+                results["model_version"] = self.save_checkpoint(graph_data.num_features, options, results)
+        return results
+
+    def save_checkpoint(self, num_features, options, results):
+        model_config = {
+            "num_features": num_features,
+            "hidden_channels": options["hidden_channels"],
+            "num_classes": 2
+        }
+
+        def export_heads(directory, version):
+            # Written before the version is published, so LATEST never lacks its heads
+            try:
+                from .model_export import export_scoring_heads
+                export_scoring_heads(self.scorer_state["weights"], directory)
+            except Exception as e:
+                # The NumPy scorer does not need the heads, so a failed export is not fatal
+                logger.warning(f"Could not export TorchScript scoring heads for {version}: {str(e)}")
+
+        return self.model_store.save(
+            self.model, model_config, self.scorer_state,
+            {"options": options, "results": {k: v for k, v in results.items() if k != "history"}},
+            export=export_heads
+        )
+
+    def load_checkpoint(self, version=None):
+        self.model = self.model_store.load_model(version, device=self.device)
+        self.scorer_state = self.model_store.load_scorer_state(version)
+        return self.model
+
+    def _build_scorer_state(self, graph_data):
+        # Cache per-entity layer-1 state so new transactions can be scored online
+        self.model.eval()
+        return build_scorer_state(
+            self.model.export_weights(),
+            graph_data.x.cpu().numpy(),
+            graph_data.edge_index.cpu().numpy(),
+            {"customer": graph_data.customer_ids, "merchant": graph_data.merchant_ids},
+            {"customer": graph_data.customer_nodes, "merchant": graph_data.merchant_nodes},
+            graph_data.transaction_ids,
+            graph_data.feature_stats
+        )
+
+    @contextmanager
+    def _stage(self, stage):
+        start = time.perf_counter()
+        with metrics.timer(stage):
+            yield
+        self._callback({"type": "stage", "stage": stage, "seconds": time.perf_counter() - start})
+
+    def _check_stop(self, epoch):
+        if self._should_stop():
+            raise TrainingCancelled(epoch)
+
+    def _end_epoch(self, event, epoch_start):
+        seconds = time.perf_counter() - epoch_start
+        metrics.observe("stage_duration_seconds", seconds, stage="gnn_epoch")
+        self._callback({"type": "epoch", **event, "seconds": seconds})
+
+    def _train_full(self, graph_data, options):
+        # Full-graph training: every epoch runs message passing over the whole graph
+        graph_data = graph_data.to(self.device)
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=options["learning_rate"])
         criterion = nn.CrossEntropyLoss()
         
         self.model.train()
-        for epoch in range(100):
+        start = time.perf_counter()
+        for epoch in range(options["epochs"]):
+            self._check_stop(epoch)
+            epoch_start = time.perf_counter()
             optimizer.zero_grad()
             out = self.model(
                 graph_data.x,
-                graph_data.edge_index,
-                graph_data.batch
+                graph_data.edge_index
             )
-            loss = criterion(out, graph_data.y)
+            # Only transaction nodes carry fraud labels
+            mask = graph_data.transaction_mask
+            loss = criterion(out[mask], graph_data.y[mask])
             loss.backward()
             optimizer.step()
+            self._end_epoch({"epoch": epoch + 1, "loss": loss.item()}, epoch_start)
             
             if (epoch + 1) % 10 == 0:
                 print(f'Epoch {epoch+1:03d}, Loss: {loss.item():.4f}')
         
-        return {"status": "success", "epochs": 100, "final_loss": loss.item()}
+        return {
+            "epochs": options["epochs"],
+            "final_loss": loss.item(),
+            "epochs_per_second": options["epochs"] / (time.perf_counter() - start)
+        }
+
+    def _split_transaction_nodes(self, graph_data, val_ratio, seed):
+        transaction_nodes = graph_data.transaction_mask.nonzero().view(-1)
+        generator = torch.Generator().manual_seed(seed)
+        permuted = transaction_nodes[torch.randperm(len(transaction_nodes), generator=generator)]
+        val_count = int(len(permuted) * val_ratio)
+        return permuted[val_count:], permuted[:val_count]
+
+    def _train_sampled(self, graph_data, options):
+        # Node-level mini-batches over transaction nodes with sampled k-hop neighbourhoods;
+        # per-step memory depends on batch size and fan-outs, not on total graph size
+        from torch_geometric.loader import NeighborLoader
+
+        train_nodes, val_nodes = self._split_transaction_nodes(graph_data, options["val_ratio"], options["seed"])
+        loader_data = Data(
+            x=graph_data.x,
+            edge_index=graph_data.edge_index,
+            y=graph_data.y,
+            num_nodes=graph_data.num_nodes
+        )
+        loader_options = {
+            "num_neighbors": options["fanouts"],
+            "batch_size": options["batch_size"],
+            "num_workers": options["num_workers"],
+            "persistent_workers": options["num_workers"] > 0,
+        }
+        train_loader = NeighborLoader(loader_data, input_nodes=train_nodes, shuffle=True, **loader_options)
+        val_loader = NeighborLoader(loader_data, input_nodes=val_nodes, shuffle=False, **loader_options)
+
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=options["learning_rate"])
+        criterion = nn.CrossEntropyLoss()
+        best_val_loss, best_state, epochs_without_improvement = float("inf"), None, 0
+        history = []
+
+        start = time.perf_counter()
+        for epoch in range(options["epochs"]):
+            epoch_start = time.perf_counter()
+            self.model.train()
+            train_loss, train_count = 0.0, 0
+            for batch in train_loader:
+                self._check_stop(epoch)
+                batch = batch.to(self.device)
+                optimizer.zero_grad()
+                # Seed nodes come first in every sampled subgraph
+                out = self.model(batch.x, batch.edge_index)[:batch.batch_size]
+                loss = criterion(out, batch.y[:batch.batch_size])
+                loss.backward()
+                optimizer.step()
+                train_loss += loss.item() * batch.batch_size
+                train_count += batch.batch_size
+
+            val_loss, val_accuracy = self._evaluate(val_loader, criterion)
+            history.append({
+                "epoch": epoch + 1,
+                "train_loss": train_loss / max(train_count, 1),
+                "val_loss": val_loss,
+                "val_accuracy": val_accuracy
+            })
+            self._end_epoch(history[-1], epoch_start)
+            logger.info(
+                f"Epoch {epoch + 1:03d}, Train Loss: {history[-1]['train_loss']:.4f}, "
+                f"Val Loss: {val_loss}, Val Acc: {val_accuracy}"
+            )
+
+            # Early stopping on validation loss; keep the best weights seen.
+            # Without a validation split the latest weights are always kept.
+            if val_loss is None or val_loss < best_val_loss:
+                best_val_loss, epochs_without_improvement = (best_val_loss if val_loss is None else val_loss), 0
+                best_state = {key: value.detach().clone() for key, value in self.model.state_dict().items()}
+            else:
+                epochs_without_improvement += 1
+                if epochs_without_improvement >= options["patience"]:
+                    break
+
+        elapsed = time.perf_counter() - start
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+        return {
+            "epochs": len(history),
+            "final_loss": history[-1]["train_loss"] if history else None,
+            "best_val_loss": best_val_loss if best_val_loss != float("inf") else None,
+            "val_accuracy": max((h["val_accuracy"] for h in history if h["val_accuracy"] is not None), default=None),
+            "epochs_per_second": len(history) / elapsed if elapsed > 0 else None,
+            "early_stopped": len(history) < options["epochs"],
+            "history": history
+        }
+
+    def _train_sign(self, graph_data, options):
+        # Propagate once (cached on disk by graph content), then train an MLP on plain
+        # tensor mini-batches: per-epoch cost is independent of the edge count
+        rows = graph_data.transaction_mask.nonzero().view(-1)
+        with self._stage("gnn_propagate"):
+            features, cache_hit = self.propagation_cache.get_or_compute(
+                graph_data.x.numpy(), graph_data.edge_index.numpy(), options["sign_hops"], rows.numpy()
+            )
+        x = torch.from_numpy(features)
+        y = graph_data.y[rows]
+
+        generator = torch.Generator().manual_seed(options["seed"])
+        permuted = torch.randperm(len(rows), generator=generator)
+        val_count = int(len(permuted) * options["val_ratio"])
+        train_index, val_index = permuted[val_count:], permuted[:val_count]
+        x_val, y_val = x[val_index].to(self.device), y[val_index].to(self.device)
+
+        self.model = FraudSIGN(
+            num_features=graph_data.num_features,
+            hops=options["sign_hops"],
+            hidden_channels=options["hidden_channels"],
+            num_classes=2
+        ).to(self.device)
+        optimizer = torch.optim.Adam(self.model.parameters(), lr=options["learning_rate"])
+        criterion = nn.CrossEntropyLoss()
+        best_val_loss, best_state, epochs_without_improvement = float("inf"), None, 0
+        history = []
+
+        start = time.perf_counter()
+        for epoch in range(options["epochs"]):
+            epoch_start = time.perf_counter()
+            self.model.train()
+            train_loss = 0.0
+            order = train_index[torch.randperm(len(train_index), generator=generator)]
+            for batch in order.split(options["batch_size"]):
+                self._check_stop(epoch)
+                batch_x, batch_y = x[batch].to(self.device), y[batch].to(self.device)
+                optimizer.zero_grad()
+                loss = criterion(self.model(batch_x), batch_y)
+                loss.backward()
+                optimizer.step()
+                train_loss += loss.item() * len(batch)
+
+            val_loss, val_accuracy = None, None
+            if val_count:
+                self.model.eval()
+                with torch.no_grad():
+                    out = self.model(x_val)
+                    val_loss = criterion(out, y_val).item()
+                    val_accuracy = (out.argmax(dim=1) == y_val).float().mean().item()
+            history.append({
+                "epoch": epoch + 1,
+                "train_loss": train_loss / max(len(train_index), 1),
+                "val_loss": val_loss,
+                "val_accuracy": val_accuracy
+            })
+            self._end_epoch(history[-1], epoch_start)
+
+            # Early stopping on validation loss, as in the sampled mode
+            if val_loss is None or val_loss < best_val_loss:
+                best_val_loss, epochs_without_improvement = (best_val_loss if val_loss is None else val_loss), 0
+                best_state = {key: value.detach().clone() for key, value in self.model.state_dict().items()}
+            else:
+                epochs_without_improvement += 1
+                if epochs_without_improvement >= options["patience"]:
+                    break
+
+        elapsed = time.perf_counter() - start
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+        return {
+            "epochs": len(history),
+            "final_loss": history[-1]["train_loss"] if history else None,
+            "best_val_loss": best_val_loss if best_val_loss != float("inf") else None,
+            "val_accuracy": max((h["val_accuracy"] for h in history if h["val_accuracy"] is not None), default=None),
+            "epochs_per_second": len(history) / elapsed if elapsed > 0 else None,
+            "early_stopped": len(history) < options["epochs"],
+            "propagation_cache_hit": cache_hit,
+            "history": history
+        }
+
+    @torch.no_grad()
+    def _evaluate(self, loader, criterion):
+        self.model.eval()
+        total_loss, correct, count = 0.0, 0, 0
+        for batch in loader:
+            batch = batch.to(self.device)
+            out = self.model(batch.x, batch.edge_index)[:batch.batch_size]
+            labels = batch.y[:batch.batch_size]
+            total_loss += criterion(out, labels).item() * batch.batch_size
+            correct += int((out.argmax(dim=1) == labels).sum())
+            count += batch.batch_size
+        if count == 0:
+            return None, None
+        return total_loss / count, correct / count
     
-    async def _fetch_training_data(self):
-        with self.neo4j_driver.session() as session:
-            query = """
-            MATCH (t:Transaction)
-            MATCH (c:Customer)-[:MADE]->(t)
-            MATCH (m:Merchant)-[:RECEIVED]->(t)
-            RETURN t, c, m
-            """
-            result = session.run(query)
-            return [dict(record) for record in result]
+    def close(self):
+        self.neo4j_driver.close()
+
+    def training_data_reader(self):
+        # Stream scalar columns page by page over concurrent keyset-partitioned reads
+        return Neo4jTrainingDataReader(
+            self.neo4j_driver,
+            page_size=int(os.getenv("TRAINING_FETCH_PAGE_SIZE", "50000")),
+            partitions=int(os.getenv("TRAINING_FETCH_PARTITIONS", "4"))
+        )
+
+    def _fetch_training_data(self):
+        return self.training_data_reader().read()
+
+    def _load_snapshot(self, refresh):
+        if refresh or not self.snapshot.exists:
+            with self._stage("gnn_snapshot_export"):
+                self.snapshot.export(self.training_data_reader())
+        # Memory-mapped arrays become tensors through torch.from_numpy without copies
+        with self._stage("gnn_snapshot_load"):
+            graph_data = to_pyg_data(self.snapshot.load_graph_arrays())
+        logger.info(f"Loaded training graph from snapshot: {graph_data.build_stats}")
+        return graph_data
     
     def _prepare_graph_data(self, data):
-        # Convert Neo4j data to PyTorch Geometric format
-        # This is a simplified example - you'll need to implement the actual conversion
-        # based on your graph structure and features
-        
-        # Example feature vectors (you should create meaningful features)
-        x = torch.randn(len(data), 10)  # 10 features per node
-        edge_index = torch.tensor([[0, 1], [1, 0]], dtype=torch.long)  # Example edges
-        y = torch.tensor([0, 1], dtype=torch.long)  # Example labels
-        
-        return Data(x=x, edge_index=edge_index, y=y) 
\ No newline at end of file
+        # Convert fetched columns (or a list of records) to PyTorch Geometric format
+        columns = pd.DataFrame.from_records(data) if isinstance(data, list) else data
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"Training data is missing columns: {missing}")
+
+        if not len(columns["transaction_id"]):
+            raise ValueError("No transactions found to build the training graph")
+
+        arrays = build_graph_arrays(columns)
+        logger.info(f"Built training graph: {arrays['build_stats']}")
+        return to_pyg_data(arrays)
@@ -0,0 +1,204 @@
+import resource
+import time
+import numpy as np
+import pandas as pd
+
+# Fixed vocabulary so feature dimensions stay stable across datasets and snapshots
+MERCHANT_CATEGORIES = ("retail", "food", "travel", "entertainment", "utilities", "healthcare")
+
+# edge_type values index into RELATIONS
+RELATIONS = ("MADE", "WITH")
+
+# Column layout of the node feature matrix
+FEATURE_NAMES = (
+    ("is_customer", "is_merchant", "is_transaction", "log_amount", "hour_sin", "hour_cos", "risk_score")
+    + tuple(f"category_{category}" for category in MERCHANT_CATEGORIES)
+    + ("category_other",)
+)
+# Continuous columns standardised with the stored mean/std
+NORMALIZED_FEATURES = ("log_amount", "risk_score")
+
+REQUIRED_COLUMNS = (
+    "transaction_id", "customer_id", "merchant_id", "amount", "timestamp", "is_fraudulent"
+)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _column(columns, name, default, dtype):
+    if name in columns and columns[name] is not None:
+        values = pd.Series(columns[name])
+        return values.fillna(default).to_numpy(dtype=dtype)
+    return np.full(len(columns["transaction_id"]), default, dtype=dtype)
+
+
+def transaction_features(amount, timestamp):
+    """Feature rows for transaction nodes; ``timestamp`` is epoch seconds."""
+    amount = np.asarray(amount, dtype=np.float64)
+    hours = (np.asarray(timestamp, dtype=np.float64) % 86400) / 3600
+    x = np.zeros((len(amount), len(FEATURE_NAMES)), dtype=np.float32)
+    x[:, FEATURE_NAMES.index("is_transaction")] = 1.0
+    x[:, FEATURE_NAMES.index("log_amount")] = np.log1p(np.clip(amount, 0, None))
+    x[:, FEATURE_NAMES.index("hour_sin")] = np.sin(2 * np.pi * hours / 24)
+    x[:, FEATURE_NAMES.index("hour_cos")] = np.cos(2 * np.pi * hours / 24)
+    return x
+
+
+def customer_features(risk_score):
+    x = np.zeros((len(risk_score), len(FEATURE_NAMES)), dtype=np.float32)
+    x[:, FEATURE_NAMES.index("is_customer")] = 1.0
+    x[:, FEATURE_NAMES.index("risk_score")] = risk_score
+    return x
+
+
+def merchant_features(risk_score, category):
+    x = np.zeros((len(risk_score), len(FEATURE_NAMES)), dtype=np.float32)
+    x[:, FEATURE_NAMES.index("is_merchant")] = 1.0
+    x[:, FEATURE_NAMES.index("risk_score")] = risk_score
+    # Unknown categories map to the trailing "other" column
+    codes = pd.Index(MERCHANT_CATEGORIES).get_indexer(np.asarray(category, dtype=object)).astype(np.int64)
+    codes[codes < 0] = len(MERCHANT_CATEGORIES)
+    x[np.arange(len(codes)), FEATURE_NAMES.index(f"category_{MERCHANT_CATEGORIES[0]}") + codes] = 1.0
+    return x
+
+
+def _carrier_rows(x, name):
+    # Amounts live on transaction nodes, risk scores on customer and merchant nodes
+    is_transaction = x[:, FEATURE_NAMES.index("is_transaction")] == 1
+    return is_transaction if name == "log_amount" else ~is_transaction
+
+
+def compute_feature_stats(x):
+    """Mean/std of the normalised columns, taken over the nodes that carry them."""
+    stats = {}
+    for name in NORMALIZED_FEATURES:
+        values = x[_carrier_rows(x, name), FEATURE_NAMES.index(name)]
+        std = float(values.std()) if len(values) else 1.0
+        stats[name] = {"mean": float(values.mean()) if len(values) else 0.0, "std": std if std > 0 else 1.0}
+    return stats
+
+
+def normalize_features(x, feature_stats):
+    for name, stat in feature_stats.items():
+        rows, column = _carrier_rows(x, name), FEATURE_NAMES.index(name)
+        x[rows, column] = (x[rows, column] - stat["mean"]) / stat["std"]
+    return x
+
+
+def build_graph_arrays(columns, feature_stats=None):
+    """Build the homogeneous transaction graph as NumPy arrays.
+
+    ``columns`` maps column name to a 1-D array (a DataFrame works too), one
+    row per transaction, with at least ``REQUIRED_COLUMNS``; ``timestamp`` is
+    epoch seconds. Optional ``customer_risk_score``, ``merchant_risk_score``
+    and ``merchant_category`` columns feed the entity features.
+
+    Node indices are laid out as ``[customers | merchants | transactions]``.
+    Ids are mapped to contiguous indices with ``pd.factorize``, so the whole
+    build is vectorised. Returns a dict of arrays plus build statistics.
+    """
+    start = time.perf_counter()
+
+    customer_codes, customer_ids = pd.factorize(pd.Series(columns["customer_id"]), sort=False)
+    merchant_codes, merchant_ids = pd.factorize(pd.Series(columns["merchant_id"]), sort=False)
+    transaction_ids = pd.Series(columns["transaction_id"]).to_numpy()
+    num_customers, num_merchants, num_transactions = len(customer_ids), len(merchant_ids), len(transaction_ids)
+    customer_offset, merchant_offset, transaction_offset = 0, num_customers, num_customers + num_merchants
+    num_nodes = transaction_offset + num_transactions
+
+    # Entity attributes: first value seen per entity, gathered with one fancy index
+    first_customer_row = np.unique(customer_codes, return_index=True)[1]
+    first_merchant_row = np.unique(merchant_codes, return_index=True)[1]
+    customer_risk = _column(columns, "customer_risk_score", 0.0, np.float32)[first_customer_row]
+    merchant_risk = _column(columns, "merchant_risk_score", 0.0, np.float32)[first_merchant_row]
+    merchant_category = _column(columns, "merchant_category", "other", object)[first_merchant_row]
+
+    x = np.concatenate([
+        customer_features(customer_risk),
+        merchant_features(merchant_risk, merchant_category),
+        transaction_features(
+            _column(columns, "amount", 0.0, np.float64),
+            _column(columns, "timestamp", 0.0, np.float64)
+        ),
+    ])
+    if feature_stats is None:
+        feature_stats = compute_feature_stats(x)
+    x = normalize_features(x, feature_stats)
+
+    transaction_index = transaction_offset + np.arange(num_transactions, dtype=np.int64)
+    made = np.stack([customer_offset + customer_codes.astype(np.int64), transaction_index])
+    with_ = np.stack([transaction_index, merchant_offset + merchant_codes.astype(np.int64)])
+
+    # Message passing runs over both directions of every relationship
+    edge_index = np.concatenate([made, with_, made[::-1], with_[::-1]], axis=1)
+    num_made = made.shape[1]
+    edge_type = np.concatenate([
+        np.zeros(num_made, dtype=np.int64), np.ones(num_made, dtype=np.int64),
+        np.zeros(num_made, dtype=np.int64), np.ones(num_made, dtype=np.int64),
+    ])
+
+    y = np.zeros(num_nodes, dtype=np.int64)
+    y[transaction_offset:] = _column(columns, "is_fraudulent", False, bool)
+    transaction_mask = np.zeros(num_nodes, dtype=bool)
+    transaction_mask[transaction_offset:] = True
+
+    arrays = {
+        "x": x,
+        "edge_index": edge_index,
+        "edge_type": edge_type,
+        "y": y,
+        "transaction_mask": transaction_mask,
+        "customer_ids": np.asarray(customer_ids, dtype=object),
+        "merchant_ids": np.asarray(merchant_ids, dtype=object),
+        "transaction_ids": transaction_ids,
+        # Global node index of each id above
+        "customer_nodes": customer_offset + np.arange(num_customers, dtype=np.int64),
+        "merchant_nodes": merchant_offset + np.arange(num_merchants, dtype=np.int64),
+        "transaction_nodes": transaction_index,
+        "feature_stats": feature_stats,
+        "offsets": {
+            "customer": customer_offset,
+            "merchant": merchant_offset,
+            "transaction": transaction_offset,
+        },
+    }
+    arrays["build_stats"] = {
+        "build_seconds": time.perf_counter() - start,
+        "num_nodes": num_nodes,
+        "num_edges": int(edge_index.shape[1]),
+        "num_customers": num_customers,
+        "num_merchants": num_merchants,
+        "num_transactions": num_transactions,
+        "array_bytes": int(sum(arrays[k].nbytes for k in ("x", "edge_index", "edge_type", "y", "transaction_mask"))),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return arrays
+
+
+def to_pyg_data(arrays):
+    """Wrap builder arrays in a ``torch_geometric.data.Data`` without copying."""
+    import torch
+    from torch_geometric.data import Data
+
+    data = Data(
+        x=torch.from_numpy(arrays["x"]),
+        edge_index=torch.from_numpy(arrays["edge_index"]),
+        edge_type=torch.from_numpy(arrays["edge_type"]),
+        y=torch.from_numpy(arrays["y"]),
+        transaction_mask=torch.from_numpy(arrays["transaction_mask"]),
+        num_nodes=int(arrays["x"].shape[0]),
+    )
+    # Non-tensor metadata used for inference and persistence
+    data.customer_ids = arrays["customer_ids"]
+    data.merchant_ids = arrays["merchant_ids"]
+    data.transaction_ids = arrays["transaction_ids"]
+    data.customer_nodes = arrays["customer_nodes"]
+    data.merchant_nodes = arrays["merchant_nodes"]
+    data.transaction_nodes = arrays["transaction_nodes"]
+    data.feature_stats = arrays["feature_stats"]
+    data.offsets = arrays["offsets"]
+    data.build_stats = arrays["build_stats"]
+    return data
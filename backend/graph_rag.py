@@ -1,98 +1,434 @@
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
 from langchain.vectorstores import Chroma
 from langchain.embeddings import OpenAIEmbeddings
+from langchain.embeddings.base import Embeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.document_loaders import TextLoader
+import asyncio
+import hashlib
 import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+import numpy as np
 from dotenv import load_dotenv
 
+from .context_builder import ContextBuilder
+from .metrics import metrics
+from .rule_engine import RuleEngine
+from .vector_index import MmapVectorIndex
+
 load_dotenv()
 
+class HashingEmbeddings(Embeddings):
+    """Local, network-free embeddings via signed feature hashing.
+
+    Unigrams and bigrams are hashed into a fixed number of buckets with a
+    stable hash, so vectors are identical across processes and restarts.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed(self, text):
+        tokens = re.findall(r"[a-z0-9_.:-]+", text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector.tolist()
+
+        digests = np.array(
+            [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "little") for f in features],
+            dtype=np.uint64
+        )
+        indices = (digests % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where((digests >> np.uint64(63)) == 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, indices, signs)
+
+        # Sublinear term frequency, then L2-normalise for cosine similarity
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of another embedding backend.
+
+    Texts are keyed by a SHA-256 of their whitespace-normalised content and the
+    backend name. Lookups go to an in-memory LRU first, then to .npy files on
+    disk, and only misses reach the underlying backend.
+    """
+
+    def __init__(self, embeddings, namespace, cache_dir="./data/embedding_cache", max_entries=10000):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.cache_dir = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]", "_", namespace)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(text.split())
+
+    def _key(self, text):
+        payload = f"{self.namespace}\n{self.normalize(text)}".encode()
+        return hashlib.sha256(payload).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.npy"
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+        path = self._path(key)
+        if path.exists():
+            try:
+                vector = np.load(path).tolist()
+            except (OSError, ValueError):
+                return None
+            self._remember(key, vector)
+            with self._lock:
+                self.disk_hits += 1
+            return vector
+        return None
+
+    def _store(self, key, vector):
+        self._remember(key, vector)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(vector, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = [self._lookup(key) for key in keys]
+
+        # Embed each distinct missing text once, in a single backend call
+        missing = OrderedDict()
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            embedded = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), embedded))
+            for key, vector in fresh.items():
+                self._store(key, vector)
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory)
+            }
+
+def create_embeddings():
+    # Pick the embedding backend from the environment and wrap it in the cache
+    backend = os.getenv("EMBEDDING_BACKEND", "openai")
+    if backend == "hashing":
+        embeddings = HashingEmbeddings(dim=int(os.getenv("EMBEDDING_DIM", "512")))
+        namespace = embeddings.name
+    elif backend == "openai":
+        embeddings = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
+        namespace = f"openai-{embeddings.model}"
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+    return CachedEmbeddings(
+        embeddings,
+        namespace=namespace,
+        cache_dir=os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache"),
+        max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    )
+
 class GraphRAG:
-    def __init__(self):
-        self.neo4j_driver = GraphDatabase.driver(
+    def __init__(self, feature_store=None, score_cache=None):
+        self.neo4j_driver = AsyncGraphDatabase.driver(
             os.getenv("NEO4J_URI", "bolt://localhost:7687"),
-            auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password"))
+            auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+            max_connection_pool_size=int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "100"))
         )
-        self.embeddings = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
-        self.vector_store = Chroma(
-            persist_directory="./data/vector_store",
-            embedding_function=self.embeddings
+        self.embeddings = create_embeddings()
+        self.vector_store_backend = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+        self._vector_store = None
+        self.similar_patterns_k = 3
+        self.lookback_days = int(os.getenv("GRAPH_RAG_LOOKBACK_DAYS", "90"))
+        self.max_related = int(os.getenv("GRAPH_RAG_MAX_RELATED", "200"))
+        self._schema_ready = False
+        self.feature_store = feature_store
+        self.score_cache = score_cache
+        self.rule_engine = RuleEngine(
+            config_path=os.getenv("FRAUD_RULES_PATH", "./data/fraud_rules.json"),
+            reload_interval=float(os.getenv("FRAUD_RULES_RELOAD_SECONDS", "5"))
+        )
+        self.context_builder = ContextBuilder(
+            max_chars=int(os.getenv("CONTEXT_MAX_CHARS", "1200")),
+            top_n=int(os.getenv("CONTEXT_TOP_RELATED", "5"))
+        )
+
+        # Embedding and vector-search calls are blocking; run them on a bounded
+        # executor and cap how many may be in flight so the event loop stays free
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("GRAPH_RAG_EXECUTOR_WORKERS", "8")),
+            thread_name_prefix="graph-rag"
         )
+        self.max_concurrency = int(os.getenv("GRAPH_RAG_MAX_CONCURRENCY", "16"))
+        self._semaphore = None
+
+    @property
+    def vector_store(self):
+        # Opened on first use so workers that never search don't pay for it
+        if self._vector_store is None:
+            if self.vector_store_backend == "mmap":
+                self._vector_store = MmapVectorIndex(
+                    os.getenv("VECTOR_INDEX_PATH", "./data/vector_index"),
+                    embedding_function=self.embeddings,
+                    ivf_threshold=int(os.getenv("VECTOR_INDEX_IVF_THRESHOLD", "50000")),
+                    nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+                )
+            elif self.vector_store_backend == "chroma":
+                self._vector_store = Chroma(
+                    persist_directory="./data/vector_store",
+                    embedding_function=self.embeddings
+                )
+            else:
+                raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {self.vector_store_backend}")
+        return self._vector_store
+
+    async def close(self):
+        await self.neo4j_driver.close()
+        self.executor.shutdown(wait=False)
+
+    async def _ensure_schema(self):
+        # The neighbourhood query starts from an index seek on Transaction.id
+        if self._schema_ready:
+            return
+        async with self.neo4j_driver.session() as session:
+            result = await session.run(
+                "CREATE CONSTRAINT transaction_id IF NOT EXISTS "
+                "FOR (t:Transaction) REQUIRE t.id IS UNIQUE"
+            )
+            await result.consume()
+        self._schema_ready = True
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        # The semaphore is created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
 
     async def analyze_transaction(self, transaction):
-        # Create transaction graph representation
-        with self.neo4j_driver.session() as session:
-            # Query for related transactions and entities
-            query = """
-            MATCH (t:Transaction {id: $transaction_id})
-            MATCH (c:Customer)-[:MADE]->(t)
-            MATCH (m:Merchant)-[:RECEIVED]->(t)
-            MATCH (c)-[:MADE]->(related:Transaction)
-            WHERE related.id <> t.id
-            RETURN t, c, m, related
+        scores = await self.analyze_transactions([transaction.id])
+        fraud_score = scores[0]
+        return fraud_score if fraud_score is not None else 0.0
+
+    async def analyze_transactions(self, transaction_ids):
+        # Score a batch of transactions with a single Neo4j round-trip.
+        # Scores are returned in input order; ids missing from the graph get None.
+        transaction_ids = list(transaction_ids)
+        if not transaction_ids:
+            return []
+
+        # Serve fresh cached scores; only the remaining ids go through the pipeline
+        scores_by_id = {}
+        if self.score_cache is not None:
+            for tid in dict.fromkeys(transaction_ids):
+                cached_score = self.score_cache.get(tid)
+                if cached_score is not None:
+                    scores_by_id[tid] = cached_score
+            generation = self.score_cache.generation
+        pending_ids = [tid for tid in dict.fromkeys(transaction_ids) if tid not in scores_by_id]
+        if not pending_ids:
+            return [scores_by_id[tid] for tid in transaction_ids]
+
+        await self._ensure_schema()
+        async with self.neo4j_driver.session() as session:
+            # Fetch every neighbourhood at once, one row per requested transaction.
+            # Related activity is aggregated on the server: bounded to the lookback
+            # window, capped at max_related and projected to the scorer's properties.
+            # related_count always counts the lookback window; the COUNT {} walk only
+            # runs when the related sample was capped, as the sample size is the count
+            # otherwise.
+            query = f"""
+            UNWIND $transaction_ids AS transaction_id
+            MATCH (t:Transaction {{id: transaction_id}})
+            USING INDEX t:Transaction(id)
+            MATCH (c:Customer)-[:MADE]->(t)-[:WITH]->(m:Merchant)
+            CALL {{
+                WITH c, t
+                MATCH (c)-[:MADE]->(related:Transaction)
+                WHERE related <> t
+                  AND related.timestamp >= t.timestamp - duration({{days: $lookback_days}})
+                WITH related
+                ORDER BY related.timestamp DESC
+                LIMIT $max_related
+                OPTIONAL MATCH (related)-[:WITH]->(related_merchant:Merchant)
+                RETURN collect(related {{
+                    .id, .amount, .timestamp, .is_fraudulent,
+                    merchant_category: related_merchant.category
+                }}) AS related
+            }}
+            RETURN transaction_id,
+                   t {{.id, .amount, .timestamp, .status}} AS transaction,
+                   c {{.id, .risk_score}} AS customer,
+                   m {{.id, .category, .risk_score}} AS merchant,
+                   related,
+                   CASE WHEN size(related) < $max_related THEN size(related) ELSE COUNT {{
+                       (c)-[:MADE]->(other:Transaction)
+                       WHERE other <> t
+                         AND other.timestamp >= t.timestamp - duration({{days: $lookback_days}})
+                   }} END AS related_count
             """
-            result = session.run(query, transaction_id=transaction.id)
-            
-            # Process the graph data
-            graph_data = self._process_graph_data(result)
-            
-            # Generate embeddings for the transaction context
-            context = self._generate_context(graph_data)
-            
-            # Query the vector store for similar fraudulent patterns
-            similar_patterns = self.vector_store.similarity_search(context, k=3)
-            
-            # Calculate fraud score based on graph patterns and similar cases
-            fraud_score = self._calculate_fraud_score(graph_data, similar_patterns)
-            
-            return fraud_score
-
-    def _process_graph_data(self, result):
-        # Process Neo4j query results into a structured format
-        graph_data = {
-            "transaction": {},
-            "customer": {},
-            "merchant": {},
-            "related_transactions": []
-        }
-        
-        for record in result:
-            graph_data["transaction"] = dict(record["t"])
-            graph_data["customer"] = dict(record["c"])
-            graph_data["merchant"] = dict(record["m"])
-            graph_data["related_transactions"].append(dict(record["related"]))
-            
-        return graph_data
+            with metrics.timer("neo4j_query"):
+                result = await session.run(
+                    query,
+                    transaction_ids=pending_ids,
+                    lookback_days=self.lookback_days,
+                    max_related=self.max_related
+                )
+                records = [record async for record in result]
+        metrics.inc("neo4j_rows", len(records), query="neighbourhood")
+        with metrics.timer("process_graph_data"):
+            graph_data_by_id = self._process_graph_data(records)
+
+        # Build contexts only for transactions found in the graph
+        found_ids = [tid for tid in pending_ids if tid in graph_data_by_id]
+        with metrics.timer("generate_context"):
+            contexts = [self._generate_context(graph_data_by_id[tid]) for tid in found_ids]
+
+        # Embed all contexts in one call, then search the vector store per vector
+        similar_patterns_by_id = {}
+        if contexts:
+            with metrics.timer("embedding"):
+                vectors = await self._run_blocking(self.embeddings.embed_documents, contexts)
+            with metrics.timer("similarity_search"):
+                if hasattr(self.vector_store, "similarity_search_by_vectors"):
+                    # The in-process index answers the whole batch with one matrix product
+                    results = await self._run_blocking(
+                        self.vector_store.similarity_search_by_vectors, vectors, k=self.similar_patterns_k
+                    )
+                else:
+                    results = await asyncio.gather(*[
+                        self._run_blocking(
+                            self.vector_store.similarity_search_by_vector, vector, k=self.similar_patterns_k
+                        )
+                        for vector in vectors
+                    ])
+            for tid, similar_patterns in zip(found_ids, results):
+                similar_patterns_by_id[tid] = similar_patterns
+
+        # Score every found transaction in one vectorised rule-engine pass
+        with metrics.timer("scoring"):
+            fraud_scores = self._calculate_fraud_scores(
+                [graph_data_by_id[tid] for tid in found_ids],
+                [similar_patterns_by_id[tid] for tid in found_ids]
+            )
+        for tid, fraud_score in zip(found_ids, fraud_scores):
+            graph_data = graph_data_by_id[tid]
+            scores_by_id[tid] = fraud_score
+            if self.score_cache is not None:
+                self.score_cache.put(
+                    tid,
+                    scores_by_id[tid],
+                    graph_data["customer"]["id"],
+                    graph_data["merchant"]["id"],
+                    generation
+                )
+        return [scores_by_id.get(tid) for tid in transaction_ids]
+
+    def _process_graph_data(self, records):
+        # Process Neo4j query results into one structured graph_data dict per transaction id
+        graph_data_by_id = {}
+        for record in records:
+            customer_features = None
+            if self.feature_store is not None and self.feature_store.ready:
+                customer_features = self.feature_store.get_customer(record["customer"]["id"])
+
+            graph_data_by_id[record["transaction_id"]] = {
+                "transaction": record["transaction"],
+                "customer": record["customer"],
+                "merchant": record["merchant"],
+                "related_transactions": record["related"],
+                "related_count": record["related_count"],
+                "customer_features": customer_features
+            }
+        return graph_data_by_id
 
     def _generate_context(self, graph_data):
-        # Generate a text context from the graph data
-        context = f"""
-        Transaction: {graph_data['transaction']}
-        Customer: {graph_data['customer']}
-        Merchant: {graph_data['merchant']}
-        Related Transactions: {graph_data['related_transactions']}
-        """
-        return context
+        # Generate a compact, size-bounded text context from the graph data
+        return self.context_builder.build(graph_data)
+
+    def _build_features(self, graph_data, similar_patterns):
+        # Flatten one neighbourhood into the numeric features the rules can reference
+        amount = float(graph_data["transaction"].get("amount") or 0.0)
+        customer_features = graph_data.get("customer_features") or {}
+        customer_mean = customer_features.get("mean") or 0.0
+        return {
+            "amount": amount,
+            "related_count": graph_data["related_count"],
+            "similar_fraud_patterns": sum(
+                1 for pattern in similar_patterns if "fraud" in pattern.page_content.lower()
+            ),
+            "customer_risk_score": float(graph_data["customer"].get("risk_score") or 0.0),
+            "merchant_risk_score": float(graph_data["merchant"].get("risk_score") or 0.0),
+            "customer_mean_amount": customer_mean,
+            "customer_max_amount": customer_features.get("max_amount") or 0.0,
+            "amount_to_customer_mean": amount / customer_mean if customer_mean else 0.0
+        }
+
+    def _calculate_fraud_scores(self, graph_data_list, similar_patterns_list):
+        # Column-wise features for the whole batch, scored by the configured rules
+        rows = [
+            self._build_features(graph_data, similar_patterns)
+            for graph_data, similar_patterns in zip(graph_data_list, similar_patterns_list)
+        ]
+        if not rows:
+            return []
+        columns = {name: [row[name] for row in rows] for name in rows[0]}
+        return self.rule_engine.score_batch(columns).tolist()
 
     def _calculate_fraud_score(self, graph_data, similar_patterns):
-        # Implement fraud scoring logic based on graph patterns and similar cases
-        # This is a simplified example
-        base_score = 0.0
-        
-        # Check transaction amount
-        amount = graph_data["transaction"].get("amount", 0)
-        if amount > 10000:  # High-value transaction
-            base_score += 0.3
-            
-        # Check related transactions
-        related_transactions = graph_data["related_transactions"]
-        if len(related_transactions) > 10:  # High number of related transactions
-            base_score += 0.2
-            
-        # Check similar patterns
-        for pattern in similar_patterns:
-            if "fraud" in pattern.page_content.lower():
-                base_score += 0.1
-                
-        return min(base_score, 1.0)  # Normalize score between 0 and 1 
\ No newline at end of file
+        return self._calculate_fraud_scores([graph_data], [similar_patterns])[0]
@@ -0,0 +1,357 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from .graph_builder import (
+    FEATURE_NAMES, RELATIONS, _column, _peak_rss_mb,
+    compute_feature_stats, customer_features, merchant_features, normalize_features, transaction_features
+)
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# node_type values
+CUSTOMER, MERCHANT, TRANSACTION = 0, 1, 2
+ENTITY_TYPES = {"customer": CUSTOMER, "merchant": MERCHANT, "transaction": TRANSACTION}
+
+
+def _edge_csr(edges, num_nodes):
+    """CSR (indptr, indices) of a ``(2, E)`` COO array, grouped by source node."""
+    order = np.argsort(edges[0], kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges[0], minlength=num_nodes), out=indptr[1:])
+    return indptr, np.ascontiguousarray(edges[1][order])
+
+
+def build_segment_arrays(columns, feature_stats, known, node_offset):
+    """Build the arrays for one append-only snapshot segment.
+
+    ``known`` maps ``customer``/``merchant``/``transaction`` to a
+    ``(pd.Index of ids, array of global node indices)`` pair for everything
+    already in the snapshot. Only unseen entities become new nodes; rows for
+    transactions already present are dropped. New nodes are numbered from
+    ``node_offset`` as ``[new customers | new merchants | new transactions]``.
+    """
+    transaction_ids = pd.Series(columns["transaction_id"]).astype(str)
+    keep = (known["transaction"][0].get_indexer(transaction_ids) < 0) & ~transaction_ids.duplicated().to_numpy()
+    columns = {name: np.asarray(values)[keep] for name, values in columns.items() if values is not None}
+    transaction_ids = transaction_ids.to_numpy()[keep]
+
+    nodes, new_ids, first_rows = {}, {}, {}
+    next_node = node_offset
+    for entity in ("customer", "merchant"):
+        codes, uniques = pd.factorize(pd.Series(columns[f"{entity}_id"]).astype(str), sort=False)
+        known_ids, known_nodes = known[entity]
+        positions = known_ids.get_indexer(uniques)
+        is_new = positions < 0
+        unique_nodes = np.empty(len(uniques), dtype=np.int64)
+        unique_nodes[~is_new] = known_nodes[positions[~is_new]]
+        unique_nodes[is_new] = next_node + np.arange(int(is_new.sum()), dtype=np.int64)
+        next_node += int(is_new.sum())
+        nodes[entity] = unique_nodes[codes]
+        new_ids[entity] = np.asarray(uniques)[is_new]
+        # First row each new entity appears in, for its attributes
+        first_rows[entity] = np.unique(codes, return_index=True)[1][is_new]
+
+    num_transactions = len(transaction_ids)
+    transaction_nodes = next_node + np.arange(num_transactions, dtype=np.int64)
+    x = np.concatenate([
+        customer_features(_column(columns, "customer_risk_score", 0.0, np.float32)[first_rows["customer"]]),
+        merchant_features(
+            _column(columns, "merchant_risk_score", 0.0, np.float32)[first_rows["merchant"]],
+            _column(columns, "merchant_category", "other", object)[first_rows["merchant"]]
+        ),
+        transaction_features(
+            _column(columns, "amount", 0.0, np.float64),
+            _column(columns, "timestamp", 0.0, np.float64)
+        ),
+    ])
+    if feature_stats is None:
+        feature_stats = compute_feature_stats(x)
+    x = normalize_features(x, feature_stats)
+
+    node_type = np.concatenate([
+        np.full(len(new_ids["customer"]), CUSTOMER, dtype=np.int8),
+        np.full(len(new_ids["merchant"]), MERCHANT, dtype=np.int8),
+        np.full(num_transactions, TRANSACTION, dtype=np.int8),
+    ])
+    y = np.zeros(len(node_type), dtype=np.int64)
+    y[len(node_type) - num_transactions:] = _column(columns, "is_fraudulent", False, bool)
+
+    timestamps = _column(columns, "timestamp", np.nan, np.float64)
+    return {
+        "x": x,
+        "y": y,
+        "node_type": node_type,
+        "customer_ids": new_ids["customer"].astype(str),
+        "merchant_ids": new_ids["merchant"].astype(str),
+        "transaction_ids": transaction_ids.astype(str),
+        "edges_MADE": np.stack([nodes["customer"], transaction_nodes]),
+        "edges_WITH": np.stack([transaction_nodes, nodes["merchant"]]),
+        "feature_stats": feature_stats,
+        # Neo4j's datetime({epochSeconds}) only accepts an integer; timestamps are whole seconds anyway
+        "watermark": int(np.nanmax(timestamps)) if num_transactions and not np.isnan(timestamps).all() else None,
+    }
+
+
+class GraphSnapshot:
+    """Append-only on-disk snapshot of the transaction graph.
+
+    Each export writes a segment directory of ``.npy`` arrays: node features,
+    labels and node types for the nodes it adds, string id maps for new
+    customers, merchants and transactions, and a ``(2, E)`` COO array per
+    relation in global node indices. ``manifest.json`` lists the segments,
+    the feature statistics every segment is normalised with, and the
+    timestamp watermark the next delta export reads from.
+
+    Nodes are numbered in append order across segments, so a delta never
+    renumbers existing nodes. ``compact()`` merges all segments into one that
+    also carries the symmetric training ``edge_index``/``edge_type`` and a
+    CSR per relation, so a trainer can map it with no copies.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._manifest_path = self.path / "manifest.json"
+        self._lock = threading.Lock()
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        if self._manifest_path.exists():
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        return {
+            "format_version": FORMAT_VERSION,
+            "version": 0,
+            "feature_names": list(FEATURE_NAMES),
+            "relations": list(RELATIONS),
+            "feature_stats": None,
+            "num_nodes": 0,
+            "watermark": None,
+            "segments": [],
+        }
+
+    def _write_manifest(self, manifest):
+        manifest = {**manifest, "version": manifest["version"] + 1, "updated_at": time.time()}
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+        self.manifest = manifest
+
+    @contextmanager
+    def _locked(self):
+        # The API server and spawned training workers write the same directory, so
+        # segment allocation and the manifest commit also need a cross-process lock
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @property
+    def exists(self):
+        return bool(self.manifest["segments"])
+
+    def _load_array(self, segment, name, mmap=True):
+        # Copy-on-write maps are zero-copy yet writable, which torch.from_numpy expects
+        return np.load(self.path / segment["name"] / f"{name}.npy", mmap_mode="c" if mmap else None)
+
+    def _concat(self, name, mmap=True):
+        arrays = [self._load_array(segment, name, mmap) for segment in self.manifest["segments"]]
+        # Edge arrays are (2, E) and grow along their second axis
+        return arrays[0] if len(arrays) == 1 else np.concatenate(arrays, axis=1 if name.startswith("edges_") else 0)
+
+    def known_entities(self):
+        """``{entity: (pd.Index of ids, global node indices)}`` across all segments."""
+        known = {}
+        for entity, node_type in ENTITY_TYPES.items():
+            ids, nodes = [], []
+            for segment in self.manifest["segments"]:
+                segment_types = self._load_array(segment, "node_type")
+                ids.append(self._load_array(segment, f"{entity}_ids", mmap=False))
+                nodes.append(segment["node_offset"] + np.flatnonzero(segment_types == node_type))
+            known[entity] = (
+                pd.Index(np.concatenate(ids) if ids else np.empty(0, dtype=str)),
+                np.concatenate(nodes) if nodes else np.empty(0, dtype=np.int64),
+            )
+        return known
+
+    def _write_segment(self, arrays, manifest, extra_files=()):
+        number = max((int(segment["name"].split("-")[1]) for segment in self.manifest["segments"]), default=-1) + 1
+        name = f"segment-{number:06d}"
+        tmp_dir = self.path / f"{name}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        files = ("x", "y", "node_type", "customer_ids", "merchant_ids", "transaction_ids", "edges_MADE", "edges_WITH")
+        for file_name in files + tuple(extra_files):
+            np.save(tmp_dir / f"{file_name}.npy", np.ascontiguousarray(arrays[file_name]))
+        os.replace(tmp_dir, self.path / name)
+        return {
+            "name": name,
+            "node_offset": manifest["num_nodes"],
+            "num_nodes": int(len(arrays["node_type"])),
+            "num_customers": int(len(arrays["customer_ids"])),
+            "num_merchants": int(len(arrays["merchant_ids"])),
+            "num_transactions": int(len(arrays["transaction_ids"])),
+            "num_edges": {relation: int(arrays[f"edges_{relation}"].shape[1]) for relation in RELATIONS},
+            "watermark": arrays["watermark"],
+            "created_at": time.time(),
+        }
+
+    def append(self, columns):
+        """Append training columns (see ``training_data.TRAINING_COLUMNS``) as a new segment."""
+        with self._locked():
+            start = time.perf_counter()
+            manifest = self.manifest = self._read_manifest()
+            arrays = build_segment_arrays(
+                columns, manifest["feature_stats"], self.known_entities(), manifest["num_nodes"]
+            )
+            if not len(arrays["transaction_ids"]):
+                return None
+
+            segment = self._write_segment(arrays, manifest)
+            watermarks = [w for w in (manifest["watermark"], segment["watermark"]) if w is not None]
+            self._write_manifest({
+                **manifest,
+                "feature_stats": arrays["feature_stats"],
+                "num_nodes": manifest["num_nodes"] + segment["num_nodes"],
+                "watermark": max(watermarks) if watermarks else None,
+                "segments": manifest["segments"] + [segment],
+            })
+            logger.info(
+                f"Wrote snapshot {segment['name']} with {segment['num_transactions']} transactions "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+            return segment
+
+    def export(self, reader, full=False):
+        """Export from a ``Neo4jTrainingDataReader``: everything, or only rows past the watermark."""
+        if full:
+            self.clear()
+        return self.append(reader.read(since=self._read_manifest()["watermark"]))
+
+    def clear(self):
+        with self._locked():
+            # Keep the lock file: other processes may be waiting on it
+            for child in self.path.iterdir():
+                if child.name == ".lock":
+                    continue
+                if child.is_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    child.unlink(missing_ok=True)
+            self.manifest = self._read_manifest()
+
+    def compact(self):
+        """Merge all segments into one, adding training edges and per-relation CSR."""
+        with self._locked():
+            manifest = self.manifest = self._read_manifest()
+            if len(manifest["segments"]) == 1 and "edge_index" in manifest["segments"][0].get("files", ()):
+                return manifest["segments"][0]
+
+            arrays = {
+                name: self._concat(name, mmap=False)
+                for name in ("x", "y", "node_type", "customer_ids", "merchant_ids", "transaction_ids",
+                             "edges_MADE", "edges_WITH")
+            }
+            arrays["watermark"] = manifest["watermark"]
+            num_nodes = manifest["num_nodes"]
+            arrays["edge_index"], arrays["edge_type"] = self._training_edges(arrays)
+            extra_files = ["edge_index", "edge_type"]
+            for relation in RELATIONS:
+                indptr, indices = _edge_csr(arrays[f"edges_{relation}"], num_nodes)
+                arrays[f"csr_{relation}_indptr"], arrays[f"csr_{relation}_indices"] = indptr, indices
+                extra_files += [f"csr_{relation}_indptr", f"csr_{relation}_indices"]
+
+            old_segments = manifest["segments"]
+            segment = self._write_segment(arrays, {**manifest, "num_nodes": 0}, extra_files)
+            segment["files"] = extra_files
+            self._write_manifest({**manifest, "segments": [segment]})
+            # Old segments are only removed once the manifest no longer points at them
+            for old in old_segments:
+                shutil.rmtree(self.path / old["name"], ignore_errors=True)
+            return segment
+
+    @staticmethod
+    def _training_edges(arrays):
+        # Message passing runs over both directions of every relationship
+        made, with_ = arrays["edges_MADE"], arrays["edges_WITH"]
+        edge_index = np.concatenate([made, with_, made[::-1], with_[::-1]], axis=1)
+        edge_type = np.concatenate([
+            np.full(made.shape[1], RELATIONS.index("MADE"), dtype=np.int64),
+            np.full(with_.shape[1], RELATIONS.index("WITH"), dtype=np.int64),
+            np.full(made.shape[1], RELATIONS.index("MADE"), dtype=np.int64),
+            np.full(with_.shape[1], RELATIONS.index("WITH"), dtype=np.int64),
+        ])
+        return edge_index, edge_type
+
+    def load_graph_arrays(self):
+        """Load the snapshot in the ``graph_builder.build_graph_arrays`` layout.
+
+        A compacted snapshot is returned as memory maps with no copies; a
+        snapshot with pending deltas is concatenated in memory.
+        """
+        start = time.perf_counter()
+        # Re-read: another process (e.g. a training job) may have written a segment
+        manifest = self.manifest = self._read_manifest()
+        if not manifest["segments"]:
+            raise ValueError(f"No graph snapshot found at {self.path}")
+
+        segments = manifest["segments"]
+        compacted = len(segments) == 1 and "edge_index" in segments[0].get("files", ())
+        arrays = {name: self._concat(name) for name in ("x", "y", "node_type")}
+        if compacted:
+            arrays["edge_index"] = self._load_array(segments[0], "edge_index")
+            arrays["edge_type"] = self._load_array(segments[0], "edge_type")
+        else:
+            arrays["edge_index"], arrays["edge_type"] = self._training_edges({
+                "edges_MADE": self._concat("edges_MADE"), "edges_WITH": self._concat("edges_WITH")
+            })
+        arrays["transaction_mask"] = arrays["node_type"] == TRANSACTION
+
+        known = self.known_entities()
+        for entity in ENTITY_TYPES:
+            arrays[f"{entity}_ids"] = known[entity][0].to_numpy()
+            arrays[f"{entity}_nodes"] = known[entity][1]
+        arrays["feature_stats"] = manifest["feature_stats"]
+        # Type blocks are contiguous only when nodes were written in a single export
+        node_type = arrays["node_type"]
+        arrays["offsets"] = {
+            entity: int(np.searchsorted(node_type, value)) for entity, value in ENTITY_TYPES.items()
+        } if bool(np.all(node_type[1:] >= node_type[:-1])) else None
+        arrays["build_stats"] = {
+            "build_seconds": time.perf_counter() - start,
+            "snapshot_version": manifest["version"],
+            "snapshot_segments": len(segments),
+            "num_nodes": manifest["num_nodes"],
+            "num_edges": int(arrays["edge_index"].shape[1]),
+            "num_customers": len(arrays["customer_ids"]),
+            "num_merchants": len(arrays["merchant_ids"]),
+            "num_transactions": len(arrays["transaction_ids"]),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+        return arrays
+
+    def stats(self):
+        # Re-read: another process (e.g. a training job) may have written a segment
+        manifest = self.manifest = self._read_manifest()
+        return {
+            "version": manifest["version"],
+            "segments": len(manifest["segments"]),
+            "num_nodes": manifest["num_nodes"],
+            "num_transactions": sum(segment["num_transactions"] for segment in manifest["segments"]),
+            "watermark": manifest["watermark"],
+        }
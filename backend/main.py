@@ -1,13 +1,35 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import uvicorn
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from neo4j import GraphDatabase
 
 from .database import SessionLocal, engine
 from . import models, schemas, crud
 from .graph_rag import GraphRAG
-from .gnn_trainer import GNNTrainer
+from .training_jobs import TrainingJobManager, JobLimitError
+from .graph_snapshot import GraphSnapshot
+from .gnn_scorer import GNNScorer
+from .model_store import ModelStore
+from .training_data import Neo4jTrainingDataReader
+from .feature_store import FeatureStore
+from .score_cache import ScoreCache
+from .metrics import metrics
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # Optional: only needed for per-request profiling
+    Profiler = None
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Credit Fraud Detection API")
 
@@ -20,6 +42,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request sampling profiler, enabled with ENABLE_PROFILING=true and an X-Profile: 1 header
+ENABLE_PROFILING = os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "./data/profiles"))
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not (ENABLE_PROFILING and request.headers.get("X-Profile") == "1"):
+        return await call_next(request)
+    if Profiler is None:
+        logger.warning("X-Profile requested but pyinstrument is not installed")
+        return await call_next(request)
+
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    name = request.url.path.strip("/").replace("/", "_") or "root"
+    profile_path = PROFILE_DIR / f"{int(time.time() * 1000)}-{name}.html"
+    profile_path.write_text(profiler.output_html())
+    response.headers["X-Profile-Path"] = str(profile_path)
+    return response
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -28,9 +75,121 @@ def get_db():
     finally:
         db.close()
 
-# Initialize GraphRAG and GNN Trainer
-graph_rag = GraphRAG()
-gnn_trainer = GNNTrainer()
+# Initialize the feature store, GraphRAG and the GNN training job runner
+feature_store = FeatureStore()
+score_cache = ScoreCache(
+    max_entries=int(os.getenv("SCORE_CACHE_SIZE", "100000")),
+    ttl_seconds=float(os.getenv("SCORE_CACHE_TTL_SECONDS", "300"))
+)
+crud.register_transaction_listener(feature_store.on_transaction_created)
+crud.register_transaction_listener(score_cache.on_transaction_created)
+# Online GNN scoring from the latest checkpoint; reloaded after each successful training job
+gnn_scorer = GNNScorer()
+model_store = ModelStore(os.getenv("MODEL_DIR", "./data/models"))
+# numpy, torchscript (fp32 head) or int8 (dynamically quantized head)
+GNN_SCORER_BACKEND = os.getenv("GNN_SCORER_BACKEND", "numpy")
+crud.register_transaction_listener(gnn_scorer.on_transaction_created)
+
+def load_gnn_model(version=None):
+    state = model_store.load_scorer_state(version)
+    head = None
+    if GNN_SCORER_BACKEND in ("torchscript", "int8"):
+        import torch
+        head = torch.jit.load(str(model_store.head_path(state["version"], quantized=GNN_SCORER_BACKEND == "int8")))
+    gnn_scorer.load_state(state, head=head)
+
+def load_trained_model(result):
+    if result.get("model_version"):
+        load_gnn_model(result["model_version"])
+
+def warm_gnn_model():
+    try:
+        load_gnn_model()
+    except FileNotFoundError:
+        logger.info("No trained GNN model found; gnn_score stays empty until a training job finishes")
+    except Exception as e:
+        logger.warning(f"Loading the latest GNN model failed: {str(e)}")
+graph_rag = GraphRAG(feature_store=feature_store, score_cache=score_cache)
+training_jobs = TrainingJobManager(
+    max_concurrent=int(os.getenv("TRAINING_MAX_CONCURRENT_JOBS", "1")),
+    max_pending=int(os.getenv("TRAINING_MAX_PENDING_JOBS", "4")),
+    on_success=load_trained_model
+)
+graph_snapshot = GraphSnapshot(os.getenv("GRAPH_SNAPSHOT_DIR", "./data/graph_snapshot"))
+
+def collect_cache_metrics():
+    # Point-in-time cache and store sizes, read whenever /metrics is scraped
+    samples = []
+    for name, value in score_cache.stats().items():
+        samples.append((f"score_cache_{name}", value, {}))
+    for name, value in feature_store.stats().items():
+        samples.append((f"feature_store_{name}", int(value), {}))
+    if hasattr(graph_rag.embeddings, "stats"):
+        for name, value in graph_rag.embeddings.stats().items():
+            samples.append((f"embedding_cache_{name}", value, {}))
+    for name, value in graph_rag.rule_engine.stats()["fired"].items():
+        samples.append(("rule_fired", value, {"rule": name}))
+    for name, value in gnn_scorer.stats().items():
+        samples.append((f"gnn_scorer_{name}", value, {}))
+    for status, count in training_jobs.stats().items():
+        samples.append(("training_jobs_current", count, {"status": status}))
+    return samples
+
+metrics.register_collector(collect_cache_metrics)
+
+FEATURE_STORE_SOURCE = os.getenv("FEATURE_STORE_SOURCE", "postgres")
+
+MAX_BATCH_SIZE = int(os.getenv("ANALYZE_MAX_BATCH_SIZE", "5000"))
+# Write computed scores to Transaction.fraud_score and serve them on later reads until a
+# write to the transaction's customer or merchant clears Transaction.fraud_scored_at
+PERSIST_FRAUD_SCORES = os.getenv("PERSIST_FRAUD_SCORES", "false").lower() == "true"
+
+def rebuild_feature_store(source):
+    if source == "postgres":
+        feature_store.rebuild_from_postgres(engine)
+    elif source == "neo4j":
+        with GraphDatabase.driver(
+            os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+            auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password"))
+        ) as driver:
+            feature_store.rebuild_from_neo4j(driver)
+    else:
+        raise ValueError(f"Unknown feature store source: {source}")
+
+def export_graph_snapshot(full, compact):
+    with GraphDatabase.driver(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password"))
+    ) as driver:
+        reader = Neo4jTrainingDataReader(
+            driver,
+            page_size=int(os.getenv("TRAINING_FETCH_PAGE_SIZE", "50000")),
+            partitions=int(os.getenv("TRAINING_FETCH_PARTITIONS", "4"))
+        )
+        segment = graph_snapshot.export(reader, full=full)
+    if compact and graph_snapshot.exists:
+        graph_snapshot.compact()
+    return segment
+
+def warm_feature_store():
+    try:
+        rebuild_feature_store(FEATURE_STORE_SOURCE)
+        logger.info(f"Feature store loaded from {FEATURE_STORE_SOURCE}: {feature_store.stats()}")
+    except Exception as e:
+        logger.warning(f"Feature store warm-up failed, scoring without customer aggregates: {str(e)}")
+
+@app.on_event("startup")
+async def startup():
+    # Warm the feature store off the event loop; GraphRAG scores without customer aggregates until ready
+    if FEATURE_STORE_SOURCE != "none":
+        asyncio.get_running_loop().run_in_executor(None, warm_feature_store)
+    # Load the latest model checkpoint in the background; gnn_score is None until it is ready
+    asyncio.get_running_loop().run_in_executor(None, warm_gnn_model)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await graph_rag.close()
+    await asyncio.get_running_loop().run_in_executor(None, training_jobs.shutdown)
 
 @app.get("/")
 def read_root():
@@ -38,7 +197,7 @@ def read_root():
 
 @app.post("/transactions/", response_model=schemas.Transaction)
 def create_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(get_db)):
-    return crud.create_transaction(db=db, transaction=transaction)
+    return crud.create_transaction(db=db, transaction=transaction, invalidate_scores=PERSIST_FRAUD_SCORES)
 
 @app.get("/transactions/", response_model=List[schemas.Transaction])
 def read_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -46,20 +205,167 @@ def read_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(get
     return transactions
 
 @app.post("/analyze-fraud/")
-async def analyze_fraud(transaction_id: int, db: Session = Depends(get_db)):
+async def analyze_fraud(transaction_id: int, refresh: bool = False, db: Session = Depends(get_db)):
     transaction = crud.get_transaction(db, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
+
+    # GNN probability from cached entity state; None until a model has been trained
+    with metrics.timer("gnn_score"):
+        gnn_score = gnn_scorer.score_transactions([transaction])[0]
+
+    # Scores loaded with the data (e.g. generated labels) have no fraud_scored_at and are recomputed
+    if PERSIST_FRAUD_SCORES and not refresh and transaction.fraud_scored_at is not None:
+        return {"fraud_score": transaction.fraud_score, "gnn_score": gnn_score, "transaction_id": transaction_id}
+
     # Use GraphRAG to analyze the transaction
-    fraud_score = await graph_rag.analyze_transaction(transaction)
-    return {"fraud_score": fraud_score, "transaction_id": transaction_id}
-
-@app.post("/train-gnn/")
-async def train_gnn():
-    # Train the GNN model
-    training_results = await gnn_trainer.train()
-    return {"status": "success", "results": training_results}
+    generation = score_cache.generation
+    with metrics.in_flight("analyze_fraud"):
+        fraud_score = await graph_rag.analyze_transaction(transaction)
+    # A write that landed while scoring has already cleared older scores; do not persist a stale one
+    if PERSIST_FRAUD_SCORES and score_cache.is_current(transaction.customer_id, transaction.merchant_id, generation):
+        crud.update_fraud_scores(db, {transaction_id: fraud_score})
+    return {"fraud_score": fraud_score, "gnn_score": gnn_score, "transaction_id": transaction_id}
+
+@app.post("/analyze-fraud/batch/", response_model=List[schemas.FraudAnalysisResult])
+async def analyze_fraud_batch(request: schemas.FraudAnalysisBatchRequest, refresh: bool = False,
+                              db: Session = Depends(get_db)):
+    if len(request.transaction_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {MAX_BATCH_SIZE} transactions")
+    transactions = {t.id: t for t in crud.get_transactions_by_ids(db, request.transaction_ids)}
+
+    # Persisted scores are served as in /analyze-fraud/; only the rest go through GraphRAG
+    fraud_scores = {}
+    if PERSIST_FRAUD_SCORES and not refresh:
+        fraud_scores = {
+            transaction_id: transaction.fraud_score
+            for transaction_id, transaction in transactions.items()
+            if transaction.fraud_scored_at is not None
+        }
+    pending_ids = [transaction_id for transaction_id in request.transaction_ids if transaction_id not in fraud_scores]
+
+    if pending_ids:
+        # Score the rest with a single graph round-trip; scores keep input order
+        generation = score_cache.generation
+        with metrics.in_flight("analyze_fraud_batch"):
+            computed = dict(zip(pending_ids, await graph_rag.analyze_transactions(pending_ids)))
+        fraud_scores.update(computed)
+        if PERSIST_FRAUD_SCORES:
+            # Skip scores whose neighbourhood a write changed while they were computed
+            crud.update_fraud_scores(db, {
+                transaction_id: fraud_score
+                for transaction_id, fraud_score in computed.items()
+                if transaction_id in transactions and score_cache.is_current(
+                    transactions[transaction_id].customer_id, transactions[transaction_id].merchant_id, generation
+                )
+            })
+
+    gnn_scores = {}
+    if gnn_scorer.ready and transactions:
+        with metrics.timer("gnn_score"):
+            gnn_scores = dict(zip(transactions, gnn_scorer.score_transactions(list(transactions.values()))))
+    return [
+        {
+            "transaction_id": transaction_id,
+            "fraud_score": fraud_scores.get(transaction_id),
+            "gnn_score": gnn_scores.get(transaction_id)
+        }
+        for transaction_id in request.transaction_ids
+    ]
+
+@app.post("/gnn-score/", response_model=List[schemas.GNNScoreResult])
+def score_transactions_gnn(request: schemas.GNNScoreRequest):
+    # Score transactions that need not be stored yet, e.g. before authorisation
+    if len(request.transactions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds {MAX_BATCH_SIZE} transactions")
+    if not gnn_scorer.ready:
+        raise HTTPException(status_code=503, detail="No trained GNN model is loaded")
+    with metrics.timer("gnn_score"):
+        gnn_scores = gnn_scorer.score_transactions(request.transactions)
+    return [
+        {"transaction_id": transaction.id, "gnn_score": gnn_score}
+        for transaction, gnn_score in zip(request.transactions, gnn_scores)
+    ]
+
+@app.post("/feature-store/rebuild/")
+async def rebuild_features(source: str = "postgres"):
+    if source not in ("postgres", "neo4j"):
+        raise HTTPException(status_code=400, detail="source must be 'postgres' or 'neo4j'")
+    await asyncio.get_running_loop().run_in_executor(None, rebuild_feature_store, source)
+    return {"status": "success", "feature_store": feature_store.stats()}
+
+@app.post("/train-gnn/", status_code=202)
+def train_gnn(request: Optional[schemas.TrainingJobRequest] = None):
+    # Queue a training job in the process pool; poll or stream it by job id
+    options = {} if request is None else request.model_dump(exclude_none=True)
+    if options.get("mode", "full") not in ("full", "sampled", "sign"):
+        raise HTTPException(status_code=400, detail="mode must be 'full', 'sampled' or 'sign'")
+    if options.get("source", "neo4j") not in ("neo4j", "snapshot"):
+        raise HTTPException(status_code=400, detail="source must be 'neo4j' or 'snapshot'")
+    if options.get("epochs", 1) < 1:
+        raise HTTPException(status_code=400, detail="epochs must be at least 1")
+    try:
+        job = training_jobs.submit(options)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/train-gnn/")
+def list_training_jobs():
+    return [job.to_dict() for job in training_jobs.jobs.values()]
+
+def get_training_job(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@app.get("/train-gnn/{job_id}")
+def read_training_job(job_id: str):
+    return get_training_job(job_id).to_dict()
+
+@app.get("/train-gnn/{job_id}/events")
+def stream_training_events(job_id: str, after: int = 0):
+    # Newline-delimited JSON: one line per stage/epoch event, then a final "finished" line
+    get_training_job(job_id)
+
+    async def lines():
+        async for event in training_jobs.stream_events(job_id, after=after):
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/train-gnn/{job_id}/cancel")
+def cancel_training_job(job_id: str):
+    get_training_job(job_id)
+    return training_jobs.cancel(job_id).to_dict()
+
+@app.get("/models/")
+def read_models():
+    return {**model_store.stats(), "loaded": gnn_scorer.version, "backend": GNN_SCORER_BACKEND}
+
+@app.post("/models/load/")
+async def load_model(version: Optional[str] = None):
+    # Switch the online scorer to a checkpoint (default: the latest one)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, load_gnn_model, version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"status": "success", "loaded": gnn_scorer.version}
+
+@app.get("/graph-snapshot/")
+def read_graph_snapshot():
+    return graph_snapshot.stats()
+
+@app.post("/graph-snapshot/")
+async def create_graph_snapshot(full: bool = False, compact: bool = False):
+    # Append transactions past the watermark (or re-export everything) and optionally compact
+    segment = await asyncio.get_running_loop().run_in_executor(None, export_graph_snapshot, full, compact)
+    return {"status": "success", "segment": segment, "snapshot": graph_snapshot.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
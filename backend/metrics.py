@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# Latency buckets in seconds, from sub-millisecond cache hits up to long training epochs
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a ring buffer of recent samples for quantiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=2048):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._window = np.zeros(window, dtype=np.float64)
+        self._filled = 0
+        self._next = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self._window[self._next] = value
+        self._next = (self._next + 1) % len(self._window)
+        self._filled = min(self._filled + 1, len(self._window))
+
+    def quantiles(self, quantiles=QUANTILES):
+        if not self._filled:
+            return {q: 0.0 for q in quantiles}
+        values = np.quantile(self._window[:self._filled], quantiles)
+        return dict(zip(quantiles, values.tolist()))
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format.
+
+    Stage latencies are histograms (buckets for Prometheus aggregation) and are
+    also exported as p50/p95/p99 over a sliding window of recent samples, so
+    the endpoint is useful without a Prometheus server in front of it.
+    """
+
+    def __init__(self, namespace="fraud"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._gauges = {}
+        self._counters = {}
+        self._collectors = []
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_gauge(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, stage, **labels):
+        """Time a block into the ``stage_duration_seconds`` histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    @contextmanager
+    def in_flight(self, operation):
+        """Track concurrent executions of ``operation`` and time it end to end."""
+        self.add_gauge("in_flight", 1, operation=operation)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_gauge("in_flight", -1, operation=operation)
+            self.observe("operation_duration_seconds", time.perf_counter() - start, operation=operation)
+
+    def register_collector(self, collector):
+        """Register ``collector() -> [(name, value, labels_dict), ...]`` read as gauges on render."""
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "histograms": {
+                    key: {
+                        "count": h.count,
+                        "sum": h.total,
+                        "quantiles": h.quantiles(),
+                        "buckets": list(h.bucket_counts),
+                        "bounds": h.buckets
+                    }
+                    for key, h in self._histograms.items()
+                },
+                "gauges": dict(self._gauges),
+                "counters": dict(self._counters)
+            }
+
+    def render(self):
+        snapshot = self.snapshot()
+        gauges = dict(snapshot["gauges"])
+        for collector in self._collectors:
+            for name, value, labels in collector():
+                gauges[self._key(name, labels)] = value
+
+        lines = []
+        seen = set()
+
+        def declare(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), data in sorted(snapshot["histograms"].items()):
+            full_name = f"{self.namespace}_{name}"
+            declare(full_name, "histogram")
+            cumulative = 0
+            for bound, count in zip(data["bounds"] + (float("inf"),), data["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {data['sum']}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {data['count']}")
+
+        for (name, labels), data in sorted(snapshot["histograms"].items()):
+            full_name = f"{self.namespace}_{name}_window"
+            declare(full_name, "summary")
+            for q, value in data["quantiles"].items():
+                lines.append(f"{full_name}{_format_labels(labels + (('quantile', str(q)),))} {value}")
+
+        for (name, labels), value in sorted(snapshot["counters"].items()):
+            full_name = f"{self.namespace}_{name}_total"
+            declare(full_name, "counter")
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        for (name, labels), value in sorted(gauges.items()):
+            full_name = f"{self.namespace}_{name}"
+            declare(full_name, "gauge")
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
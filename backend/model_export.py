@@ -0,0 +1,91 @@
+import torch
+import torch.nn as nn
+
+from .gnn_scorer import TRANSACTION_DEGREE
+
+
+class ScoringHead(nn.Module):
+    """The online scoring step of ``GNNScorer`` as a torch module.
+
+    Only the request-time projections are ``nn.Linear`` layers (copies of
+    the conv ``lin`` weights plus the classifier), so dynamic quantization
+    turns exactly those into int8 kernels while the cached entity state
+    stays fp32.
+    """
+
+    def __init__(self, weights):
+        super().__init__()
+        hidden, num_features = weights["conv1_weight"].shape
+        self.lin1 = nn.Linear(num_features, hidden, bias=False)
+        self.lin2 = nn.Linear(hidden, hidden)
+        self.classifier = nn.Linear(hidden, weights["classifier_weight"].shape[0])
+        self.bias1 = nn.Parameter(torch.from_numpy(weights["conv1_bias"].copy()), requires_grad=False)
+        with torch.no_grad():
+            self.lin1.weight.copy_(torch.from_numpy(weights["conv1_weight"]))
+            self.lin2.weight.copy_(torch.from_numpy(weights["conv2_weight"]))
+            self.lin2.bias.copy_(torch.from_numpy(weights["conv2_bias"]))
+            self.classifier.weight.copy_(torch.from_numpy(weights["classifier_weight"]))
+            self.classifier.bias.copy_(torch.from_numpy(weights["classifier_bias"]))
+        self.eval()
+
+    def forward(self, transaction_x, customer_projection, customer_sum, customer_degree,
+                merchant_projection, merchant_sum, merchant_degree, is_new):
+        transaction_projection = self.lin1(transaction_x)
+        incoming = transaction_projection / (TRANSACTION_DEGREE ** 0.5)
+
+        customer_degree = customer_degree + is_new
+        merchant_degree = merchant_degree + is_new
+        customer_sqrt = customer_degree.sqrt().unsqueeze(1)
+        merchant_sqrt = merchant_degree.sqrt().unsqueeze(1)
+        customer_hidden = torch.relu(
+            (customer_sum + is_new.unsqueeze(1) * incoming + customer_projection / customer_sqrt) / customer_sqrt
+            + self.bias1
+        )
+        merchant_hidden = torch.relu(
+            (merchant_sum + is_new.unsqueeze(1) * incoming + merchant_projection / merchant_sqrt) / merchant_sqrt
+            + self.bias1
+        )
+        customer_weight = 1.0 / (TRANSACTION_DEGREE ** 0.5 * customer_sqrt)
+        merchant_weight = 1.0 / (TRANSACTION_DEGREE ** 0.5 * merchant_sqrt)
+
+        transaction_hidden = torch.relu(
+            transaction_projection / TRANSACTION_DEGREE
+            + customer_projection * customer_weight + merchant_projection * merchant_weight
+            + self.bias1
+        )
+        aggregated = (
+            transaction_hidden / TRANSACTION_DEGREE
+            + customer_hidden * customer_weight + merchant_hidden * merchant_weight
+        )
+        logits = self.classifier(self.lin2(aggregated))
+        return torch.softmax(logits, dim=1)[:, 1]
+
+
+def _example_inputs(num_features, hidden, batch_size=4):
+    return (
+        torch.zeros(batch_size, num_features),
+        torch.zeros(batch_size, hidden), torch.zeros(batch_size, hidden), torch.ones(batch_size),
+        torch.zeros(batch_size, hidden), torch.zeros(batch_size, hidden), torch.ones(batch_size),
+        torch.ones(batch_size),
+    )
+
+
+def build_scoring_heads(weights):
+    """Return ``(fp32_head, int8_head)``; the int8 head uses dynamic quantization."""
+    head = ScoringHead(weights)
+    quantized = torch.quantization.quantize_dynamic(head, {nn.Linear}, dtype=torch.qint8)
+    return head, quantized
+
+
+def export_scoring_heads(weights, directory):
+    """Trace both heads to TorchScript under ``directory``; returns their paths."""
+    hidden, num_features = weights["conv1_weight"].shape
+    example = _example_inputs(num_features, hidden)
+    paths = {}
+    for name, head in zip(("head_fp32.pt", "head_int8.pt"), build_scoring_heads(weights)):
+        with torch.no_grad():
+            traced = torch.jit.trace(head, example)
+        path = directory / name
+        traced.save(str(path))
+        paths[name] = str(path)
+    return paths
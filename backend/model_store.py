@@ -0,0 +1,159 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENTITY_ARRAYS = ("ids", "projection", "neighbour_sum", "degree")
+
+
+class ModelStore:
+    """Versioned FraudGNN checkpoints on disk.
+
+    Each version is a directory ``v000001``, ``v000002``, ... holding:
+
+    - ``model.pt``: the torch state_dict and constructor arguments
+    - ``scorer.npz``: the online scorer state (weights, per-entity cache,
+      id maps), loadable without torch
+    - ``metadata.json``: feature normalisation stats, training options and
+      results
+    - optionally ``head_fp32.pt``/``head_int8.pt``: TorchScript scoring heads
+
+    A version directory is written under a temporary name and renamed when
+    complete, and ``LATEST`` is replaced atomically afterwards, so readers
+    never see a partial checkpoint.
+    """
+
+    def __init__(self, path, keep=5):
+        self.path = Path(path)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        # Spawned training workers save checkpoints concurrently, so version
+        # allocation and publishing also need a cross-process lock
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def version_path(self, version):
+        return self.path / version
+
+    def versions(self):
+        if not self.path.exists():
+            return []
+        return sorted(p.name for p in self.path.iterdir() if p.is_dir() and p.name.startswith("v") and "." not in p.name)
+
+    def latest_version(self):
+        latest_path = self.path / "LATEST"
+        if latest_path.exists():
+            version = latest_path.read_text().strip()
+            if (self.path / version).exists():
+                return version
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def _resolve(self, version):
+        version = version or self.latest_version()
+        if version is None:
+            raise FileNotFoundError(f"No model checkpoints in {self.path}")
+        if not (self.path / version).exists():
+            raise FileNotFoundError(f"No model checkpoint {version} in {self.path}")
+        return version
+
+    def save(self, model, model_config, scorer_state, metadata=None, export=None):
+        """Write a new version and point ``LATEST`` at it; returns the version name.
+
+        ``export(directory, version)``, if given, writes extra files (e.g. the
+        scoring heads) into the version before it is published.
+        """
+        import torch
+
+        with self._locked():
+            versions = self.versions()
+            version = f"v{int(versions[-1][1:]) + 1 if versions else 1:06d}"
+            tmp_dir = self.path / f"{version}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tmp_dir.mkdir()
+
+            torch.save({"state_dict": model.state_dict(), "config": model_config}, tmp_dir / "model.pt")
+            arrays = {f"weight_{name}": value for name, value in scorer_state["weights"].items()}
+            for entity in ("customer", "merchant"):
+                for name in ENTITY_ARRAYS:
+                    arrays[f"{entity}_{name}"] = scorer_state[entity][name]
+            arrays["customer_ids"] = np.asarray(arrays["customer_ids"]).astype(str)
+            arrays["merchant_ids"] = np.asarray(arrays["merchant_ids"]).astype(str)
+            arrays["transaction_ids"] = np.asarray(scorer_state["transaction_ids"]).astype(str)
+            np.savez(tmp_dir / "scorer.npz", **arrays)
+            with open(tmp_dir / "metadata.json", "w") as f:
+                json.dump({
+                    "version": version,
+                    "created_at": time.time(),
+                    "config": model_config,
+                    "feature_stats": scorer_state["feature_stats"],
+                    **(metadata or {}),
+                }, f, indent=2, default=str)
+            if export is not None:
+                export(tmp_dir, version)
+
+            os.replace(tmp_dir, self.path / version)
+            latest_tmp = self.path / "LATEST.tmp"
+            latest_tmp.write_text(version)
+            os.replace(latest_tmp, self.path / "LATEST")
+            self._prune(versions + [version])
+            logger.info(f"Saved model checkpoint {version} to {self.path}")
+            return version
+
+    def _prune(self, versions):
+        for version in versions[:max(0, len(versions) - self.keep)]:
+            shutil.rmtree(self.path / version, ignore_errors=True)
+
+    def load_metadata(self, version=None):
+        with open(self.path / self._resolve(version) / "metadata.json") as f:
+            return json.load(f)
+
+    def load_scorer_state(self, version=None):
+        """Load the ``gnn_scorer.build_scorer_state`` dict of a version; needs no torch."""
+        version = self._resolve(version)
+        metadata = self.load_metadata(version)
+        with np.load(self.path / version / "scorer.npz") as arrays:
+            state = {
+                "weights": {
+                    name[len("weight_"):]: arrays[name] for name in arrays.files if name.startswith("weight_")
+                },
+                "feature_stats": metadata["feature_stats"],
+                "transaction_ids": arrays["transaction_ids"],
+                "version": version,
+            }
+            for entity in ("customer", "merchant"):
+                state[entity] = {name: arrays[f"{entity}_{name}"] for name in ENTITY_ARRAYS}
+        return state
+
+    def load_model(self, version=None, device="cpu"):
+        import torch
+        from .gnn_trainer import FraudGNN
+
+        checkpoint = torch.load(self.path / self._resolve(version) / "model.pt", map_location=device)
+        model = FraudGNN(**checkpoint["config"]).to(device)
+        model.load_state_dict(checkpoint["state_dict"])
+        model.eval()
+        return model
+
+    def head_path(self, version=None, quantized=False):
+        return self.path / self._resolve(version) / ("head_int8.pt" if quantized else "head_fp32.pt")
+
+    def stats(self):
+        return {"versions": len(self.versions()), "latest": self.latest_version()}
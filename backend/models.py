@@ -12,6 +12,11 @@ class Transaction(Base):
     customer_id = Column(String)
     is_fraudulent = Column(Boolean, default=False)
     fraud_score = Column(Float, nullable=True)
+    # Set when the API persists a score it computed; cleared when the score's neighbourhood changes
+    fraud_scored_at = Column(DateTime, nullable=True)
+    # Written by scripts/score_transactions.py --scorer gnn; the API scores with the GNN online
+    gnn_score = Column(Float, nullable=True)
+    gnn_scored_at = Column(DateTime, nullable=True)
 
 class Customer(Base):
     __tablename__ = "customers"
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the original hard-coded heuristic; used when no rules file is configured
+DEFAULT_RULES = {
+    "max_score": 1.0,
+    "rules": [
+        {"name": "high_amount", "feature": "amount", "op": ">", "value": 10000, "weight": 0.3},
+        {"name": "high_related_activity", "feature": "related_count", "op": ">", "value": 10, "weight": 0.2},
+        {"name": "similar_fraud_patterns", "feature": "similar_fraud_patterns", "op": "scale", "weight": 0.1},
+    ]
+}
+
+# Features GraphRAG builds for every transaction; rules may only reference these
+FEATURES = (
+    "amount",
+    "related_count",
+    "similar_fraud_patterns",
+    "customer_risk_score",
+    "merchant_risk_score",
+    "customer_mean_amount",
+    "customer_max_amount",
+    "amount_to_customer_mean",
+)
+
+_COMPARISONS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def _compile_rule(rule, known_features=FEATURES):
+    """Turn one rule dict into ``(name, feature, fn)`` where ``fn(column) -> contribution``."""
+    name = rule["name"]
+    feature = rule["feature"]
+    op = rule["op"]
+    if feature not in known_features:
+        raise ValueError(f"Unknown feature '{feature}' in rule '{name}'")
+    weight = np.float64(rule.get("weight", 0.0))
+
+    if op in _COMPARISONS:
+        compare, value = _COMPARISONS[op], rule["value"]
+        fn = lambda column: compare(column, value) * weight
+    elif op == "between":
+        low, high = rule["value"]
+        fn = lambda column: ((column >= low) & (column <= high)) * weight
+    elif op == "in":
+        values = np.asarray(rule["value"])
+        fn = lambda column: np.isin(column, values) * weight
+    elif op == "scale":
+        # Contribution proportional to the feature value, optionally capped
+        cap = rule.get("cap")
+        if cap is None:
+            fn = lambda column: column * weight
+        else:
+            fn = lambda column: np.minimum(column * weight, np.float64(cap))
+    else:
+        raise ValueError(f"Unknown operator '{op}' in rule '{name}'")
+    return name, feature, fn
+
+
+class RuleEngine:
+    """Declarative fraud rules compiled to NumPy column operations.
+
+    Rules are loaded from a JSON file (``{"max_score": 1.0, "rules": [...]}``)
+    and re-read when the file's mtime changes, so rule edits take effect
+    without a redeploy. A file that fails to compile, e.g. a rule naming a
+    feature outside ``features``, leaves the current rules in place.
+    ``score_batch`` takes a mapping of feature name to column and scores
+    every row at once.
+    """
+
+    def __init__(self, config_path=None, reload_interval=5.0, features=FEATURES):
+        self.config_path = config_path
+        self.reload_interval = reload_interval
+        self.known_features = frozenset(features)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self.rows_scored = 0
+        self.fired = {}
+        self._reload()
+
+    def _read_config(self):
+        if self.config_path and os.path.exists(self.config_path):
+            mtime = os.path.getmtime(self.config_path)
+            with open(self.config_path) as f:
+                return json.load(f), mtime
+        return DEFAULT_RULES, None
+
+    def _reload(self):
+        config, mtime = self._read_config()
+        self._load(config)
+        # Recorded only once the rules compiled, so a file that failed is retried until it loads
+        self._mtime = mtime
+
+    def _load(self, config):
+        # Compile before swapping so a bad rules file never replaces working rules
+        rules = tuple(_compile_rule(rule, self.known_features) for rule in config["rules"])
+        features = tuple(sorted({feature for _, feature, _ in rules}))
+        # Published as one tuple so lock-free readers never pair new rules with an old feature list
+        ruleset = (config, float(config.get("max_score", 1.0)), rules, features)
+        with self._lock:
+            self._ruleset = ruleset
+            self.fired = {name: self.fired.get(name, 0) for name, _, _ in rules}
+
+    def reload_if_changed(self):
+        now = time.monotonic()
+        if not self.config_path or now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+        mtime = os.path.getmtime(self.config_path) if os.path.exists(self.config_path) else None
+        if mtime == self._mtime:
+            return False
+        try:
+            self._reload()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Keeping current fraud rules, failed to load {self.config_path}: {str(e)}")
+            return False
+        return True
+
+    @property
+    def config(self):
+        return self._ruleset[0]
+
+    @property
+    def max_score(self):
+        return self._ruleset[1]
+
+    @property
+    def rules(self):
+        return self._ruleset[2]
+
+    @property
+    def features(self):
+        return list(self._ruleset[3])
+
+    def score_batch(self, features):
+        """Score a batch given ``{feature_name: column}``; returns a float64 array."""
+        self.reload_if_changed()
+        _, max_score, rules, rule_features = self._ruleset
+        columns = {name: np.asarray(features[name], dtype=np.float64) for name in rule_features}
+        n = len(next(iter(features.values()))) if features else 0
+
+        scores = np.zeros(n, dtype=np.float64)
+        fired = {}
+        for name, feature, fn in rules:
+            contribution = fn(columns[feature])
+            scores += contribution
+            fired[name] = int(np.count_nonzero(contribution))
+
+        with self._lock:
+            self.rows_scored += n
+            for name, count in fired.items():
+                self.fired[name] = self.fired.get(name, 0) + count
+        return np.clip(scores, 0.0, max_score)
+
+    def score(self, features):
+        return float(self.score_batch({name: [value] for name, value in features.items()})[0])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rules": [name for name, _, _ in self.rules],
+                "rows_scored": self.rows_scored,
+                "fired": dict(self.fired)
+            }
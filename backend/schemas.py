@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransactionBase(BaseModel):
     amount: float
@@ -43,4 +43,39 @@ class Merchant(MerchantBase):
     id: str
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class FraudAnalysisBatchRequest(BaseModel):
+    transaction_ids: List[int]
+
+class FraudAnalysisResult(BaseModel):
+    transaction_id: int
+    fraud_score: Optional[float] = None
+    gnn_score: Optional[float] = None
+
+class GNNScoreTransaction(TransactionBase):
+    # Set for stored transactions so they are not counted twice in the graph
+    id: Optional[int] = None
+    timestamp: Optional[datetime] = None
+
+class GNNScoreRequest(BaseModel):
+    transactions: List[GNNScoreTransaction]
+
+class GNNScoreResult(BaseModel):
+    transaction_id: Optional[int] = None
+    gnn_score: float
+
+class TrainingJobRequest(BaseModel):
+    # Unset fields fall back to the TRAINING_* environment defaults
+    mode: Optional[str] = None
+    source: Optional[str] = None
+    refresh_snapshot: Optional[bool] = None
+    epochs: Optional[int] = None
+    hidden_channels: Optional[int] = None
+    learning_rate: Optional[float] = None
+    fanouts: Optional[List[int]] = None
+    batch_size: Optional[int] = None
+    val_ratio: Optional[float] = None
+    patience: Optional[int] = None
+    seed: Optional[int] = None
+    sign_hops: Optional[int] = None
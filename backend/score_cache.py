@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ScoreCache:
+    """LRU + TTL cache of fraud scores with write-driven invalidation.
+
+    Every write to a customer or merchant neighbourhood bumps a global
+    generation counter and records it against that customer and merchant.
+    An entry is only served if it was computed at or after the latest
+    invalidation of both its customer and its merchant. Callers capture
+    ``generation`` *before* computing a score, so a write racing with the
+    computation still invalidates the result.
+    """
+
+    def __init__(self, max_entries=100000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._customer_generations = {}
+        self._merchant_generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, transaction_id):
+        with self._lock:
+            entry = self._entries.get(transaction_id)
+            if entry is not None:
+                score, customer_id, merchant_id, generation, expires_at = entry
+                fresh = (
+                    expires_at > time.monotonic()
+                    and generation >= self._customer_generations.get(customer_id, 0)
+                    and generation >= self._merchant_generations.get(merchant_id, 0)
+                )
+                if fresh:
+                    self._entries.move_to_end(transaction_id)
+                    self.hits += 1
+                    return score
+                del self._entries[transaction_id]
+            self.misses += 1
+            return None
+
+    def put(self, transaction_id, score, customer_id, merchant_id, generation):
+        with self._lock:
+            self._entries[transaction_id] = (
+                score, customer_id, merchant_id, generation, time.monotonic() + self.ttl_seconds
+            )
+            self._entries.move_to_end(transaction_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_neighbourhood(self, customer_id=None, merchant_id=None):
+        with self._lock:
+            self.generation += 1
+            if customer_id is not None:
+                self._customer_generations[customer_id] = self.generation
+            if merchant_id is not None:
+                self._merchant_generations[merchant_id] = self.generation
+            self.invalidations += 1
+
+    def is_current(self, customer_id, merchant_id, generation):
+        """Whether nothing invalidated this customer or merchant since ``generation`` was captured."""
+        with self._lock:
+            return (
+                generation >= self._customer_generations.get(customer_id, 0)
+                and generation >= self._merchant_generations.get(merchant_id, 0)
+            )
+
+    def on_transaction_created(self, transaction):
+        self.invalidate_neighbourhood(transaction.customer_id, transaction.merchant_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
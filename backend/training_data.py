@@ -0,0 +1,202 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Scalar columns the graph builder needs, with the dtype each is accumulated into
+TRAINING_COLUMNS = {
+    "transaction_id": object,
+    "customer_id": object,
+    "merchant_id": object,
+    "amount": np.float64,
+    "timestamp": np.float64,
+    "is_fraudulent": bool,
+    "customer_risk_score": np.float32,
+    "merchant_risk_score": np.float32,
+    "merchant_category": object,
+}
+
+_DEFAULTS = {np.float64: np.nan, np.float32: np.nan, bool: False, object: None}
+
+
+class ColumnBuffer:
+    """Preallocated column arrays that pages of rows are copied straight into.
+
+    Capacity starts at the expected row count and doubles only if more rows
+    arrive than expected (e.g. concurrent inserts), so no per-row Python
+    objects outlive the page they arrived in.
+    """
+
+    def __init__(self, capacity, columns=TRAINING_COLUMNS):
+        self.columns = columns
+        self.size = 0
+        self.arrays = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in columns.items()}
+
+    def _grow(self, needed):
+        capacity = len(next(iter(self.arrays.values())))
+        while capacity < needed:
+            capacity *= 2
+        for name, array in self.arrays.items():
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[name] = grown
+
+    def append(self, page):
+        """Append a page given as ``{column: sequence}`` of equal lengths."""
+        n = len(page["transaction_id"])
+        if self.size + n > len(self.arrays["transaction_id"]):
+            self._grow(self.size + n)
+        for name, dtype in self.columns.items():
+            values = page[name]
+            if dtype is not object:
+                default = _DEFAULTS[dtype]
+                values = [default if v is None else v for v in values]
+            self.arrays[name][self.size:self.size + n] = values
+        self.size += n
+
+    def finish(self):
+        return {name: array[:self.size] for name, array in self.arrays.items()}
+
+
+def concatenate_columns(parts):
+    parts = [part for part in parts if len(part["transaction_id"])]
+    if not parts:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in TRAINING_COLUMNS.items()}
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([part[name] for part in parts]) for name in TRAINING_COLUMNS}
+
+
+class Neo4jTrainingDataReader:
+    """Streams training rows out of Neo4j with keyset pagination on ``Transaction.id``.
+
+    The id keyspace is cut into ``partitions`` contiguous ranges that are read
+    concurrently, each over its own session. Within a range, pages of
+    ``page_size`` transactions are fetched in id order, so every query is an
+    index-backed range scan and no page depends on an OFFSET.
+    """
+
+    def __init__(self, driver, page_size=50000, partitions=4):
+        self.driver = driver
+        self.page_size = page_size
+        self.partitions = max(1, partitions)
+
+    @staticmethod
+    def _filters(since):
+        conditions = ["t.id IS NOT NULL"]
+        if since is not None:
+            conditions.append("t.timestamp > datetime({epochSeconds: $since})")
+        return conditions
+
+    def count(self, since=None):
+        query = f"MATCH (t:Transaction) WHERE {' AND '.join(self._filters(since))} RETURN count(t) AS count"
+        with self.driver.session() as session:
+            return session.run(query, since=since).single()["count"]
+
+    def partition_bounds(self, total, since=None):
+        """Split the id keyspace into ranges of roughly equal row counts.
+
+        Returns ``[(lower, upper, expected_rows), ...]`` where ``lower`` is
+        inclusive, ``upper`` exclusive and ``None`` means unbounded.
+        """
+        partitions = min(self.partitions, max(1, total // max(self.page_size, 1)))
+        if partitions <= 1:
+            return [(None, None, total)]
+
+        # One ordered pass over the ids that picks every step-th one as a cut point
+        query = f"""
+        MATCH (t:Transaction)
+        WHERE {' AND '.join(self._filters(since))}
+        WITH t.id AS id
+        ORDER BY id
+        WITH collect(id) AS ids
+        RETURN [i IN range(1, $partitions - 1) | ids[i * $step]] AS cuts
+        """
+        step = total // partitions
+        with self.driver.session() as session:
+            cuts = session.run(query, partitions=partitions, step=step, since=since).single()["cuts"]
+        # Rows deleted since the count leave trailing cut points past the end of the list
+        cut_points = [cut for cut in cuts if cut is not None]
+
+        bounds = [None] + cut_points + [None]
+        return [
+            (bounds[i], bounds[i + 1], step if i < len(bounds) - 2 else total - step * (len(bounds) - 2))
+            for i in range(len(bounds) - 1)
+        ]
+
+    def iter_pages(self, lower=None, upper=None, since=None):
+        """Yield ``{column: list}`` pages for ids in ``[lower, upper)``."""
+        conditions = self._filters(since)
+        if lower is not None:
+            conditions.append("t.id >= $lower")
+        if upper is not None:
+            conditions.append("t.id < $upper")
+        first_page_where = " AND ".join(conditions)
+        next_page_where = " AND ".join(conditions + ["t.id > $after"])
+
+        # OPTIONAL MATCH keeps every paged transaction in the result, so the
+        # keyset cursor advances even past transactions with a missing edge
+        projection = """
+        WITH t
+        ORDER BY t.id
+        LIMIT $page_size
+        OPTIONAL MATCH (c:Customer)-[:MADE]->(t)
+        OPTIONAL MATCH (t)-[:WITH]->(m:Merchant)
+        RETURN t.id AS transaction_id,
+               c.id AS customer_id,
+               m.id AS merchant_id,
+               t.amount AS amount,
+               t.timestamp.epochSeconds AS timestamp,
+               t.is_fraudulent AS is_fraudulent,
+               c.risk_score AS customer_risk_score,
+               m.risk_score AS merchant_risk_score,
+               m.category AS merchant_category
+        """
+        after = None
+        with self.driver.session() as session:
+            while True:
+                where = first_page_where if after is None else next_page_where
+                result = session.run(
+                    f"MATCH (t:Transaction) WHERE {where} {projection}",
+                    lower=lower, upper=upper, after=after, since=since, page_size=self.page_size
+                )
+                rows = result.values(*TRAINING_COLUMNS)
+                if not rows:
+                    return
+                after = rows[-1][0]
+                columns = dict(zip(TRAINING_COLUMNS, (list(column) for column in zip(*rows))))
+                # Transactions without both endpoints cannot become graph edges
+                keep = [
+                    i for i, (customer_id, merchant_id) in enumerate(zip(columns["customer_id"], columns["merchant_id"]))
+                    if customer_id is not None and merchant_id is not None
+                ]
+                if len(keep) != len(rows):
+                    columns = {name: [values[i] for i in keep] for name, values in columns.items()}
+                yield columns
+                if len(rows) < self.page_size:
+                    return
+
+    def _read_partition(self, lower, upper, expected_rows, since):
+        buffer = ColumnBuffer(expected_rows + self.page_size)
+        for page in self.iter_pages(lower, upper, since):
+            buffer.append(page)
+        return buffer.finish()
+
+    def read(self, since=None):
+        """Read every (optionally newer than ``since``) transaction into column arrays."""
+        start = time.perf_counter()
+        total = self.count(since)
+        bounds = self.partition_bounds(total, since)
+        with ThreadPoolExecutor(max_workers=len(bounds), thread_name_prefix="training-fetch") as executor:
+            futures = [
+                executor.submit(self._read_partition, lower, upper, expected_rows, since)
+                for lower, upper, expected_rows in bounds
+            ]
+            columns = concatenate_columns([future.result() for future in futures])
+        logger.info(
+            f"Fetched {len(columns['transaction_id'])} training rows over {len(bounds)} partitions "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return columns
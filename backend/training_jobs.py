@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobLimitError(Exception):
+    """Raised when too many training jobs are already queued or running."""
+
+
+def run_training_job(options, events, cancel_event):
+    """Process-pool entry point: train with ``options`` and stream events to ``events``."""
+    # Imported here so the API process never loads torch just to queue a job
+    from .gnn_trainer import GNNTrainer, TrainingCancelled
+
+    trainer = GNNTrainer()
+    events.put({"type": "started", "time": time.time()})
+    try:
+        return trainer.fit(callback=events.put, should_stop=cancel_event.is_set, **options)
+    except TrainingCancelled as e:
+        return {"status": "cancelled", "epochs": e.epoch}
+    finally:
+        trainer.close()
+
+
+class TrainingJob:
+    def __init__(self, job_id, options):
+        self.id = job_id
+        self.options = options
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.events = []
+        self.future = None
+        self.executor = None
+        self.event_queue = None
+        self.cancel_event = None
+        # Set once every event the worker produced has been collected
+        self.drained = False
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self):
+        epochs = [event for event in self.events if event["type"] == "epoch"]
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "options": self.options,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "epochs_completed": len(epochs),
+            "last_epoch": epochs[-1] if epochs else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class TrainingJobManager:
+    """Runs GNN trainings in a process pool and tracks them as jobs.
+
+    The pool has ``max_concurrent`` workers, so extra jobs wait in the pool's
+    queue instead of competing for the same cores; at most ``max_pending``
+    jobs may be queued or running at once. Workers report progress through a
+    manager queue that a per-job thread drains into ``job.events``, and
+    cancellation is cooperative through a manager event the trainer polls
+    between steps. If a worker dies (e.g. OOM-killed), the jobs it took down
+    fail and the broken pool is replaced on the next submit.
+    """
+
+    def __init__(self, max_concurrent=1, max_pending=4, history_size=50, on_success=None,
+                 target=run_training_job):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_pending = max(self.max_concurrent, max_pending)
+        self.history_size = history_size
+        # Called with the result of every successful job, e.g. to load its checkpoint
+        self.on_success = on_success
+        # Pool entry point, called as target(options, event_queue, cancel_event)
+        self.target = target
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+
+    def _ensure_pool(self):
+        # Started on first use; spawn avoids forking a process that holds
+        # driver sockets, executor threads and possibly an initialised torch
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._manager = context.Manager()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_concurrent, mp_context=context)
+
+    def _discard_pool(self, executor):
+        # A pool whose worker died rejects every later submit; drop it so the next one starts fresh
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def submit(self, options):
+        with self._lock:
+            if len(self.active_jobs()) >= self.max_pending:
+                raise JobLimitError(f"{self.max_pending} training jobs are already queued or running")
+            self._ensure_pool()
+            job = TrainingJob(uuid.uuid4().hex, options)
+            job.event_queue = self._manager.Queue()
+            job.cancel_event = self._manager.Event()
+            self.jobs[job.id] = job
+            self._prune()
+            try:
+                job.future = self._executor.submit(self.target, options, job.event_queue, job.cancel_event)
+            except BrokenProcessPool:
+                # The pool broke before its done callbacks had run; replace it and retry once
+                logger.warning("Training process pool is broken; starting a new one")
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self._ensure_pool()
+                job.future = self._executor.submit(self.target, options, job.event_queue, job.cancel_event)
+            job.executor = self._executor
+
+        job.future.add_done_callback(lambda future: self._on_done(job, future))
+        threading.Thread(target=self._drain, args=(job,), name=f"training-job-{job.id[:8]}", daemon=True).start()
+        logger.info(f"Queued training job {job.id} with options {options}")
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        # A job no worker has picked up yet is dropped by the pool (and finished
+        # by the done callback); a running one is asked to stop
+        if not job.future.cancel():
+            job.cancel_event.set()
+            job.status = "cancelling"
+        return job
+
+    def _drain(self, job):
+        while True:
+            try:
+                event = job.event_queue.get(timeout=0.5)
+            except queue.Empty:
+                if job.future.done():
+                    break
+                continue
+            except (EOFError, OSError):
+                # Manager went away during shutdown
+                break
+            self._record_event(job, event)
+        job.drained = True
+
+    def _record_event(self, job, event):
+        if event["type"] == "started":
+            job.started_at = event["time"]
+            if job.status == "queued":
+                job.status = "running"
+        elif event["type"] in ("epoch", "stage"):
+            # Workers have their own metrics registry, so re-record timings here
+            stage = "gnn_epoch" if event["type"] == "epoch" else event["stage"]
+            metrics.observe("stage_duration_seconds", event["seconds"], stage=stage)
+        job.events.append(event)
+
+    def _on_done(self, job, future):
+        if future.cancelled():
+            self._finish(job, "cancelled")
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            logger.error(f"Training job {job.id} failed: its worker process died")
+            self._finish(job, "failed", error=f"Training worker process died: {str(error)}")
+            self._discard_pool(job.executor)
+            return
+        if error is not None:
+            logger.error(f"Training job {job.id} failed: {str(error)}")
+            self._finish(job, "failed", error=str(error))
+            return
+        result = future.result()
+        if result.get("status") == "cancelled":
+            self._finish(job, "cancelled", result=result)
+            return
+        if self.on_success is not None:
+            try:
+                self.on_success(result)
+            except Exception as e:
+                logger.error(f"Failed to load the model from training job {job.id}: {str(e)}")
+        self._finish(job, "succeeded", result=result)
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        metrics.inc("training_jobs", status=status)
+        if job.started_at is not None:
+            metrics.observe("operation_duration_seconds", job.finished_at - job.started_at, operation="train_gnn")
+
+    def _prune(self):
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for job in finished[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job.id]
+
+    async def stream_events(self, job_id, after=0, poll_interval=0.5):
+        """Yield the job's events from index ``after`` until it has finished."""
+        job = self.jobs[job_id]
+        while True:
+            # Read the flags first so events appended meanwhile are still sent
+            done = job.finished and job.drained
+            events = job.events[after:]
+            for event in events:
+                yield event
+            after += len(events)
+            if done:
+                yield {"type": "finished", "status": job.status, "result": job.result, "error": job.error}
+                return
+            await asyncio.sleep(poll_interval)
+
+    def stats(self):
+        counts = {}
+        for job in list(self.jobs.values()):
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def shutdown(self):
+        for job in self.active_jobs():
+            if job.cancel_event is not None:
+                job.cancel_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+        self._executor = self._manager = None
@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+from pathlib import Path
+import numpy as np
+from langchain.docstore.document import Document
+
+
+class MmapVectorIndex:
+    """In-process vector index over a memory-mapped float32 matrix.
+
+    Vectors are L2-normalised on insert and appended to ``vectors.f32``, so
+    search is a cosine/dot-product scan. Small corpora are searched exactly
+    with chunked matrix products. Once the corpus passes ``ivf_threshold``
+    vectors, an IVF (inverted file) partitioning is trained with k-means and
+    each query only scans the ``nprobe`` closest partitions.
+
+    Documents live in ``documents.jsonl`` and are read by byte offset only
+    for the top-k hits, so the resident footprint per worker is the page cache
+    behind the memmap plus a few small arrays.
+    """
+
+    def __init__(self, path, embedding_function, ivf_threshold=50000, nlist=None, nprobe=8,
+                 scan_chunk_size=65536):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.scan_chunk_size = scan_chunk_size
+        self._lock = threading.Lock()
+
+        self._vectors_path = self.path / "vectors.f32"
+        self._documents_path = self.path / "documents.jsonl"
+        self._offsets_path = self.path / "offsets.u64"
+        self._centroids_path = self.path / "centroids.npy"
+        self._assignments_path = self.path / "assignments.i32"
+        self._manifest_path = self.path / "manifest.json"
+
+        self.manifest = {"dim": None, "count": 0}
+        if self._manifest_path.exists():
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+        self._open()
+
+    @property
+    def count(self):
+        return self.manifest["count"]
+
+    @property
+    def dim(self):
+        return self.manifest["dim"]
+
+    def _open(self):
+        # (Re)map the on-disk arrays for the current row count. Readers do not take the
+        # lock, so everything they use is published as one tuple in a single assignment.
+        count, dim = self.count, self.dim
+        if count:
+            vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+            offsets = np.memmap(self._offsets_path, dtype=np.uint64, mode="r", shape=(count + 1,))
+        else:
+            vectors = np.empty((0, dim or 0), dtype=np.float32)
+            offsets = np.zeros(1, dtype=np.uint64)
+
+        centroids, lists = None, None
+        if self._centroids_path.exists() and count:
+            centroids = np.load(self._centroids_path)
+            assignments = np.fromfile(self._assignments_path, dtype=np.int32, count=count)
+            lists = self._build_lists(assignments, len(centroids))
+        self._state = (count, vectors, offsets, centroids, lists)
+
+    @staticmethod
+    def _build_lists(assignments, nlist):
+        # Inverted lists as one sorted id array plus per-list boundaries
+        order = np.argsort(assignments, kind="stable").astype(np.int64)
+        boundaries = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        return order, boundaries
+
+    def _write_manifest(self):
+        tmp_path = self._manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    @staticmethod
+    def _truncate(path, size):
+        if path.exists() and path.stat().st_size > size:
+            os.truncate(path, size)
+
+    def _discard_uncommitted(self):
+        # An append that crashed before its manifest commit leaves rows past ``count``;
+        # cut every file back to the committed size so new rows line up with their ids
+        count, _, offsets, centroids, _ = self._state
+        self._truncate(self._vectors_path, count * (self.dim or 0) * 4)
+        self._truncate(self._offsets_path, (count + 1) * 8 if count else 0)
+        self._truncate(self._documents_path, int(offsets[-1]))
+        if centroids is not None:
+            self._truncate(self._assignments_path, count * 4)
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add_texts(self, texts, metadatas=None):
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding_function.embed_documents(texts)
+        return self.add_vectors(vectors, texts, metadatas)
+
+    def add_vectors(self, vectors, texts, metadatas=None):
+        # Append rows to the on-disk arrays; existing rows are never rewritten
+        vectors = self._normalize(vectors)
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            if self.dim is None:
+                self.manifest["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+            self._discard_uncommitted()
+            _, _, committed_offsets, centroids, _ = self._state
+            start = self.count
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+
+            end_offset = int(committed_offsets[-1])
+            offsets = []
+            with open(self._documents_path, "ab") as f:
+                for text, metadata in zip(texts, metadatas):
+                    line = (json.dumps({"page_content": text, "metadata": metadata}) + "\n").encode()
+                    f.write(line)
+                    end_offset += len(line)
+                    offsets.append(end_offset)
+            with open(self._offsets_path, "ab") as f:
+                if start == 0:
+                    f.write(np.zeros(1, dtype=np.uint64).tobytes())
+                f.write(np.asarray(offsets, dtype=np.uint64).tobytes())
+
+            if centroids is not None:
+                assignments = self._assign(vectors, centroids)
+                with open(self._assignments_path, "ab") as f:
+                    f.write(assignments.tobytes())
+
+            self.manifest["count"] = start + len(vectors)
+            self._write_manifest()
+            self._open()
+
+            if centroids is None and self.count >= self.ivf_threshold:
+                self._train_ivf()
+            return list(range(start, self.count))
+
+    @staticmethod
+    def _assign(vectors, centroids):
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _train_ivf(self, sample_size=100000, iterations=10, seed=0):
+        # Spherical k-means on a sample, then assign every row chunk by chunk
+        count, stored, _, _, _ = self._state
+        nlist = self.nlist or max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        sample = np.asarray(stored[sample_ids])
+        centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=len(centroids)) == 0
+            sums[empty] = centroids[empty]
+            centroids = self._normalize(sums)
+
+        np.save(self._centroids_path, centroids)
+        with open(self._assignments_path, "wb") as f:
+            for start in range(0, count, self.scan_chunk_size):
+                f.write(self._assign(np.asarray(stored[start:start + self.scan_chunk_size]), centroids).tobytes())
+        self._open()
+
+    def rebuild_ivf(self, **kwargs):
+        with self._lock:
+            self._train_ivf(**kwargs)
+
+    @staticmethod
+    def _merge_top_k(best_scores, best_ids, scores, ids, k):
+        # Keep the running top-k per query across scan chunks
+        scores = np.concatenate([best_scores, scores], axis=1)
+        ids = np.concatenate([best_ids, ids], axis=1)
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(scores, top, axis=1)
+            ids = np.take_along_axis(ids, top, axis=1)
+        return scores, ids
+
+    def _search_exact(self, state, queries, k):
+        count, vectors, _, _, _ = state
+        n = len(queries)
+        best_scores = np.empty((n, 0), dtype=np.float32)
+        best_ids = np.empty((n, 0), dtype=np.int64)
+        for start in range(0, count, self.scan_chunk_size):
+            chunk = vectors[start:start + self.scan_chunk_size]
+            scores = queries @ chunk.T
+            ids = np.broadcast_to(np.arange(start, start + len(chunk)), scores.shape)
+            best_scores, best_ids = self._merge_top_k(best_scores, best_ids, scores, ids, k)
+        return best_scores, best_ids
+
+    def _search_ivf(self, state, queries, k):
+        _, vectors, _, centroids, (order, boundaries) = state
+        nprobe = min(self.nprobe, len(centroids))
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, query in enumerate(queries):
+            candidates = np.sort(np.concatenate([order[boundaries[p]:boundaries[p + 1]] for p in probes[i]]))
+            if not len(candidates):
+                continue
+            scores = np.asarray(vectors[candidates]) @ query
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_scores[i, :len(top)] = scores[top]
+            best_ids[i, :len(top)] = candidates[top]
+        return best_scores, best_ids
+
+    def search(self, vectors, k=4, exact=None):
+        """Return ``(scores, ids)`` arrays of shape ``(len(vectors), k)``, best first."""
+        queries = self._normalize(vectors)
+        state = self._state
+        count, _, _, _, lists = state
+        k = min(k, count)
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.float32), np.empty((len(queries), 0), dtype=np.int64)
+
+        use_exact = lists is None or exact is True
+        scores, ids = self._search_exact(state, queries, k) if use_exact else self._search_ivf(state, queries, k)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def get_documents(self, ids):
+        offsets = self._state[2]
+        documents = []
+        with open(self._documents_path, "rb") as f:
+            for i in ids:
+                if i < 0:
+                    continue
+                start, end = int(offsets[i]), int(offsets[i + 1])
+                f.seek(start)
+                payload = json.loads(f.read(end - start))
+                documents.append(Document(page_content=payload["page_content"], metadata=payload["metadata"]))
+        return documents
+
+    def similarity_search_by_vectors(self, vectors, k=4):
+        _, ids = self.search(vectors, k=k)
+        return [self.get_documents(row) for row in ids]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return self.similarity_search_by_vectors([embedding], k=k)[0]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k=k)
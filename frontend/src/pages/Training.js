@@ -12,31 +12,78 @@ import {
 } from '@mui/material';
 import axios from 'axios';
 
+const API_URL = 'http://localhost:8000';
+const EPOCHS = 100;
+
 function Training() {
   const [loading, setLoading] = useState(false);
   const [trainingResult, setTrainingResult] = useState(null);
   const [error, setError] = useState(null);
   const [progress, setProgress] = useState(0);
+  const [jobId, setJobId] = useState(null);
+  const [lastEpoch, setLastEpoch] = useState(null);
+
+  const streamEvents = async (id) => {
+    // The events endpoint streams newline-delimited JSON until the job finishes
+    const response = await fetch(`${API_URL}/train-gnn/${id}/events`);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) {
+        return null;
+      }
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      for (const line of lines) {
+        if (!line) {
+          continue;
+        }
+        const event = JSON.parse(line);
+        if (event.type === 'epoch') {
+          setLastEpoch(event);
+          setProgress(Math.round((event.epoch / EPOCHS) * 100));
+        } else if (event.type === 'finished') {
+          return event;
+        }
+      }
+    }
+  };
 
   const handleTrain = async () => {
     setLoading(true);
     setError(null);
     setProgress(0);
+    setLastEpoch(null);
+    setTrainingResult(null);
 
     try {
-      const response = await axios.post('http://localhost:8000/train-gnn/');
-      setTrainingResult(response.data);
-      
-      // Simulate progress updates
-      for (let i = 0; i <= 100; i += 10) {
-        await new Promise(resolve => setTimeout(resolve, 500));
-        setProgress(i);
+      const response = await axios.post(`${API_URL}/train-gnn/`, { epochs: EPOCHS });
+      setJobId(response.data.job_id);
+      const finished = await streamEvents(response.data.job_id);
+      if (!finished) {
+        setError('Lost connection to the training job');
+      } else if (finished.status === 'succeeded') {
+        setTrainingResult({ status: finished.status, results: finished.result });
+      } else if (finished.status === 'cancelled') {
+        setError('Training was cancelled');
+      } else {
+        setError(finished.error || 'Error training the model');
       }
     } catch (error) {
       setError(error.response?.data?.detail || 'Error training the model');
     } finally {
       setLoading(false);
       setProgress(0);
+      setJobId(null);
+    }
+  };
+
+  const handleCancel = async () => {
+    if (jobId) {
+      await axios.post(`${API_URL}/train-gnn/${jobId}/cancel`);
     }
   };
 
@@ -53,14 +100,24 @@ function Training() {
               <Typography variant="h6">
                 Train GNN Model
               </Typography>
-              <Button
-                variant="contained"
-                color="primary"
-                onClick={handleTrain}
-                disabled={loading}
-              >
-                Start Training
-              </Button>
+              <Box display="flex" gap={2}>
+                <Button
+                  variant="contained"
+                  color="primary"
+                  onClick={handleTrain}
+                  disabled={loading}
+                >
+                  Start Training
+                </Button>
+                <Button
+                  variant="outlined"
+                  color="secondary"
+                  onClick={handleCancel}
+                  disabled={!jobId}
+                >
+                  Cancel
+                </Button>
+              </Box>
             </Box>
 
             {error && (
@@ -78,6 +135,11 @@ function Training() {
                 <Typography variant="body2" color="textSecondary" align="right" mt={1}>
                   {progress}%
                 </Typography>
+                {lastEpoch && (
+                  <Typography variant="body2" color="textSecondary">
+                    Epoch {lastEpoch.epoch}, Loss: {(lastEpoch.loss ?? lastEpoch.train_loss).toFixed(4)}
+                  </Typography>
+                )}
               </Box>
             )}
 
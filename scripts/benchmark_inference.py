@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from sklearn.metrics import roc_auc_score
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_test_data import generate_customer_profiles, generate_merchant_profiles, generate_transactions
+from backend.graph_builder import build_graph_arrays, to_pyg_data
+from backend.gnn_trainer import FraudGNN
+from backend.gnn_scorer import GNNScorer, build_scorer_state
+from backend.model_export import export_scoring_heads
+
+
+def build_columns(num_transactions, num_customers, num_merchants, fraud_ratio, rng):
+    """Synthetic transactions joined with their customer and merchant attributes."""
+    customers = generate_customer_profiles(num_customers, rng)
+    merchants = generate_merchant_profiles(num_merchants, rng)
+    transactions = generate_transactions(num_transactions, customers, merchants, fraud_ratio, rng)
+    transactions = (
+        transactions
+        .merge(customers[["id", "risk_score"]].rename(columns={"id": "customer_id", "risk_score": "customer_risk_score"}))
+        .merge(merchants[["id", "risk_score", "category"]].rename(columns={
+            "id": "merchant_id", "risk_score": "merchant_risk_score", "category": "merchant_category"
+        }))
+        .sample(frac=1.0, random_state=0)
+        .reset_index(drop=True)
+    )
+    transactions["transaction_id"] = transactions["id"]
+    transactions["timestamp"] = (transactions["timestamp"] - pd.Timestamp(0)).dt.total_seconds()
+    return transactions
+
+
+def train_model(graph_data, hidden_channels, epochs):
+    """Full-graph training, as in ``GNNTrainer._train_full``."""
+    model = FraudGNN(graph_data.num_features, hidden_channels, 2)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+    criterion = nn.CrossEntropyLoss()
+    mask = graph_data.transaction_mask
+    model.train()
+    for _ in range(epochs):
+        optimizer.zero_grad()
+        loss = criterion(model(graph_data.x, graph_data.edge_index)[mask], graph_data.y[mask])
+        loss.backward()
+        optimizer.step()
+    model.eval()
+    return model
+
+
+def time_scorer(scorer, rows, batch_size, repeats):
+    """Per-batch latencies (seconds) of ``scorer.score_batch`` over slices of ``rows``."""
+    latencies = []
+    for i in range(repeats):
+        start = (i * batch_size) % max(len(rows) - batch_size, 1)
+        batch = rows.iloc[start:start + batch_size]
+        args = (
+            [None] * len(batch), batch["customer_id"].tolist(), batch["merchant_id"].tolist(),
+            batch["amount"].tolist(), batch["timestamp"].tolist()
+        )
+        begin = time.perf_counter()
+        scorer.score_batch(*args)
+        latencies.append(time.perf_counter() - begin)
+    return np.asarray(latencies)
+
+
+def summarize(latencies, batch_size):
+    return {
+        "batch_size": batch_size,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "per_transaction_us": float(np.median(latencies) / batch_size * 1e6),
+    }
+
+
+def evaluate(scorer, rows):
+    probabilities = np.asarray(scorer.score_batch(
+        [None] * len(rows), rows["customer_id"].tolist(), rows["merchant_id"].tolist(),
+        rows["amount"].tolist(), rows["timestamp"].tolist()
+    ))
+    labels = rows["is_fraudulent"].to_numpy().astype(int)
+    return probabilities, {
+        "accuracy": float(((probabilities > 0.5).astype(int) == labels).mean()),
+        "roc_auc": float(roc_auc_score(labels, probabilities)) if 0 < labels.sum() < len(labels) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fp32 vs int8 online GNN scoring on synthetic data')
+    parser.add_argument('--num-transactions', type=int, default=20000, help='Number of transactions to generate')
+    parser.add_argument('--num-customers', type=int, default=2000, help='Number of customers to generate')
+    parser.add_argument('--num-merchants', type=int, default=500, help='Number of merchants to generate')
+    parser.add_argument('--fraud-ratio', type=float, default=0.05, help='Ratio of fraudulent transactions')
+    parser.add_argument('--holdout-ratio', type=float, default=0.1, help='Share of transactions scored as new')
+    parser.add_argument('--epochs', type=int, default=50, help='Training epochs')
+    parser.add_argument('--hidden-channels', type=int, default=64, help='Hidden layer width')
+    parser.add_argument('--batch-sizes', type=str, default='1,64,1024', help='Comma-separated scoring batch sizes')
+    parser.add_argument('--repeats', type=int, default=200, help='Timed batches per batch size')
+    parser.add_argument('--threads', type=int, default=1, help='torch intra-op threads')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--output', type=str, default=None, help='Optional path for the JSON report')
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    torch.set_num_threads(args.threads)
+
+    # Train on the older transactions and score the held-out ones as new arrivals
+    rows = build_columns(args.num_transactions, args.num_customers, args.num_merchants, args.fraud_ratio, np.random.default_rng(args.seed))
+    split = int(len(rows) * (1 - args.holdout_ratio))
+    train_rows, new_rows = rows.iloc[:split], rows.iloc[split:].reset_index(drop=True)
+
+    arrays = build_graph_arrays({name: train_rows[name].to_numpy() for name in train_rows.columns})
+    graph_data = to_pyg_data(arrays)
+    start = time.perf_counter()
+    model = train_model(graph_data, args.hidden_channels, args.epochs)
+    train_seconds = time.perf_counter() - start
+
+    state = build_scorer_state(
+        model.export_weights(), arrays["x"], arrays["edge_index"],
+        {"customer": arrays["customer_ids"], "merchant": arrays["merchant_ids"]},
+        {"customer": arrays["customer_nodes"], "merchant": arrays["merchant_nodes"]},
+        arrays["transaction_ids"], arrays["feature_stats"]
+    )
+
+    scorers = {"numpy_fp32": GNNScorer()}
+    scorers["numpy_fp32"].load_state(state)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = export_scoring_heads(state["weights"], Path(directory))
+        artifact_bytes = {name: Path(path).stat().st_size for name, path in paths.items()}
+        for name, file_name in (("torchscript_fp32", "head_fp32.pt"), ("torchscript_int8", "head_int8.pt")):
+            scorers[name] = GNNScorer()
+            scorers[name].load_state(state, head=torch.jit.load(paths[file_name]))
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    reference, _ = evaluate(scorers["numpy_fp32"], new_rows)
+    report = {
+        "config": vars(args),
+        "graph": {k: v for k, v in arrays["build_stats"].items() if k != "build_seconds"},
+        "train_seconds": train_seconds,
+        "artifact_bytes": artifact_bytes,
+        "backends": {},
+    }
+    for name, scorer in scorers.items():
+        probabilities, quality = evaluate(scorer, new_rows)
+        report["backends"][name] = {
+            **quality,
+            "max_abs_diff_vs_fp32": float(np.abs(probabilities - reference).max()),
+            "label_agreement_vs_fp32": float(((probabilities > 0.5) == (reference > 0.5)).mean()),
+            "latency": [summarize(time_scorer(scorer, new_rows, size, args.repeats), size) for size in batch_sizes],
+        }
+
+    print(f"Trained on {split} transactions in {train_seconds:.1f}s, scoring {len(new_rows)} new transactions")
+    print(f"{'backend':<18}{'batch':>7}{'p50 ms':>10}{'p95 ms':>10}{'us/txn':>10}{'accuracy':>10}{'roc_auc':>9}")
+    for name, result in report["backends"].items():
+        for latency in result["latency"]:
+            roc_auc = f"{result['roc_auc']:.4f}" if result["roc_auc"] is not None else "n/a"
+            print(
+                f"{name:<18}{latency['batch_size']:>7}{latency['p50_ms']:>10.3f}{latency['p95_ms']:>10.3f}"
+                f"{latency['per_transaction_us']:>10.1f}{result['accuracy']:>10.4f}{roc_auc:>9}"
+            )
+    print(f"int8 vs fp32: max |dp| = {report['backends']['torchscript_int8']['max_abs_diff_vs_fp32']:.5f}, "
+          f"label agreement = {report['backends']['torchscript_int8']['label_agreement_vs_fp32']:.4f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote report to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'scripts'))
+
+from generate_test_data import generate_dataset
+
+MODES = ('full', 'sampled', 'sign')
+# Metrics compared against the baseline; all are "lower is better"
+REGRESSION_METRICS = ('build_seconds', 'epoch_seconds_median', 'peak_rss_mb')
+
+
+def dataset_dir(data_dir, num_transactions, seed):
+    return Path(data_dir) / f'transactions_{num_transactions}_seed_{seed}'
+
+
+def ensure_dataset(data_dir, num_transactions, fraud_ratio, seed, workers):
+    """Generate (once) the CSV files for one graph size; later runs reuse them."""
+    directory = dataset_dir(data_dir, num_transactions, seed)
+    if (directory / 'config.json').exists():
+        return directory
+
+    # Roughly ten transactions per customer and a hundred per merchant
+    generate_dataset(
+        directory, num_transactions, max(num_transactions // 10, 10), max(num_transactions // 100, 10),
+        fraud_ratio, seed=seed, workers=workers
+    )
+    return directory
+
+
+def load_columns(directory):
+    """Join the CSV files into the column layout ``GNNTrainer`` builds graphs from."""
+    transactions = pd.read_csv(
+        directory / 'transactions.csv',
+        usecols=['id', 'customer_id', 'merchant_id', 'amount', 'timestamp', 'is_fraudulent'],
+        parse_dates=['timestamp']
+    )
+    customers = pd.read_csv(directory / 'customers.csv', usecols=['id', 'risk_score'])
+    merchants = pd.read_csv(directory / 'merchants.csv', usecols=['id', 'risk_score', 'category'])
+    customer_index = pd.Index(customers['id']).get_indexer(transactions['customer_id'])
+    merchant_index = pd.Index(merchants['id']).get_indexer(transactions['merchant_id'])
+    return {
+        'transaction_id': transactions['id'].to_numpy(),
+        'customer_id': transactions['customer_id'].to_numpy(),
+        'merchant_id': transactions['merchant_id'].to_numpy(),
+        'amount': transactions['amount'].to_numpy(dtype=np.float64),
+        'timestamp': (transactions['timestamp'] - pd.Timestamp(0)).dt.total_seconds().to_numpy(),
+        'is_fraudulent': transactions['is_fraudulent'].to_numpy(dtype=bool),
+        'customer_risk_score': customers['risk_score'].to_numpy(dtype=np.float32)[customer_index],
+        'merchant_risk_score': merchants['risk_score'].to_numpy(dtype=np.float32)[merchant_index],
+        'merchant_category': merchants['category'].to_numpy()[merchant_index],
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_one(directory, mode, threads, options):
+    """Build and train once in a fresh process so peak RSS belongs to this run alone."""
+    import torch
+    from backend.gnn_trainer import GNNTrainer
+
+    torch.set_num_threads(threads)
+    cache_dir = tempfile.mkdtemp(prefix='propagation_cache_')
+    # A fresh propagation cache per run so SIGN timings never include a cache hit
+    os.environ['PROPAGATION_CACHE_DIR'] = cache_dir
+    trainer = GNNTrainer()
+    try:
+        start = time.perf_counter()
+        columns = load_columns(directory)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        graph_data = trainer._prepare_graph_data(columns)
+        build_seconds = time.perf_counter() - start
+        del columns
+
+        epochs, stages = [], {}
+
+        def record(event):
+            if event['type'] == 'epoch':
+                epochs.append(event['seconds'])
+            elif event['type'] == 'stage':
+                stages[event['stage']] = event['seconds']
+
+        start = time.perf_counter()
+        result = trainer.fit_graph(
+            graph_data, callback=record, mode=mode, save_checkpoint=False,
+            # Benchmarks time a fixed number of epochs
+            patience=options['epochs'], **options
+        )
+        train_seconds = time.perf_counter() - start
+    finally:
+        trainer.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    epoch_median = float(np.median(epochs)) if epochs else None
+    num_transactions = graph_data.build_stats['num_transactions']
+    return {
+        'mode': mode,
+        'threads': threads,
+        'num_transactions': num_transactions,
+        'num_nodes': graph_data.build_stats['num_nodes'],
+        'num_edges': graph_data.build_stats['num_edges'],
+        'load_seconds': load_seconds,
+        'build_seconds': build_seconds,
+        'train_seconds': train_seconds,
+        'stage_seconds': stages,
+        'epochs': len(epochs),
+        'epoch_seconds_median': epoch_median,
+        'epoch_seconds_first': epochs[0] if epochs else None,
+        'throughput_transactions_per_second': num_transactions / epoch_median if epoch_median else None,
+        'final_loss': result.get('final_loss'),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return regressions where a metric grew by more than ``tolerance`` (a fraction)."""
+    previous = {(r['num_transactions'], r['mode'], r['threads']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get((result['num_transactions'], result['mode'], result['threads']))
+        if old is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            before, after = old.get(metric), result.get(metric)
+            if before and after and after > before * (1 + tolerance):
+                regressions.append({
+                    'num_transactions': result['num_transactions'],
+                    'mode': result['mode'],
+                    'threads': result['threads'],
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change': after / before - 1,
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GNN training across synthetic graph sizes')
+    parser.add_argument('--sizes', type=str, default='10000,100000', help='Comma-separated transaction counts (e.g. 10000,100000,1000000,10000000)')
+    parser.add_argument('--modes', type=str, default=','.join(MODES), help='Comma-separated training modes')
+    parser.add_argument('--threads', type=str, default=str(os.cpu_count() or 1), help='Comma-separated torch thread counts')
+    parser.add_argument('--epochs', type=int, default=5, help='Epochs per run')
+    parser.add_argument('--batch-size', type=int, default=1024, help='Mini-batch size for sampled and sign modes')
+    parser.add_argument('--fraud-ratio', type=float, default=0.05, help='Ratio of fraudulent transactions')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data generation and training')
+    parser.add_argument('--data-workers', type=int, default=os.cpu_count() or 1, help='Processes used to generate datasets')
+    parser.add_argument('--data-dir', type=str, default='./benchmark_data', help='Where generated datasets are cached')
+    parser.add_argument('--output', type=str, default='./benchmark_results.json', help='JSON results file')
+    parser.add_argument('--baseline', type=str, default=None, help='Baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown before flagging a regression')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    modes = [mode for mode in args.modes.split(',') if mode]
+    thread_counts = [int(threads) for threads in args.threads.split(',')]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f'Unknown modes: {sorted(unknown)}')
+
+    options = {
+        'epochs': args.epochs,
+        'batch_size': args.batch_size,
+        'seed': args.seed,
+        'num_workers': 0,
+    }
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for size in sizes:
+        start = time.perf_counter()
+        directory = ensure_dataset(args.data_dir, size, args.fraud_ratio, args.seed, args.data_workers)
+        print(f'Dataset with {size} transactions ready in {time.perf_counter() - start:.1f}s at {directory}')
+        for mode in modes:
+            for threads in thread_counts:
+                with context.Pool(1) as pool:
+                    result = pool.apply(run_one, (directory, mode, threads, options))
+                results.append(result)
+                print(
+                    f"  {mode:<8} threads={threads:<3} build={result['build_seconds']:.2f}s "
+                    f"epoch={result['epoch_seconds_median'] or 0:.3f}s "
+                    f"throughput={result['throughput_transactions_per_second'] or 0:,.0f} txn/s "
+                    f"peak_rss={result['peak_rss_mb']:.0f}MB"
+                )
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'config': vars(args),
+        },
+        'results': results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        report['baseline'] = args.baseline
+        report['regressions'] = regressions
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['mode']} n={regression['num_transactions']} threads={regression['threads']} "
+                f"{regression['metric']}: {regression['baseline']:.3f} -> {regression['current']:.3f} "
+                f"(+{regression['change']:.0%})"
+            )
+        if regressions:
+            exit_code = 1
+        else:
+            print(f'No regressions beyond {args.tolerance:.0%} against {args.baseline}')
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Wrote results to {args.output}')
+    sys.exit(exit_code)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# Reading and writing generated test datasets as CSV or partitioned Parquet.
+#
+# A Parquet dataset is a directory per table (customers/, transactions/, ...) of
+# part-NNNNN.parquet files written with the explicit schemas below. Readers stream
+# Arrow record batches from either layout, so ingestion never holds a whole table
+# in memory and Parquet input needs no text parsing.
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+TABLES = ('customers', 'merchants', 'devices', 'ip_addresses', 'transactions')
+
+_LABEL = pa.dictionary(pa.int8(), pa.string())
+
+SCHEMAS = {
+    'customers': pa.schema([
+        ('id', pa.string()),
+        ('name', pa.string()),
+        ('email', pa.string()),
+        ('risk_score', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+    ]),
+    'merchants': pa.schema([
+        ('id', pa.string()),
+        ('name', pa.string()),
+        ('category', _LABEL),
+        ('risk_score', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+    ]),
+    'devices': pa.schema([
+        ('id', pa.string()),
+        ('fingerprint', pa.string()),
+        ('type', _LABEL),
+        ('risk_score', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+    ]),
+    'ip_addresses': pa.schema([
+        ('id', pa.string()),
+        ('address', pa.string()),
+        ('location', pa.string()),
+        ('risk_score', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+    ]),
+    'transactions': pa.schema([
+        ('id', pa.string()),
+        ('customer_id', pa.string()),
+        ('merchant_id', pa.string()),
+        ('amount', pa.float64()),
+        ('timestamp', pa.timestamp('us')),
+        ('status', _LABEL),
+        ('fraud_score', pa.float64()),
+        ('is_fraudulent', pa.bool_()),
+        ('device_id', pa.string()),
+        ('ip_id', pa.string()),
+    ]),
+}
+
+ROW_GROUP_SIZE = 256_000
+
+
+def part_path(output_dir, table, index):
+    return Path(output_dir) / table / f'part-{index:05d}.parquet'
+
+
+def write_parquet_part(df, output_dir, table, index=0):
+    """Write one DataFrame as a Parquet part file of ``table``; returns its path."""
+    path = part_path(output_dir, table, index)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrow_table = pa.Table.from_pandas(df, schema=SCHEMAS[table], preserve_index=False)
+    # Write under a temporary name so readers never pick up a half-written part
+    tmp_path = path.with_suffix('.tmp')
+    pq.write_table(arrow_table, tmp_path, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+    tmp_path.replace(path)
+    return path
+
+
+def detect_format(data_dir):
+    data_dir = Path(data_dir)
+    has_parquet = any((data_dir / 'transactions').glob('part-*.parquet'))
+    has_csv = (data_dir / 'transactions.csv').exists()
+    if has_parquet and has_csv:
+        raise ValueError(f'Both CSV and Parquet datasets found in {data_dir}; pass the format explicitly')
+    if has_parquet:
+        return 'parquet'
+    if has_csv:
+        return 'csv'
+    raise FileNotFoundError(f'No CSV or Parquet dataset found in {data_dir}')
+
+
+def _csv_convert_options(table, columns):
+    # Dictionary columns are read as plain strings; every other column gets its final type
+    column_types = {
+        field.name: field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        for field in SCHEMAS[table]
+    }
+    return pacsv.ConvertOptions(column_types=column_types, include_columns=columns)
+
+
+def iter_batches(data_dir, table, batch_size=50_000, columns=None, data_format=None):
+    """Stream ``table`` from ``data_dir`` as Arrow record batches.
+
+    Parquet parts are memory-mapped and read a row group at a time; CSV files
+    are parsed incrementally in blocks with the table's explicit column types.
+    """
+    data_dir = Path(data_dir)
+    data_format = data_format or detect_format(data_dir)
+    if data_format == 'parquet':
+        for path in sorted((data_dir / table).glob('part-*.parquet')):
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+    else:
+        reader = pacsv.open_csv(
+            data_dir / f'{table}.csv',
+            # Roughly ``batch_size`` rows of ~100 bytes per block
+            read_options=pacsv.ReadOptions(block_size=max(batch_size * 128, 1 << 20)),
+            convert_options=_csv_convert_options(table, columns)
+        )
+        yield from reader
+
+
+def count_rows(data_dir, table, data_format=None):
+    """Row count of ``table``; free for Parquet (footer metadata), a streaming pass for CSV."""
+    data_dir = Path(data_dir)
+    data_format = data_format or detect_format(data_dir)
+    if data_format == 'parquet':
+        return sum(pq.ParquetFile(path).metadata.num_rows for path in (data_dir / table).glob('part-*.parquet'))
+    return sum(batch.num_rows for batch in iter_batches(data_dir, table, columns=['id'], data_format=data_format))
+
+
+def cypher_columns(batch, columns=None):
+    """``columns`` (default all) of ``batch`` with timestamps as ISO-8601 strings and labels decoded.
+
+    This is the form both Cypher ``datetime()`` and neo4j-admin import read.
+    """
+    columns = columns or batch.schema.names
+    arrays = []
+    for name in columns:
+        column = batch.column(name)
+        if pa.types.is_timestamp(column.type):
+            column = pc.strftime(column, format='%Y-%m-%dT%H:%M:%S')
+        elif pa.types.is_dictionary(column.type):
+            column = column.dictionary_decode()
+        arrays.append(column)
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+
+def batch_to_records(batch):
+    """Record batch as a list of dicts, with timestamps as ISO-8601 strings for Cypher ``datetime()``."""
+    return cypher_columns(batch).to_pylist()
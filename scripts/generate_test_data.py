@@ -1,129 +1,406 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 import json
+import shutil
 import argparse
+import time
 from pathlib import Path
 
-def generate_customer_profiles(num_customers):
+CATEGORIES = ['retail', 'food', 'travel', 'entertainment', 'utilities', 'healthcare']
+# Median legitimate spend per category; amounts are log-normal around it
+CATEGORY_MEDIAN_AMOUNT = np.array([80.0, 25.0, 450.0, 60.0, 120.0, 150.0])
+DEVICE_TYPES = np.array(['mobile', 'desktop', 'tablet'])
+# Relative activity by hour of day for legitimate transactions
+HOURLY_PROFILE = np.array([1, 0.6, 0.4, 0.3, 0.3, 0.5, 1, 2, 3, 4, 4.5, 5, 5.5, 5, 4.5, 4.5, 5, 5.5, 6, 6, 5, 4, 3, 2])
+
+# How the fraudulent share of each chunk is split between the injected patterns
+FRAUD_PATTERNS = {'account_takeover': 0.4, 'fraud_ring': 0.35, 'card_testing': 0.25}
+
+SECONDS_PER_DAY = 86400
+
+
+def _ids(prefix, start, count, width):
+    numbers = np.arange(start, start + count).astype(str)
+    return np.char.add(prefix, np.char.zfill(numbers, width))
+
+
+def _timestamps(seconds):
+    return pd.to_datetime(seconds, unit='s')
+
+
+def _end_time(end_time):
+    end_time = end_time or datetime.now().replace(minute=0, second=0, microsecond=0)
+    return int(pd.Timestamp(end_time).timestamp())
+
+
+def generate_customer_profiles(num_customers, rng=None, end_time=None):
     """Generate synthetic customer profiles."""
-    customers = []
-    for i in range(num_customers):
-        customer = {
-            'id': f'CUST_{i:06d}',
-            'name': f'Customer_{i}',
-            'email': f'customer_{i}@example.com',
-            'risk_score': random.uniform(0.0, 1.0),
-            'created_at': datetime.now() - timedelta(days=random.randint(0, 365))
-        }
-        customers.append(customer)
-    return pd.DataFrame(customers)
-
-def generate_merchant_profiles(num_merchants):
+    rng = rng or np.random.default_rng()
+    end = _end_time(end_time)
+    numbers = np.arange(num_customers).astype(str)
+    return pd.DataFrame({
+        'id': _ids('CUST_', 0, num_customers, 6),
+        'name': np.char.add('Customer_', numbers),
+        'email': np.char.add(np.char.add('customer_', numbers), '@example.com'),
+        'risk_score': rng.uniform(0.0, 1.0, num_customers),
+        'created_at': _timestamps(end - rng.integers(0, 366, num_customers) * SECONDS_PER_DAY)
+    })
+
+
+def generate_merchant_profiles(num_merchants, rng=None, end_time=None):
     """Generate synthetic merchant profiles."""
-    categories = ['retail', 'food', 'travel', 'entertainment', 'utilities', 'healthcare']
-    merchants = []
-    for i in range(num_merchants):
-        merchant = {
-            'id': f'MERCH_{i:06d}',
-            'name': f'Merchant_{i}',
-            'category': random.choice(categories),
-            'risk_score': random.uniform(0.0, 1.0),
-            'created_at': datetime.now() - timedelta(days=random.randint(0, 365))
-        }
-        merchants.append(merchant)
-    return pd.DataFrame(merchants)
-
-def generate_transactions(num_transactions, customers_df, merchants_df, fraud_ratio):
-    """Generate synthetic transaction data with fraud patterns."""
-    transactions = []
-    num_fraudulent = int(num_transactions * fraud_ratio)
-    
-    # Generate normal transactions
-    for i in range(num_transactions - num_fraudulent):
-        customer = customers_df.iloc[random.randint(0, len(customers_df)-1)]
-        merchant = merchants_df.iloc[random.randint(0, len(merchants_df)-1)]
-        
-        transaction = {
-            'id': f'TXN_{i:08d}',
-            'customer_id': customer['id'],
-            'merchant_id': merchant['id'],
-            'amount': random.uniform(10.0, 10000.0),
-            'timestamp': datetime.now() - timedelta(hours=random.randint(0, 24*30)),
-            'status': 'completed',
-            'fraud_score': 0.0,
-            'is_fraudulent': False
-        }
-        transactions.append(transaction)
-    
-    # Generate fraudulent transactions with patterns
-    for i in range(num_fraudulent):
-        customer = customers_df.iloc[random.randint(0, len(customers_df)-1)]
-        merchant = merchants_df.iloc[random.randint(0, len(merchants_df)-1)]
-        
-        # Generate fraud patterns
-        amount = random.uniform(1000.0, 50000.0)  # Higher amounts for fraud
-        fraud_score = random.uniform(0.7, 1.0)  # High fraud scores
-        
-        transaction = {
-            'id': f'TXN_{i+num_transactions-num_fraudulent:08d}',
-            'customer_id': customer['id'],
-            'merchant_id': merchant['id'],
-            'amount': amount,
-            'timestamp': datetime.now() - timedelta(hours=random.randint(0, 24*30)),
-            'status': 'flagged',
-            'fraud_score': fraud_score,
-            'is_fraudulent': True
-        }
-        transactions.append(transaction)
-    
-    return pd.DataFrame(transactions)
-
-def generate_device_profiles(transactions_df):
-    """Generate synthetic device profiles for transactions."""
-    devices = []
-    device_ids = set()
-    
-    for _, transaction in transactions_df.iterrows():
-        if random.random() < 0.3:  # 30% chance of new device
-            device_id = f'DEV_{len(device_ids):06d}'
-            device_ids.add(device_id)
-            
-            device = {
-                'id': device_id,
-                'fingerprint': f'FP_{random.randint(1000000, 9999999)}',
-                'type': random.choice(['mobile', 'desktop', 'tablet']),
-                'risk_score': random.uniform(0.0, 1.0),
-                'created_at': transaction['timestamp']
-            }
-            devices.append(device)
-    
-    return pd.DataFrame(devices)
-
-def generate_ip_addresses(transactions_df):
-    """Generate synthetic IP addresses for transactions."""
-    ip_addresses = []
-    ip_set = set()
-    
-    for _, transaction in transactions_df.iterrows():
-        if random.random() < 0.2:  # 20% chance of new IP
-            while True:
-                ip = f"{random.randint(1, 255)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 255)}"
-                if ip not in ip_set:
-                    ip_set.add(ip)
-                    break
-            
-            ip_address = {
-                'id': f'IP_{len(ip_set):06d}',
-                'address': ip,
-                'location': f"Location_{random.randint(1, 100)}",
-                'risk_score': random.uniform(0.0, 1.0),
-                'created_at': transaction['timestamp']
-            }
-            ip_addresses.append(ip_address)
-    
-    return pd.DataFrame(ip_addresses)
+    rng = rng or np.random.default_rng()
+    end = _end_time(end_time)
+    return pd.DataFrame({
+        'id': _ids('MERCH_', 0, num_merchants, 6),
+        'name': np.char.add('Merchant_', np.arange(num_merchants).astype(str)),
+        'category': np.asarray(CATEGORIES)[rng.integers(0, len(CATEGORIES), num_merchants)],
+        'risk_score': rng.uniform(0.0, 1.0, num_merchants),
+        'created_at': _timestamps(end - rng.integers(0, 366, num_merchants) * SECONDS_PER_DAY)
+    })
+
+
+def build_context(customers_df, merchants_df, rng, days=30, end_time=None):
+    """Sample the hidden structure transactions are drawn from.
+
+    Customers and merchants get heavy-tailed activity weights, every customer
+    a usual device and IP, and a few fraud structures are planted: risky
+    customers whose accounts get taken over, rings that share devices, IPs
+    and colluding high-risk merchants, and merchants used for card testing.
+    Everything is plain arrays so it can be shipped to worker processes once.
+    """
+    num_customers, num_merchants = len(customers_df), len(merchants_df)
+    customer_risk = customers_df['risk_score'].to_numpy(dtype=np.float64)
+    merchant_risk = merchants_df['risk_score'].to_numpy(dtype=np.float64)
+    category = pd.Categorical(merchants_df['category'], categories=CATEGORIES).codes
+    category = np.where(category < 0, 0, category)
+
+    customer_weight = rng.lognormal(0.0, 1.0, num_customers)
+    merchant_weight = rng.pareto(1.2, num_merchants) + 1.0
+
+    num_devices = max(int(num_customers * 1.1), 1)
+    num_ips = max(int(num_customers * 0.9), 1)
+    num_rings = int(np.clip(num_customers // 5000, 1, 200))
+    num_takeover_devices = max(num_customers // 200, 10)
+
+    # Rings collude with the riskiest merchants; takeovers favour high-value categories
+    risky = np.argsort(-merchant_risk)[:max(num_merchants // 20, 3)]
+    high_value = np.flatnonzero(np.isin(category, [0, 2, 3]) & (merchant_risk > 0.5))
+    if not len(high_value):
+        high_value = np.arange(num_merchants)
+
+    return {
+        'customer_ids': customers_df['id'].to_numpy(),
+        'merchant_ids': merchants_df['id'].to_numpy(),
+        'customer_cdf': np.cumsum(customer_weight) / customer_weight.sum(),
+        'merchant_cdf': np.cumsum(merchant_weight) / merchant_weight.sum(),
+        'merchant_category': category,
+        'primary_device': rng.integers(0, num_devices, num_customers),
+        'primary_ip': rng.integers(0, num_ips, num_customers),
+        'num_devices': num_devices,
+        'num_ips': num_ips,
+        'compromised': rng.choice(
+            num_customers, size=max(num_customers // 50, 1), replace=False, p=customer_risk ** 2 / (customer_risk ** 2).sum()
+        ),
+        'high_value_merchants': high_value,
+        # Fraud-only devices and IPs are numbered after the legitimate ones
+        'takeover_devices': num_devices + np.arange(num_takeover_devices),
+        'takeover_ips': num_ips + np.arange(num_takeover_devices),
+        'ring_devices': num_devices + num_takeover_devices + np.arange(num_rings * 3).reshape(num_rings, 3),
+        'ring_ips': num_ips + num_takeover_devices + np.arange(num_rings * 3).reshape(num_rings, 3),
+        'ring_merchants': rng.choice(risky, size=(num_rings, 3)),
+        'testing_merchants': rng.choice(risky, size=max(len(risky) // 3, 1), replace=False),
+        'end': _end_time(end_time),
+        'window': days * SECONDS_PER_DAY,
+    }
+
+
+def generate_device_profiles(context, rng):
+    """Generate device profiles for legitimate and fraud-only devices."""
+    num_fraud = len(context['takeover_devices']) + context['ring_devices'].size
+    count = context['num_devices'] + num_fraud
+    is_fraud = np.arange(count) >= context['num_devices']
+    return pd.DataFrame({
+        'id': _ids('DEV_', 0, count, 8),
+        'fingerprint': np.char.add('FP_', rng.integers(1000000, 10000000, count).astype(str)),
+        'type': DEVICE_TYPES[rng.integers(0, len(DEVICE_TYPES), count)],
+        'risk_score': np.where(is_fraud, rng.beta(5, 2, count), rng.beta(2, 5, count)),
+        'created_at': _timestamps(context['end'] - rng.integers(0, 366 * SECONDS_PER_DAY, count))
+    })
+
+
+def generate_ip_addresses(context, rng):
+    """Generate unique IP addresses for legitimate and fraud-only IPs."""
+    num_fraud = len(context['takeover_ips']) + context['ring_ips'].size
+    count = context['num_ips'] + num_fraud
+    is_fraud = np.arange(count) >= context['num_ips']
+    # Draw extra candidates so that enough stay unique after de-duplication
+    addresses = np.unique(rng.integers(1 << 24, 255 << 24, int(count * 1.05) + 16, dtype=np.uint64))
+    while len(addresses) < count:
+        addresses = np.unique(np.concatenate([addresses, rng.integers(1 << 24, 255 << 24, count, dtype=np.uint64)]))
+    addresses = rng.permutation(addresses)[:count]
+    octets = [(addresses >> np.uint64(shift)) & np.uint64(255) for shift in (24, 16, 8, 0)]
+    dotted = octets[0].astype(str)
+    for octet in octets[1:]:
+        dotted = np.char.add(np.char.add(dotted, '.'), octet.astype(str))
+    return pd.DataFrame({
+        'id': _ids('IP_', 0, count, 8),
+        'address': dotted,
+        'location': np.char.add('Location_', rng.integers(1, 101, count).astype(str)),
+        'risk_score': np.where(is_fraud, rng.beta(5, 2, count), rng.beta(2, 5, count)),
+        'created_at': _timestamps(context['end'] - rng.integers(0, 366 * SECONDS_PER_DAY, count))
+    })
+
+
+def _sample(cdf, rng, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1)
+
+
+def _bursts(rng, total, low, high):
+    """Split ``total`` rows into bursts of ``low..high``; returns (burst per row, position in burst, bursts)."""
+    lengths = rng.integers(low, high + 1, total // low + 1)
+    ends = np.cumsum(lengths)
+    num_bursts = int(np.searchsorted(ends, total)) + 1
+    burst = np.repeat(np.arange(num_bursts), lengths[:num_bursts])[:total]
+    starts = ends[:num_bursts] - lengths[:num_bursts]
+    return burst, np.arange(total) - starts[burst], num_bursts
+
+
+def _legitimate(context, rng, size):
+    customers = _sample(context['customer_cdf'], rng, size)
+    merchants = _sample(context['merchant_cdf'], rng, size)
+    median = CATEGORY_MEDIAN_AMOUNT[context['merchant_category'][merchants]]
+    day = rng.integers(0, context['window'] // SECONDS_PER_DAY, size)
+    hour = rng.choice(24, size=size, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    # Mostly the customer's usual device and IP, sometimes another legitimate one
+    devices = np.where(rng.random(size) < 0.9, context['primary_device'][customers], rng.integers(0, context['num_devices'], size))
+    ips = np.where(rng.random(size) < 0.8, context['primary_ip'][customers], rng.integers(0, context['num_ips'], size))
+    return {
+        'customer': customers,
+        'merchant': merchants,
+        'amount': np.clip(rng.lognormal(np.log(median), 0.9), 1.0, 20000.0),
+        'offset': day * SECONDS_PER_DAY + hour * 3600 + rng.integers(0, 3600, size),
+        'device': devices,
+        'ip': ips,
+    }
+
+
+def _account_takeover(context, rng, size):
+    # Bursts of high-value purchases from a compromised account on an unfamiliar device and IP
+    burst, position, num_bursts = _bursts(rng, size, 3, 8)
+    customers = rng.choice(context['compromised'], num_bursts)[burst]
+    start = rng.integers(0, context['window'], num_bursts)[burst]
+    return {
+        'customer': customers,
+        'merchant': rng.choice(context['high_value_merchants'], size),
+        'amount': np.clip(rng.lognormal(np.log(2500.0), 0.6, size), 200.0, 50000.0),
+        'offset': start + position * rng.integers(60, 900, size),
+        'device': rng.choice(context['takeover_devices'], num_bursts)[burst],
+        'ip': rng.choice(context['takeover_ips'], num_bursts)[burst],
+    }
+
+
+def _fraud_ring(context, rng, size):
+    # Stolen cards run through a ring's shared devices and IPs at colluding merchants,
+    # at night and just under a round-number review threshold
+    burst, position, num_bursts = _bursts(rng, size, 4, 12)
+    ring = rng.integers(0, len(context['ring_merchants']), num_bursts)[burst]
+    day = rng.integers(0, context['window'] // SECONDS_PER_DAY, num_bursts)[burst]
+    hour = rng.integers(0, 5, num_bursts)[burst]
+    return {
+        'customer': rng.integers(0, len(context['customer_ids']), size),
+        'merchant': context['ring_merchants'][ring, rng.integers(0, 3, size)],
+        'amount': rng.uniform(850.0, 999.99, size),
+        'offset': day * SECONDS_PER_DAY + hour * 3600 + position * rng.integers(120, 1800, size),
+        'device': context['ring_devices'][ring, rng.integers(0, 3, size)],
+        'ip': context['ring_ips'][ring, rng.integers(0, 3, size)],
+    }
+
+
+def _card_testing(context, rng, size):
+    # A few tiny authorisations within seconds at a testing merchant, then one large charge
+    burst, position, num_bursts = _bursts(rng, size, 3, 6)
+    last = np.r_[burst[1:] != burst[:-1], True]
+    start = rng.integers(0, context['window'], num_bursts)[burst]
+    return {
+        'customer': rng.integers(0, len(context['customer_ids']), num_bursts)[burst],
+        'merchant': rng.choice(context['testing_merchants'], num_bursts)[burst],
+        'amount': np.where(last, rng.lognormal(np.log(3000.0), 0.5, size), rng.uniform(0.5, 5.0, size)),
+        'offset': start + position * rng.integers(5, 60, size),
+        'device': rng.choice(context['takeover_devices'], num_bursts)[burst],
+        'ip': rng.choice(context['takeover_ips'], num_bursts)[burst],
+    }
+
+
+PATTERN_GENERATORS = {
+    'account_takeover': _account_takeover,
+    'fraud_ring': _fraud_ring,
+    'card_testing': _card_testing,
+}
+
+
+def generate_transaction_chunk(context, start, size, fraud_ratio, seed):
+    """Generate transactions ``start .. start + size`` from their own seed."""
+    rng = np.random.default_rng(seed)
+    num_fraudulent = int(round(size * fraud_ratio))
+    pattern_sizes = rng.multinomial(num_fraudulent, list(FRAUD_PATTERNS.values()))
+
+    parts = [_legitimate(context, rng, size - num_fraudulent)]
+    parts += [PATTERN_GENERATORS[name](context, rng, n) for name, n in zip(FRAUD_PATTERNS, pattern_sizes) if n]
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    is_fraudulent = np.arange(size) >= size - num_fraudulent
+
+    # Interleave fraud with legitimate rows instead of appending it at the end
+    order = rng.permutation(size)
+    columns = {name: values[order] for name, values in columns.items()}
+    is_fraudulent = is_fraudulent[order]
+    timestamp = context['end'] - context['window'] + np.minimum(columns['offset'], context['window'] - 1)
+
+    return pd.DataFrame({
+        'id': _ids('TXN_', start, size, 8),
+        'customer_id': context['customer_ids'][columns['customer']],
+        'merchant_id': context['merchant_ids'][columns['merchant']],
+        'amount': np.round(columns['amount'], 2),
+        'timestamp': _timestamps(timestamp),
+        'status': np.where(is_fraudulent, 'flagged', 'completed'),
+        'fraud_score': np.where(is_fraudulent, rng.uniform(0.7, 1.0, size), 0.0),
+        'is_fraudulent': is_fraudulent,
+        'device_id': np.char.add('DEV_', np.char.zfill(columns['device'].astype(str), 8)),
+        'ip_id': np.char.add('IP_', np.char.zfill(columns['ip'].astype(str), 8)),
+    })
+
+
+def generate_transactions(num_transactions, customers_df, merchants_df, fraud_ratio, rng=None, chunk_size=1_000_000):
+    """Generate synthetic transaction data with fraud patterns, in memory."""
+    rng = rng or np.random.default_rng()
+    context = build_context(customers_df, merchants_df, rng)
+    seeds = rng.bit_generator.seed_seq.spawn(_num_chunks(num_transactions, chunk_size))
+    return pd.concat([
+        generate_transaction_chunk(context, start, size, fraud_ratio, seed)
+        for (start, size), seed in zip(_chunks(num_transactions, chunk_size), seeds)
+    ], ignore_index=True)
+
+
+def _num_chunks(num_transactions, chunk_size):
+    return max((num_transactions + chunk_size - 1) // chunk_size, 1)
+
+
+def _chunks(num_transactions, chunk_size):
+    for start in range(0, max(num_transactions, 1), chunk_size):
+        yield start, min(chunk_size, num_transactions - start)
+
+
+_worker_context = None
+
+
+def _init_worker(context):
+    global _worker_context
+    _worker_context = context
+
+
+def _write_chunk(index, start, size, fraud_ratio, seed, data_format, output_dir, context=None):
+    # Encoding is the slow part, so workers write Parquet parts themselves and return CSV as finished text
+    chunk = generate_transaction_chunk(context or _worker_context, start, size, fraud_ratio, seed)
+    if data_format == 'parquet':
+        from dataset_io import write_parquet_part
+        write_parquet_part(chunk, output_dir, 'transactions', index)
+        text = None
+    else:
+        text = chunk.to_csv(index=False, header=start == 0)
+    return text, size, int(chunk['is_fraudulent'].sum())
+
+
+def generate_dataset(output_dir, num_transactions, num_customers, num_merchants, fraud_ratio,
+                     seed=None, days=30, end_time=None, chunk_size=1_000_000, workers=1, data_format='csv'):
+    """Write customers, merchants, devices, IPs and transactions to ``output_dir``.
+
+    Transactions are produced in chunks of ``chunk_size`` and appended to
+    ``transactions.csv`` (or written as one Parquet part each) as they
+    complete, so memory stays bounded by a few chunks. Every chunk has its own
+    seed derived from ``seed``, so the output is identical for any number of
+    ``workers`` (but not across chunk sizes).
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    seed_sequence = np.random.SeedSequence(seed)
+    entity_seed, chunk_seed = seed_sequence.spawn(2)
+    rng = np.random.default_rng(entity_seed)
+
+    customers_df = generate_customer_profiles(num_customers, rng, end_time)
+    merchants_df = generate_merchant_profiles(num_merchants, rng, end_time)
+    context = build_context(customers_df, merchants_df, rng, days, end_time)
+    devices_df = generate_device_profiles(context, rng)
+    ip_addresses_df = generate_ip_addresses(context, rng)
+
+    # Drop parts left by an earlier, larger run and files of the other format, which
+    # readers would otherwise pick up in place of this run's output
+    for table in ('customers', 'merchants', 'devices', 'ip_addresses', 'transactions'):
+        shutil.rmtree(output_dir / table, ignore_errors=True)
+        if data_format == 'parquet':
+            (output_dir / f'{table}.csv').unlink(missing_ok=True)
+    for table, df in (('customers', customers_df), ('merchants', merchants_df),
+                      ('devices', devices_df), ('ip_addresses', ip_addresses_df)):
+        if data_format == 'parquet':
+            # pyarrow is only needed for Parquet output
+            from dataset_io import write_parquet_part
+            write_parquet_part(df, output_dir, table)
+        else:
+            df.to_csv(output_dir / f'{table}.csv', index=False)
+
+    chunks = list(zip(_chunks(num_transactions, chunk_size), chunk_seed.spawn(_num_chunks(num_transactions, chunk_size))))
+    num_rows, num_fraudulent = 0, 0
+    start_time = time.perf_counter()
+    with open(output_dir / 'transactions.csv', 'w', newline='') if data_format == 'csv' else nullcontext() as f:
+        def write(result):
+            nonlocal num_rows, num_fraudulent
+            text, rows, fraudulent = result
+            if text is not None:
+                f.write(text)
+            num_rows += rows
+            num_fraudulent += fraudulent
+            elapsed = time.perf_counter() - start_time
+            print(f"Wrote {num_rows}/{num_transactions} transactions ({num_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        if workers <= 1:
+            for index, ((start, size), chunk_seed_sequence) in enumerate(chunks):
+                write(_write_chunk(index, start, size, fraud_ratio, chunk_seed_sequence, data_format, output_dir, context))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(context,)) as executor:
+                # Keep a bounded window of chunks in flight and write them in order
+                pending = deque()
+                for index, ((start, size), chunk_seed_sequence) in enumerate(chunks):
+                    pending.append(executor.submit(
+                        _write_chunk, index, start, size, fraud_ratio, chunk_seed_sequence, data_format, output_dir
+                    ))
+                    if len(pending) >= workers * 2:
+                        write(pending.popleft().result())
+                while pending:
+                    write(pending.popleft().result())
+
+    config = {
+        'num_transactions': num_rows,
+        'num_customers': num_customers,
+        'num_merchants': num_merchants,
+        'num_devices': len(devices_df),
+        'num_ip_addresses': len(ip_addresses_df),
+        'num_fraudulent': num_fraudulent,
+        'fraud_ratio': fraud_ratio,
+        'fraud_patterns': FRAUD_PATTERNS,
+        'seed': seed,
+        'days': days,
+        'end_time': _timestamps(context['end']).isoformat(),
+        'chunk_size': chunk_size,
+        'format': data_format,
+        'generated_at': datetime.now().isoformat()
+    }
+    with open(output_dir / 'config.json', 'w') as f:
+        json.dump(config, f, indent=2)
+    return config
+
 
 def main():
     parser = argparse.ArgumentParser(description='Generate synthetic test data for credit fraud detection')
@@ -131,46 +408,29 @@ def main():
     parser.add_argument('--num-customers', type=int, default=1000, help='Number of customers to generate')
     parser.add_argument('--num-merchants', type=int, default=500, help='Number of merchants to generate')
     parser.add_argument('--fraud-ratio', type=float, default=0.05, help='Ratio of fraudulent transactions')
+    parser.add_argument('--days', type=int, default=30, help='Days of history the transactions span')
+    parser.add_argument('--end-time', type=str, default=None, help='Latest transaction time (ISO); defaults to the current hour')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed; the same seed and chunk size reproduce the same data')
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help='Transactions generated and written per chunk')
+    parser.add_argument('--workers', type=int, default=1, help='Processes generating chunks in parallel')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='CSV files or a partitioned Parquet dataset')
     parser.add_argument('--output-dir', type=str, default='./test_data', help='Output directory for generated data')
-    
+
     args = parser.parse_args()
-    
-    # Create output directory
-    output_dir = Path(args.output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Generate data
-    customers_df = generate_customer_profiles(args.num_customers)
-    merchants_df = generate_merchant_profiles(args.num_merchants)
-    transactions_df = generate_transactions(args.num_transactions, customers_df, merchants_df, args.fraud_ratio)
-    devices_df = generate_device_profiles(transactions_df)
-    ip_addresses_df = generate_ip_addresses(transactions_df)
-    
-    # Save data to CSV files
-    customers_df.to_csv(output_dir / 'customers.csv', index=False)
-    merchants_df.to_csv(output_dir / 'merchants.csv', index=False)
-    transactions_df.to_csv(output_dir / 'transactions.csv', index=False)
-    devices_df.to_csv(output_dir / 'devices.csv', index=False)
-    ip_addresses_df.to_csv(output_dir / 'ip_addresses.csv', index=False)
-    
-    # Save configuration
-    config = {
-        'num_transactions': args.num_transactions,
-        'num_customers': args.num_customers,
-        'num_merchants': args.num_merchants,
-        'fraud_ratio': args.fraud_ratio,
-        'generated_at': datetime.now().isoformat()
-    }
-    with open(output_dir / 'config.json', 'w') as f:
-        json.dump(config, f, indent=2)
-    
-    print(f"Generated test data in {output_dir}")
-    print(f"Number of transactions: {len(transactions_df)}")
-    print(f"Number of fraudulent transactions: {len(transactions_df[transactions_df['is_fraudulent']])}")
-    print(f"Number of customers: {len(customers_df)}")
-    print(f"Number of merchants: {len(merchants_df)}")
-    print(f"Number of devices: {len(devices_df)}")
-    print(f"Number of IP addresses: {len(ip_addresses_df)}")
+
+    config = generate_dataset(
+        args.output_dir, args.num_transactions, args.num_customers, args.num_merchants, args.fraud_ratio,
+        seed=args.seed, days=args.days, end_time=args.end_time, chunk_size=args.chunk_size, workers=args.workers,
+        data_format=args.format
+    )
+
+    print(f"Generated test data in {args.output_dir}")
+    print(f"Number of transactions: {config['num_transactions']}")
+    print(f"Number of fraudulent transactions: {config['num_fraudulent']}")
+    print(f"Number of customers: {config['num_customers']}")
+    print(f"Number of merchants: {config['num_merchants']}")
+    print(f"Number of devices: {config['num_devices']}")
+    print(f"Number of IP addresses: {config['num_ip_addresses']}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,21 +1,105 @@
-import pandas as pd
 import argparse
+import queue
+import random
+import re
+import sys
+import threading
+import time
 from neo4j import GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
 from pathlib import Path
 import json
 import logging
-from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+
+from dataset_io import batch_to_records, count_rows, cypher_columns, detect_format, iter_batches
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Errors worth retrying: deadlocks and lock timeouts, leader switches, dropped connections
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+# neo4j-admin import layout, mirroring the properties Neo4jIngester writes: label -> (table, [(column, header field)])
+IMPORT_NODES = {
+    'Customer': ('customers', [
+        ('id', 'id:ID(Customer)'),
+        ('name', 'name'),
+        ('email', 'email'),
+        ('risk_score', 'risk_score:float'),
+        ('created_at', 'created_at:datetime'),
+    ]),
+    'Merchant': ('merchants', [
+        ('id', 'id:ID(Merchant)'),
+        ('name', 'name'),
+        ('category', 'category'),
+        ('risk_score', 'risk_score:float'),
+        ('created_at', 'created_at:datetime'),
+    ]),
+    'Device': ('devices', [
+        ('id', 'id:ID(Device)'),
+        ('fingerprint', 'fingerprint'),
+        ('type', 'type'),
+        ('risk_score', 'risk_score:float'),
+        ('created_at', 'created_at:datetime'),
+    ]),
+    'IPAddress': ('ip_addresses', [
+        ('id', 'id:ID(IPAddress)'),
+        ('address', 'address'),
+        ('location', 'location'),
+        ('risk_score', 'risk_score:float'),
+        ('created_at', 'created_at:datetime'),
+    ]),
+    'Transaction': ('transactions', [
+        ('id', 'id:ID(Transaction)'),
+        ('amount', 'amount:float'),
+        ('timestamp', 'timestamp:datetime'),
+        ('status', 'status'),
+        ('fraud_score', 'fraud_score:float'),
+        ('is_fraudulent', 'is_fraudulent:boolean'),
+    ]),
+}
+
+# Relationships taken from transaction rows: type -> ((start column, start label), (end column, end label))
+IMPORT_RELATIONSHIPS = {
+    'MADE': (('customer_id', 'Customer'), ('id', 'Transaction')),
+    'WITH': (('id', 'Transaction'), ('merchant_id', 'Merchant')),
+    'USED_DEVICE': (('id', 'Transaction'), ('device_id', 'Device')),
+    'FROM_IP': (('id', 'Transaction'), ('ip_id', 'IPAddress')),
+}
+
+IMPORT_MANIFEST = 'import.json'
+
+# How validation parses typed header fields; anything else (including ids) is read as a string
+IMPORT_TYPES = {'float': pa.float64(), 'boolean': pa.bool_(), 'datetime': pa.timestamp('us')}
+
 class Neo4jIngester:
-    def __init__(self, uri, user, password):
+    """Batched Neo4j loader.
+
+    Every batch is written in its own explicit write transaction, retried with
+    exponential backoff on transient errors. Since a failed batch rolls back
+    as a whole, retries never duplicate rows. In ``merge`` mode nodes and
+    relationships are matched on their ids instead of created, so a rerun
+    after a partial load is also safe.
+    """
+
+    def __init__(self, uri, user, password, mode='create', max_retries=5, retry_base_delay=0.5):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
-    
+        if mode not in ('create', 'merge'):
+            raise ValueError(f"Unknown ingest mode: {mode}")
+        self.mode = mode
+        self.verb = 'MERGE' if mode == 'merge' else 'CREATE'
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retries = 0
+        self._retries_lock = threading.Lock()
+
     def close(self):
         self.driver.close()
-    
+
     def create_constraints(self, session):
         """Create necessary constraints in Neo4j."""
         constraints = [
@@ -25,156 +109,493 @@ class Neo4jIngester:
             "CREATE CONSTRAINT device_id IF NOT EXISTS FOR (d:Device) ON (d.id) IS UNIQUE",
             "CREATE CONSTRAINT ip_id IF NOT EXISTS FOR (i:IPAddress) ON (i.id) IS UNIQUE"
         ]
-        
+
         for constraint in constraints:
             session.run(constraint)
-    
-    def create_customers(self, session, customers_df):
+
+    def write_batch(self, session, work, records):
+        """Run ``work(tx, records)`` in one write transaction, retrying transient failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with session.begin_transaction() as tx:
+                    work(tx, records)
+                    tx.commit()
+                return
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                # Exponential backoff with jitter so workers that collided do not retry in lockstep
+                delay = self.retry_base_delay * (2 ** attempt) * (0.5 + random.random())
+                logger.warning(f"Retrying batch of {len(records)} rows in {delay:.1f}s after {type(e).__name__}: {str(e)}")
+                with self._retries_lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    def create_customers(self, tx, customers):
         """Create Customer nodes in Neo4j."""
-        query = """
+        query = f"""
         UNWIND $customers AS customer
-        CREATE (c:Customer {
-            id: customer.id,
+        {self.verb} (c:Customer {{id: customer.id}})
+        SET c += {{
             name: customer.name,
             email: customer.email,
             risk_score: customer.risk_score,
             created_at: datetime(customer.created_at)
-        })
+        }}
         """
-        session.run(query, customers=customers_df.to_dict('records'))
-    
-    def create_merchants(self, session, merchants_df):
+        tx.run(query, customers=customers).consume()
+
+    def create_merchants(self, tx, merchants):
         """Create Merchant nodes in Neo4j."""
-        query = """
+        query = f"""
         UNWIND $merchants AS merchant
-        CREATE (m:Merchant {
-            id: merchant.id,
+        {self.verb} (m:Merchant {{id: merchant.id}})
+        SET m += {{
             name: merchant.name,
             category: merchant.category,
             risk_score: merchant.risk_score,
             created_at: datetime(merchant.created_at)
-        })
+        }}
         """
-        session.run(query, merchants=merchants_df.to_dict('records'))
-    
-    def create_devices(self, session, devices_df):
+        tx.run(query, merchants=merchants).consume()
+
+    def create_devices(self, tx, devices):
         """Create Device nodes in Neo4j."""
-        query = """
+        query = f"""
         UNWIND $devices AS device
-        CREATE (d:Device {
-            id: device.id,
+        {self.verb} (d:Device {{id: device.id}})
+        SET d += {{
             fingerprint: device.fingerprint,
             type: device.type,
             risk_score: device.risk_score,
             created_at: datetime(device.created_at)
-        })
+        }}
         """
-        session.run(query, devices=devices_df.to_dict('records'))
-    
-    def create_ip_addresses(self, session, ip_addresses_df):
+        tx.run(query, devices=devices).consume()
+
+    def create_ip_addresses(self, tx, ip_addresses):
         """Create IPAddress nodes in Neo4j."""
-        query = """
+        query = f"""
         UNWIND $ip_addresses AS ip
-        CREATE (i:IPAddress {
-            id: ip.id,
+        {self.verb} (i:IPAddress {{id: ip.id}})
+        SET i += {{
             address: ip.address,
             location: ip.location,
             risk_score: ip.risk_score,
             created_at: datetime(ip.created_at)
-        })
+        }}
         """
-        session.run(query, ip_addresses=ip_addresses_df.to_dict('records'))
-    
-    def create_transactions(self, session, transactions_df):
-        """Create Transaction nodes and relationships in Neo4j."""
-        query = """
+        tx.run(query, ip_addresses=ip_addresses).consume()
+
+    def create_transactions(self, tx, transactions):
+        """Create Transaction nodes and their MADE relationships in Neo4j."""
+        # The merchant is only read here (no lock); its WITH relationship is a separate pass
+        query = f"""
         UNWIND $transactions AS tx
-        MATCH (c:Customer {id: tx.customer_id})
-        MATCH (m:Merchant {id: tx.merchant_id})
-        CREATE (t:Transaction {
-            id: tx.id,
+        MATCH (c:Customer {{id: tx.customer_id}})
+        MATCH (m:Merchant {{id: tx.merchant_id}})
+        {self.verb} (t:Transaction {{id: tx.id}})
+        SET t += {{
             amount: tx.amount,
             timestamp: datetime(tx.timestamp),
             status: tx.status,
             fraud_score: tx.fraud_score,
             is_fraudulent: tx.is_fraudulent
-        })
-        CREATE (c)-[:MADE]->(t)
-        CREATE (t)-[:WITH]->(m)
+        }}
+        {self.verb} (c)-[:MADE]->(t)
         """
-        session.run(query, transactions=transactions_df.to_dict('records'))
-    
-    def create_device_relationships(self, session, transactions_df, devices_df):
+        tx.run(query, transactions=transactions).consume()
+
+    def create_merchant_relationships(self, tx, transactions):
+        """Create relationships between transactions and merchants."""
+        query = f"""
+        UNWIND $transactions AS tx
+        MATCH (t:Transaction {{id: tx.id}})
+        MATCH (m:Merchant {{id: tx.merchant_id}})
+        {self.verb} (t)-[:WITH]->(m)
+        """
+        tx.run(query, transactions=transactions).consume()
+
+    def create_device_relationships(self, tx, transactions):
         """Create relationships between transactions and devices."""
-        query = """
+        query = f"""
         UNWIND $transactions AS tx
-        MATCH (t:Transaction {id: tx.id})
-        MATCH (d:Device {id: tx.device_id})
-        CREATE (t)-[:USED_DEVICE]->(d)
+        MATCH (t:Transaction {{id: tx.id}})
+        MATCH (d:Device {{id: tx.device_id}})
+        {self.verb} (t)-[:USED_DEVICE]->(d)
         """
-        session.run(query, transactions=transactions_df.to_dict('records'))
-    
-    def create_ip_relationships(self, session, transactions_df, ip_addresses_df):
+        tx.run(query, transactions=transactions).consume()
+
+    def create_ip_relationships(self, tx, transactions):
         """Create relationships between transactions and IP addresses."""
-        query = """
+        query = f"""
         UNWIND $transactions AS tx
-        MATCH (t:Transaction {id: tx.id})
-        MATCH (i:IPAddress {id: tx.ip_id})
-        CREATE (t)-[:FROM_IP]->(i)
+        MATCH (t:Transaction {{id: tx.id}})
+        MATCH (i:IPAddress {{id: tx.ip_id}})
+        {self.verb} (t)-[:FROM_IP]->(i)
         """
-        session.run(query, transactions=transactions_df.to_dict('records'))
+        tx.run(query, transactions=transactions).consume()
+
+class ProgressReport:
+    """Thread-safe row counter that logs progress and rows/s at most every ``interval`` seconds."""
+
+    def __init__(self, table, total=None, interval=10.0):
+        self.table = table
+        self.total = total
+        self.interval = interval
+        self.rows = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def add(self, rows):
+        with self._lock:
+            self.rows += rows
+            now = time.perf_counter()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self.log()
+
+    def rate(self):
+        return self.rows / max(time.perf_counter() - self.start, 1e-9)
+
+    def log(self):
+        done = f"{self.rows}/{self.total} ({self.rows / self.total:.0%})" if self.total else f"{self.rows}"
+        logger.info(f"{self.table}: {done} rows, {self.rate():,.0f} rows/s")
+
+def ingest_table(ingester, data_dir, table, work, batch_size, data_format, workers=1, partition_key=None,
+                 progress_interval=10.0, name=None):
+    """Stream ``table`` into Neo4j with ``workers`` threads, each writing batches of ``batch_size``.
+
+    With ``partition_key`` every row goes to the worker owning ``hash(row[partition_key])``,
+    so no two workers ever lock the same node through that key (e.g. a customer's
+    relationships are only created by one worker). Creating a relationship locks
+    both endpoints, so ``work`` should only touch nodes reached through that key
+    and nodes unique to the row. Otherwise batches are dealt round-robin.
+    """
+    total = count_rows(data_dir, table, data_format) if data_format == 'parquet' else None
+    progress = ProgressReport(name or table, total, progress_interval)
+    # Small queues bound how far reading may run ahead of the writers
+    queues = [queue.Queue(maxsize=2) for _ in range(workers)]
+    errors = []
+
+    def write_loop(worker_queue):
+        with ingester.driver.session() as session:
+            while True:
+                records = worker_queue.get()
+                if records is None:
+                    return
+                if errors:
+                    continue
+                try:
+                    ingester.write_batch(session, work, records)
+                    progress.add(len(records))
+                except Exception as e:
+                    errors.append(e)
+
+    threads = [
+        threading.Thread(target=write_loop, args=(worker_queue,), name=f"neo4j-ingest-{i}", daemon=True)
+        for i, worker_queue in enumerate(queues)
+    ]
+    for thread in threads:
+        thread.start()
+
+    buffers = [[] for _ in range(workers)]
+    next_worker = 0
+    try:
+        for batch in iter_batches(data_dir, table, batch_size=batch_size, data_format=data_format):
+            if errors:
+                break
+            records = batch_to_records(batch)
+            if partition_key is None:
+                queues[next_worker].put(records)
+                next_worker = (next_worker + 1) % workers
+                continue
+            for record in records:
+                buffers[hash(record.get(partition_key)) % workers].append(record)
+            for worker, buffer in enumerate(buffers):
+                if len(buffer) >= batch_size:
+                    queues[worker].put(buffer[:batch_size])
+                    buffers[worker] = buffer[batch_size:]
+        for worker, buffer in enumerate(buffers):
+            if buffer and not errors:
+                queues[worker].put(buffer)
+    finally:
+        for worker_queue in queues:
+            worker_queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    progress.log()
+    return progress.rows, progress.rate()
+
+class ImportFileGroup:
+    """Header file plus numbered part files for one node label or relationship type.
+
+    A new part is started every ``rows_per_file`` rows, so no file grows without
+    bound and the importer can read parts in parallel.
+    """
+
+    def __init__(self, export_dir, name, header, compression='gzip', rows_per_file=10_000_000):
+        self.export_dir = Path(export_dir)
+        self.name = name
+        self.compression = compression
+        self.rows_per_file = rows_per_file
+        self.header_file = f"{name}-header.csv"
+        (self.export_dir / self.header_file).write_text(','.join(header) + '\n')
+        self.files = []
+        self.rows = 0
+        self._sink = None
+        self._writer = None
+        self._part_rows = 0
+
+    def _open_part(self, schema):
+        suffix = '.csv.gz' if self.compression == 'gzip' else '.csv'
+        path = self.export_dir / f"{self.name}-part-{len(self.files):05d}{suffix}"
+        if self.compression == 'gzip':
+            self._sink = pa.CompressedOutputStream(str(path), 'gzip')
+        else:
+            self._sink = pa.OSFile(str(path), 'wb')
+        self._writer = pacsv.CSVWriter(self._sink, schema, write_options=pacsv.WriteOptions(include_header=False))
+        self.files.append(path.name)
+        self._part_rows = 0
+
+    def write(self, batch):
+        offset = 0
+        while offset < batch.num_rows:
+            if self._writer is None or self._part_rows >= self.rows_per_file:
+                self.close()
+                self._open_part(batch.schema)
+            size = min(batch.num_rows - offset, self.rows_per_file - self._part_rows)
+            self._writer.write(batch.slice(offset, size))
+            self._part_rows += size
+            self.rows += size
+            offset += size
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = None
+
+    def describe(self):
+        return {'header': self.header_file, 'files': self.files, 'rows': self.rows}
+
+def export_import_files(data_dir, export_dir, batch_size=50000, data_format=None, compression='gzip',
+                        rows_per_file=10_000_000, progress_interval=10.0):
+    """Stream a dataset into ``neo4j-admin database import full`` node and relationship files.
+
+    Transactions are read once, writing Transaction nodes and all four relationship
+    types from the same batches. Relationships with a missing endpoint id (e.g. no
+    device) are left out, as the Cypher loader's MATCH would skip them. The manifest
+    (``import.json``) is written last, so its presence marks a complete export.
+    """
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    (export_dir / IMPORT_MANIFEST).unlink(missing_ok=True)
+
+    nodes = {
+        label: ImportFileGroup(export_dir, label, [field for _, field in columns], compression, rows_per_file)
+        for label, (_, columns) in IMPORT_NODES.items()
+    }
+    relationships = {
+        rel_type: ImportFileGroup(
+            export_dir, rel_type, [f":START_ID({start_label})", f":END_ID({end_label})"], compression, rows_per_file
+        )
+        for rel_type, ((_, start_label), (_, end_label)) in IMPORT_RELATIONSHIPS.items()
+    }
+
+    try:
+        for label, (table, columns) in IMPORT_NODES.items():
+            total = count_rows(data_dir, table, data_format) if data_format == 'parquet' else None
+            progress = ProgressReport(table, total, progress_interval)
+            for batch in iter_batches(data_dir, table, batch_size=batch_size, data_format=data_format):
+                nodes[label].write(cypher_columns(batch, [column for column, _ in columns]))
+                if label == 'Transaction':
+                    for rel_type, ((start, _), (end, _)) in IMPORT_RELATIONSHIPS.items():
+                        # Datasets generated before devices and IPs were linked lack those columns
+                        if end not in batch.schema.names:
+                            continue
+                        pairs = cypher_columns(batch, [start, end])
+                        relationships[rel_type].write(
+                            pairs.filter(pc.and_(pc.is_valid(pairs.column(0)), pc.is_valid(pairs.column(1))))
+                        )
+                progress.add(batch.num_rows)
+            progress.log()
+    finally:
+        for group in list(nodes.values()) + list(relationships.values()):
+            group.close()
+
+    manifest = {
+        'compression': compression,
+        'nodes': {label: group.describe() for label, group in nodes.items()},
+        'relationships': {rel_type: group.describe() for rel_type, group in relationships.items()},
+    }
+    tmp_path = export_dir / f"{IMPORT_MANIFEST}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    tmp_path.replace(export_dir / IMPORT_MANIFEST)
+    return manifest
+
+def import_command(export_dir, manifest, database='neo4j'):
+    """The ``neo4j-admin`` command line that imports an export into an empty ``database``."""
+    export_dir = Path(export_dir)
+
+    def files(group):
+        return ','.join(str(export_dir / name) for name in [group['header']] + group['files'])
+
+    args = [f"--nodes={label}={files(group)}" for label, group in manifest['nodes'].items()]
+    args += [f"--relationships={rel_type}={files(group)}" for rel_type, group in manifest['relationships'].items()]
+    return ' '.join(['neo4j-admin', 'database', 'import', 'full'] + args + [database])
+
+def validate_import_files(export_dir):
+    """Check an export the way neo4j-admin would read it; returns a list of problems.
+
+    Every part must parse with its header (field count and typed properties), row
+    counts must match the manifest, node ids must be present and unique per label
+    and every relationship endpoint must name an exported node. Ids are held in
+    memory, so this is meant for test-sized exports.
+    """
+    export_dir = Path(export_dir)
+    manifest = json.loads((export_dir / IMPORT_MANIFEST).read_text())
+    problems = []
+
+    def read_group(name, group):
+        header = (export_dir / group['header']).read_text().strip().split(',')
+        column_types = {field: IMPORT_TYPES.get(field.rsplit(':', 1)[-1], pa.string()) for field in header}
+        tables = []
+        for file_name in group['files']:
+            try:
+                tables.append(pacsv.read_csv(
+                    export_dir / file_name,
+                    read_options=pacsv.ReadOptions(column_names=header),
+                    convert_options=pacsv.ConvertOptions(column_types=column_types)
+                ))
+            except (pa.ArrowInvalid, OSError) as e:
+                problems.append(f"{file_name}: {str(e)}")
+        rows = sum(table.num_rows for table in tables)
+        if rows != group['rows']:
+            problems.append(f"{name}: {rows} rows in files, {group['rows']} in manifest")
+        return header, tables
+
+    def column(tables, index):
+        # large_string so a column of many chunks can be combined past 2GB of ids
+        chunks = [chunk for table in tables for chunk in table.column(index).chunks]
+        return pc.cast(pa.chunked_array(chunks, type=pa.string()), pa.large_string()).combine_chunks()
+
+    node_ids = {}
+    for label, group in manifest['nodes'].items():
+        header, tables = read_group(label, group)
+        ids = column(tables, next(i for i, field in enumerate(header) if ':ID(' in field))
+        missing = pc.sum(pc.equal(ids, '')).as_py() or 0
+        if missing:
+            problems.append(f"{label}: {missing} nodes without an id")
+        duplicates = len(ids) - pc.count_distinct(ids).as_py()
+        if duplicates:
+            problems.append(f"{label}: {duplicates} duplicate ids")
+        node_ids[label] = ids
+
+    for rel_type, group in manifest['relationships'].items():
+        header, tables = read_group(rel_type, group)
+        for index, field in enumerate(header):
+            match = re.fullmatch(r':(START|END)_ID\((\w+)\)', field)
+            if match is None:
+                continue
+            label = match.group(2)
+            if label not in node_ids:
+                problems.append(f"{rel_type}: {field} refers to unknown label {label}")
+                continue
+            endpoints = column(tables, index)
+            dangling = len(endpoints) - (pc.sum(pc.is_in(endpoints, value_set=node_ids[label])).as_py() or 0)
+            if dangling:
+                problems.append(f"{rel_type}: {dangling} relationships with a {match.group(1).lower()} id not in {label}")
+
+    return problems
 
 def main():
     parser = argparse.ArgumentParser(description='Ingest test data into Neo4j')
     parser.add_argument('--data-path', type=str, required=True, help='Path to test data directory')
-    parser.add_argument('--uri', type=str, required=True, help='Neo4j database URI')
-    parser.add_argument('--user', type=str, required=True, help='Neo4j username')
-    parser.add_argument('--password', type=str, required=True, help='Neo4j password')
-    
+    parser.add_argument('--uri', type=str, help='Neo4j database URI')
+    parser.add_argument('--user', type=str, help='Neo4j username')
+    parser.add_argument('--password', type=str, help='Neo4j password')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows per write transaction')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel writer threads')
+    parser.add_argument('--mode', choices=['create', 'merge'], default='create', help='CREATE for a fresh database, MERGE to make reruns idempotent')
+    parser.add_argument('--max-retries', type=int, default=5, help='Retries per batch on transient errors')
+    parser.add_argument('--progress-interval', type=float, default=10.0, help='Seconds between progress reports')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None, help='Dataset format (default: detect)')
+    parser.add_argument('--export-dir', type=str, default=None, help='Write neo4j-admin import files here instead of loading through Cypher')
+    parser.add_argument('--compression', choices=['gzip', 'none'], default='gzip', help='Compression of exported part files')
+    parser.add_argument('--rows-per-file', type=int, default=10_000_000, help='Rows per exported part file')
+    parser.add_argument('--validate', action='store_true', help='Check the exported files before reporting success')
+
     args = parser.parse_args()
-    
-    # Load data from CSV files
+
     data_dir = Path(args.data_path)
-    customers_df = pd.read_csv(data_dir / 'customers.csv')
-    merchants_df = pd.read_csv(data_dir / 'merchants.csv')
-    transactions_df = pd.read_csv(data_dir / 'transactions.csv')
-    devices_df = pd.read_csv(data_dir / 'devices.csv')
-    ip_addresses_df = pd.read_csv(data_dir / 'ip_addresses.csv')
-    
+    data_format = args.format or detect_format(data_dir)
+
+    if args.export_dir:
+        # Offline initial load: neo4j-admin writes the store directly, far faster than transactional UNWIND
+        logger.info(f"Exporting {data_format} dataset from {data_dir} to neo4j-admin import files in {args.export_dir}")
+        start = time.perf_counter()
+        manifest = export_import_files(
+            data_dir, args.export_dir, args.batch_size, data_format,
+            compression=None if args.compression == 'none' else args.compression,
+            rows_per_file=args.rows_per_file, progress_interval=args.progress_interval
+        )
+        logger.info(f"Export completed in {time.perf_counter() - start:.1f}s")
+        if args.validate:
+            problems = validate_import_files(args.export_dir)
+            for problem in problems:
+                logger.error(f"Invalid import files: {problem}")
+            if problems:
+                sys.exit(1)
+            logger.info("Import files validated")
+        logger.info(f"Import with: {import_command(args.export_dir, manifest)}")
+        return
+
+    if not (args.uri and args.user and args.password):
+        parser.error('--uri, --user and --password are required unless --export-dir is given')
+    logger.info(f"Reading {data_format} dataset from {data_dir} ({args.mode} mode, {args.workers} workers)")
+
     # Initialize Neo4j ingester
-    ingester = Neo4jIngester(args.uri, args.user, args.password)
-    
+    ingester = Neo4jIngester(args.uri, args.user, args.password, mode=args.mode, max_retries=args.max_retries)
+
     try:
         with ingester.driver.session() as session:
             # Create constraints
             logger.info("Creating Neo4j constraints...")
             ingester.create_constraints(session)
-            
-            # Create nodes
-            logger.info("Creating Customer nodes...")
-            ingester.create_customers(session, customers_df)
-            
-            logger.info("Creating Merchant nodes...")
-            ingester.create_merchants(session, merchants_df)
-            
-            logger.info("Creating Device nodes...")
-            ingester.create_devices(session, devices_df)
-            
-            logger.info("Creating IPAddress nodes...")
-            ingester.create_ip_addresses(session, ip_addresses_df)
-            
-            # Create relationships
-            logger.info("Creating Transaction nodes and relationships...")
-            ingester.create_transactions(session, transactions_df)
-            
-            logger.info("Creating device relationships...")
-            ingester.create_device_relationships(session, transactions_df, devices_df)
-            
-            logger.info("Creating IP address relationships...")
-            ingester.create_ip_relationships(session, transactions_df, ip_addresses_df)
-            
-            logger.info("Data ingestion completed successfully")
-            
+
+        start = time.perf_counter()
+        summary = {}
+        # Nodes first (each node is written once, so batches can go to any worker). Creating a
+        # relationship locks both endpoints and merchants, devices and IPs are shared across
+        # customers, so transactions are then read once per relationship type, each pass
+        # partitioned by the shared endpoint: no two workers ever lock the same node.
+        for name, table, work, partition_key in (
+            ('customers', 'customers', ingester.create_customers, None),
+            ('merchants', 'merchants', ingester.create_merchants, None),
+            ('devices', 'devices', ingester.create_devices, None),
+            ('ip_addresses', 'ip_addresses', ingester.create_ip_addresses, None),
+            ('transactions', 'transactions', ingester.create_transactions, 'customer_id'),
+            ('WITH', 'transactions', ingester.create_merchant_relationships, 'merchant_id'),
+            ('USED_DEVICE', 'transactions', ingester.create_device_relationships, 'device_id'),
+            ('FROM_IP', 'transactions', ingester.create_ip_relationships, 'ip_id'),
+        ):
+            logger.info(f"Ingesting {name}...")
+            rows, rate = ingest_table(
+                ingester, data_dir, table, work, args.batch_size, data_format, workers=args.workers,
+                partition_key=partition_key, progress_interval=args.progress_interval, name=name
+            )
+            summary[name] = {'rows': rows, 'rows_per_second': round(rate)}
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Ingestion summary: {json.dumps(summary)}")
+        logger.info(f"Data ingestion completed successfully in {elapsed:.1f}s ({ingester.retries} retried batches)")
+
     except Exception as e:
         logger.error(f"Error during data ingestion: {str(e)}")
         raise
@@ -182,4 +603,4 @@ def main():
         ingester.close()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -1,133 +1,278 @@
-import pandas as pd
 import argparse
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine
 from pathlib import Path
 import json
 import logging
 
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from dataset_io import detect_format, iter_batches
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Column definitions only; keys and indexes are added after the load (see CONSTRAINTS)
+TABLE_COLUMNS = {
+    'customers': [
+        ('id', 'VARCHAR(20) NOT NULL'),
+        ('name', 'VARCHAR(100)'),
+        ('email', 'VARCHAR(100)'),
+        ('risk_score', 'FLOAT'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'merchants': [
+        ('id', 'VARCHAR(20) NOT NULL'),
+        ('name', 'VARCHAR(100)'),
+        ('category', 'VARCHAR(50)'),
+        ('risk_score', 'FLOAT'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'devices': [
+        ('id', 'VARCHAR(20) NOT NULL'),
+        ('fingerprint', 'VARCHAR(50)'),
+        ('type', 'VARCHAR(20)'),
+        ('risk_score', 'FLOAT'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'ip_addresses': [
+        ('id', 'VARCHAR(20) NOT NULL'),
+        ('address', 'VARCHAR(50)'),
+        ('location', 'VARCHAR(100)'),
+        ('risk_score', 'FLOAT'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'transactions': [
+        ('id', 'VARCHAR(20) NOT NULL'),
+        ('customer_id', 'VARCHAR(20)'),
+        ('merchant_id', 'VARCHAR(20)'),
+        ('amount', 'FLOAT'),
+        ('timestamp', 'TIMESTAMP'),
+        ('status', 'VARCHAR(20)'),
+        ('fraud_score', 'FLOAT'),
+        ('is_fraudulent', 'BOOLEAN'),
+        ('device_id', 'VARCHAR(20)'),
+        ('ip_id', 'VARCHAR(20)'),
+        ('fraud_scored_at', 'TIMESTAMP'),
+        ('gnn_score', 'FLOAT'),
+        ('gnn_scored_at', 'TIMESTAMP'),
+    ],
+}
+
+# Tables nothing else depends on load first (or together with transactions when keys are deferred)
+DIMENSION_TABLES = ('customers', 'merchants', 'devices', 'ip_addresses')
+
+# (name, table, definition) in creation order; names match what inline PRIMARY KEY/REFERENCES would generate
+CONSTRAINTS = [
+    ('customers_pkey', 'customers', 'PRIMARY KEY (id)'),
+    ('merchants_pkey', 'merchants', 'PRIMARY KEY (id)'),
+    ('devices_pkey', 'devices', 'PRIMARY KEY (id)'),
+    ('ip_addresses_pkey', 'ip_addresses', 'PRIMARY KEY (id)'),
+    ('transactions_pkey', 'transactions', 'PRIMARY KEY (id)'),
+    ('transactions_customer_id_fkey', 'transactions', 'FOREIGN KEY (customer_id) REFERENCES customers(id)'),
+    ('transactions_merchant_id_fkey', 'transactions', 'FOREIGN KEY (merchant_id) REFERENCES merchants(id)'),
+    ('transactions_device_id_fkey', 'transactions', 'FOREIGN KEY (device_id) REFERENCES devices(id)'),
+    ('transactions_ip_id_fkey', 'transactions', 'FOREIGN KEY (ip_id) REFERENCES ip_addresses(id)'),
+]
+
+INDEXES = [
+    ('transactions_customer_id_idx', 'transactions', 'customer_id'),
+    ('transactions_merchant_id_idx', 'transactions', 'merchant_id'),
+    ('transactions_timestamp_idx', 'transactions', 'timestamp'),
+]
+
 def load_config(data_dir):
     """Load configuration from config.json."""
     with open(Path(data_dir) / 'config.json', 'r') as f:
         return json.load(f)
 
+def _execute(engine, statements):
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+
 def create_tables(engine):
-    """Create necessary tables in PostgreSQL."""
-    create_customers_table = """
-    CREATE TABLE IF NOT EXISTS customers (
-        id VARCHAR(20) PRIMARY KEY,
-        name VARCHAR(100),
-        email VARCHAR(100),
-        risk_score FLOAT,
-        created_at TIMESTAMP
-    );
-    """
-    
-    create_merchants_table = """
-    CREATE TABLE IF NOT EXISTS merchants (
-        id VARCHAR(20) PRIMARY KEY,
-        name VARCHAR(100),
-        category VARCHAR(50),
-        risk_score FLOAT,
-        created_at TIMESTAMP
-    );
-    """
-    
-    create_transactions_table = """
-    CREATE TABLE IF NOT EXISTS transactions (
-        id VARCHAR(20) PRIMARY KEY,
-        customer_id VARCHAR(20) REFERENCES customers(id),
-        merchant_id VARCHAR(20) REFERENCES merchants(id),
-        amount FLOAT,
-        timestamp TIMESTAMP,
-        status VARCHAR(20),
-        fraud_score FLOAT,
-        is_fraudulent BOOLEAN
-    );
-    """
-    
-    create_devices_table = """
-    CREATE TABLE IF NOT EXISTS devices (
-        id VARCHAR(20) PRIMARY KEY,
-        fingerprint VARCHAR(50),
-        type VARCHAR(20),
-        risk_score FLOAT,
-        created_at TIMESTAMP
-    );
+    """Create necessary tables in PostgreSQL, without keys or indexes."""
+    _execute(engine, [
+        f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{name} {kind}' for name, kind in columns)})"
+        for table, columns in TABLE_COLUMNS.items()
+    ] + [
+        # Tables created by earlier versions of this script lack the device, IP and score columns
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS device_id VARCHAR(20)",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS ip_id VARCHAR(20)",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fraud_scored_at TIMESTAMP",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS gnn_score FLOAT",
+        "ALTER TABLE transactions ADD COLUMN IF NOT EXISTS gnn_scored_at TIMESTAMP",
+    ])
+
+def drop_constraints(engine):
+    """Drop keys and indexes so a bulk load does not maintain them row by row."""
+    _execute(engine, [f"DROP INDEX IF EXISTS {name}" for name, _, _ in INDEXES] + [
+        f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}" for name, table, _ in reversed(CONSTRAINTS)
+    ])
+
+def add_constraints(engine):
+    """Create any missing keys and indexes in one pass each, then refresh planner statistics."""
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT conname FROM pg_constraint")
+            existing = {row[0] for row in cursor.fetchall()}
+            for name, table, definition in CONSTRAINTS:
+                if name not in existing:
+                    start = time.perf_counter()
+                    cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+                    logger.info(f"Added {name} in {time.perf_counter() - start:.1f}s")
+            for name, table, column in INDEXES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+        connection.commit()
+        # ANALYZE cannot run inside the index-building transaction on every server version
+        with connection.cursor() as cursor:
+            for table in TABLE_COLUMNS:
+                cursor.execute(f"ANALYZE {table}")
+        connection.commit()
+    finally:
+        connection.close()
+
+def _copy_columns(table, batch):
+    # Older CSV datasets lack some columns (e.g. device_id); COPY only what the batch has
+    return [name for name, _ in TABLE_COLUMNS[table] if name in batch.schema.names]
+
+def _batch_to_csv(batch, columns):
+    arrays = []
+    for name in columns:
+        column = batch.column(name)
+        if pa.types.is_dictionary(column.type):
+            column = column.dictionary_decode()
+        arrays.append(column)
+    buffer = io.BytesIO()
+    pacsv.write_csv(pa.RecordBatch.from_arrays(arrays, names=columns), buffer, pacsv.WriteOptions(include_header=False))
+    buffer.seek(0)
+    return buffer
+
+def load_table(engine, data_dir, table, mode, batch_size, data_format):
+    """Stream one table into PostgreSQL with ``COPY ... FROM STDIN``, one chunk per transaction.
+
+    In ``upsert`` mode each chunk is copied into a temporary staging table and
+    merged with ``INSERT ... ON CONFLICT (id) DO UPDATE``.
     """
-    
-    create_ip_addresses_table = """
-    CREATE TABLE IF NOT EXISTS ip_addresses (
-        id VARCHAR(20) PRIMARY KEY,
-        address VARCHAR(50),
-        location VARCHAR(100),
-        risk_score FLOAT,
-        created_at TIMESTAMP
-    );
+    connection = engine.raw_connection()
+    rows = 0
+    start = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            if mode == 'upsert':
+                # Emptied automatically by every chunk's commit
+                cursor.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {table}_staging (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                )
+                connection.commit()
+            for batch in iter_batches(data_dir, table, batch_size=batch_size, data_format=data_format):
+                columns = _copy_columns(table, batch)
+                column_list = ', '.join(columns)
+                target = f"{table}_staging" if mode == 'upsert' else table
+                cursor.copy_expert(
+                    f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)", _batch_to_csv(batch, columns)
+                )
+                if mode == 'upsert':
+                    updates = ', '.join(f"{name} = EXCLUDED.{name}" for name in columns if name != 'id')
+                    # DISTINCT ON keeps one row per id, as ON CONFLICT cannot update a row twice
+                    cursor.execute(
+                        f"INSERT INTO {table} ({column_list}) "
+                        f"SELECT DISTINCT ON (id) {column_list} FROM {table}_staging ORDER BY id "
+                        f"ON CONFLICT (id) DO UPDATE SET {updates}"
+                    )
+                connection.commit()
+                rows += batch.num_rows
+                elapsed = time.perf_counter() - start
+                logger.info(f"{table}: {rows} rows ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return rows, time.perf_counter() - start
+
+def ingest_data(engine, data_dir, mode='replace', batch_size=50000, data_format=None, workers=4):
+    """Load a CSV or Parquet dataset into the pre-created tables.
+
+    ``replace`` empties the tables, drops their keys and indexes, loads every
+    table in parallel and rebuilds keys and indexes afterwards. ``append``
+    and ``upsert`` keep existing rows and keys, so the tables transactions
+    reference are loaded (in parallel) before transactions themselves.
     """
-    
-    with engine.connect() as conn:
-        conn.execute(create_customers_table)
-        conn.execute(create_merchants_table)
-        conn.execute(create_transactions_table)
-        conn.execute(create_devices_table)
-        conn.execute(create_ip_addresses_table)
-        conn.commit()
-
-def ingest_data(engine, data_dir):
-    """Ingest data from CSV files into PostgreSQL."""
     data_dir = Path(data_dir)
-    
-    # Load data from CSV files
-    customers_df = pd.read_csv(data_dir / 'customers.csv')
-    merchants_df = pd.read_csv(data_dir / 'merchants.csv')
-    transactions_df = pd.read_csv(data_dir / 'transactions.csv')
-    devices_df = pd.read_csv(data_dir / 'devices.csv')
-    ip_addresses_df = pd.read_csv(data_dir / 'ip_addresses.csv')
-    
-    # Ingest data into PostgreSQL
-    customers_df.to_sql('customers', engine, if_exists='replace', index=False)
-    merchants_df.to_sql('merchants', engine, if_exists='replace', index=False)
-    transactions_df.to_sql('transactions', engine, if_exists='replace', index=False)
-    devices_df.to_sql('devices', engine, if_exists='replace', index=False)
-    ip_addresses_df.to_sql('ip_addresses', engine, if_exists='replace', index=False)
-    
-    logger.info(f"Ingested {len(customers_df)} customers")
-    logger.info(f"Ingested {len(merchants_df)} merchants")
-    logger.info(f"Ingested {len(transactions_df)} transactions")
-    logger.info(f"Ingested {len(devices_df)} devices")
-    logger.info(f"Ingested {len(ip_addresses_df)} IP addresses")
+    data_format = data_format or detect_format(data_dir)
+
+    if mode == 'replace':
+        drop_constraints(engine)
+        _execute(engine, [f"TRUNCATE {', '.join(TABLE_COLUMNS)}"])
+        phases = [DIMENSION_TABLES + ('transactions',)]
+    else:
+        # ON CONFLICT needs the primary keys, and appends should be checked against them
+        add_constraints(engine)
+        phases = [DIMENSION_TABLES, ('transactions',)]
+
+    summary = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='postgres-copy') as executor:
+        for tables in phases:
+            futures = {
+                table: executor.submit(load_table, engine, data_dir, table, mode, batch_size, data_format)
+                for table in tables
+            }
+            for table, future in futures.items():
+                rows, seconds = future.result()
+                summary[table] = {'rows': rows, 'seconds': round(seconds, 1), 'rows_per_second': round(rows / max(seconds, 1e-9))}
+                logger.info(f"Ingested {rows} {table} in {seconds:.1f}s")
+
+    if mode == 'replace':
+        logger.info("Adding keys and indexes...")
+        add_constraints(engine)
+    return summary
 
 def main():
     parser = argparse.ArgumentParser(description='Ingest test data into PostgreSQL')
     parser.add_argument('--data-path', type=str, required=True, help='Path to test data directory')
     parser.add_argument('--db-url', type=str, required=True, help='PostgreSQL database URL')
-    
+    parser.add_argument('--mode', choices=['replace', 'append', 'upsert'], default='replace', help='Replace all rows, append to them, or upsert by id')
+    parser.add_argument('--batch-size', type=int, default=50000, help='Rows per COPY chunk')
+    parser.add_argument('--workers', type=int, default=4, help='Tables loaded in parallel')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None, help='Dataset format (default: detect)')
+
     args = parser.parse_args()
-    
-    # Create database engine
-    engine = create_engine(args.db_url)
-    
+
+    # Create database engine; one connection per parallel table load
+    engine = create_engine(args.db_url, pool_size=args.workers + 1)
+
     try:
         # Create tables
         logger.info("Creating database tables...")
         create_tables(engine)
-        
+
         # Load configuration
         config = load_config(args.data_path)
         logger.info(f"Loaded configuration: {config}")
-        
+
         # Ingest data
-        logger.info("Ingesting data into PostgreSQL...")
-        ingest_data(engine, args.data_path)
-        
+        logger.info(f"Ingesting data into PostgreSQL ({args.mode} mode)...")
+        summary = ingest_data(engine, args.data_path, args.mode, args.batch_size, args.format, args.workers)
+        logger.info(f"Ingestion summary: {json.dumps(summary)}")
+
         logger.info("Data ingestion completed successfully")
-        
+
     except Exception as e:
         logger.error(f"Error during data ingestion: {str(e)}")
         raise
+    finally:
+        engine.dispose()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,361 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from neo4j import GraphDatabase
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.gnn_scorer import GNNScorer
+from backend.model_store import ModelStore
+from backend.rule_engine import RuleEngine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Score and scored-at columns per scorer. The rule score is the fraud_score the API serves and
+# persists; GNN probabilities are a different model's output and live in their own columns.
+SCORE_COLUMNS = {
+    "rules": ("fraud_score", "fraud_scored_at"),
+    "gnn": ("gnn_score", "gnn_scored_at"),
+}
+
+# Scored-at is naive UTC, like the API's datetime.utcnow()
+UPDATE_POSTGRES = """
+UPDATE transactions AS t
+SET {score} = v.score, {scored_at} = now() AT TIME ZONE 'utc'
+FROM (VALUES %s) AS v(id, score)
+WHERE t.id = v.id
+"""
+
+UPDATE_NEO4J = """
+UNWIND $rows AS row
+MATCH (t:Transaction {{id: row.id}})
+SET t.{score} = row.score
+"""
+
+# Per-customer aggregates the rule features are built from, computed once up front
+CUSTOMER_AGGREGATES = """
+SELECT customer_id, COUNT(*) AS count, AVG(amount) AS mean_amount, MAX(amount) AS max_amount
+FROM transactions
+GROUP BY customer_id
+"""
+
+
+class Checkpoint:
+    """Last transaction id whose scores are durably written, kept in a JSON file.
+
+    The file also records the run's selection and scorer; a checkpoint from a
+    different configuration is ignored rather than resumed.
+    """
+
+    def __init__(self, path, run_key):
+        self.path = Path(path) if path else None
+        self.run_key = run_key
+        self.last_id = None
+        self.scored = 0
+        if self.path and self.path.exists():
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved.get("run") == run_key:
+                self.last_id, self.scored = saved["last_id"], saved["scored"]
+                logger.info(f"Resuming after transaction {self.last_id} ({self.scored} already scored)")
+            else:
+                logger.warning(f"Ignoring checkpoint {self.path} written for a different run: {saved.get('run')}")
+
+    def save(self, last_id, scored):
+        self.last_id, self.scored = last_id, scored
+        if not self.path:
+            return
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"run": self.run_key, "last_id": last_id, "scored": scored, "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if self.path:
+            self.path.unlink(missing_ok=True)
+
+
+class BulkScorer:
+    """Score stored transactions in chunks and write the scores back.
+
+    Chunks are read from Postgres with keyset pagination on ``id`` and scored
+    as whole columns, either with the latest (or a given) GNN checkpoint or
+    with the rule engine; rule scores go to ``fraud_score`` and GNN scores to
+    ``gnn_score``, each with its scored-at time (see ``SCORE_COLUMNS``). Each scored chunk is handed to a pool of writer
+    threads, which update Postgres with one ``UPDATE ... FROM (VALUES ...)``
+    per page and Neo4j with one ``UNWIND ... SET`` per batch, so the next
+    chunk is read and scored while earlier ones are written. The checkpoint
+    only advances once every chunk up to it is written in both stores.
+    """
+
+    def __init__(self, postgres_url, neo4j_uri=None, neo4j_user=None, neo4j_password=None,
+                 chunk_size=10000, write_batch_size=2000, writers=2, scorer="rules"):
+        self.engine = create_engine(postgres_url, pool_size=writers + 1)
+        self.neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password)) if neo4j_uri else None
+        self.chunk_size = chunk_size
+        self.write_batch_size = write_batch_size
+        self.writers = writers
+        self.score_column, self.scored_at_column = SCORE_COLUMNS[scorer]
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+        if self.neo4j_driver:
+            self.neo4j_driver.close()
+        self.engine.dispose()
+
+    def _writer_connection(self):
+        # psycopg2 connections must not be shared between threads, so each writer gets its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self.engine.raw_connection()
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def select_query(self, select, since):
+        conditions = ["(%(last_id)s IS NULL OR t.id > %(last_id)s)"]
+        if select == "unscored":
+            conditions.append(f"t.{self.score_column} IS NULL")
+        elif select == "stale":
+            # Never scored by this job or the API (generated data ships with prefilled scores),
+            # or cleared by a later write to the customer or merchant
+            conditions.append(f"t.{self.scored_at_column} IS NULL")
+        if since:
+            conditions.append("t.timestamp >= %(since)s")
+        return f"""
+        SELECT t.id, t.customer_id, t.merchant_id, t.amount, t.timestamp,
+               c.risk_score AS customer_risk_score, m.risk_score AS merchant_risk_score
+        FROM transactions t
+        LEFT JOIN customers c ON c.id = t.customer_id
+        LEFT JOIN merchants m ON m.id = t.merchant_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.id
+        LIMIT %(limit)s
+        """
+
+    def iter_chunks(self, select, since, last_id):
+        """Yield DataFrames of transactions to score, ``chunk_size`` rows at a time."""
+        query = self.select_query(select, since)
+        connection = self.engine.raw_connection()
+        try:
+            while True:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, {"last_id": last_id, "since": since, "limit": self.chunk_size})
+                    columns = [column[0] for column in cursor.description]
+                    rows = cursor.fetchall()
+                # Read-only; end the transaction so the snapshot does not pin old row versions
+                connection.commit()
+                if not rows:
+                    return
+                chunk = pd.DataFrame.from_records(rows, columns=columns)
+                last_id = rows[-1][0]
+                yield chunk
+                if len(rows) < self.chunk_size:
+                    return
+        finally:
+            connection.close()
+
+    def load_customer_aggregates(self):
+        return pd.read_sql(CUSTOMER_AGGREGATES, self.engine).set_index("customer_id")
+
+    def write_postgres(self, ids, scores):
+        connection = self._writer_connection()
+        try:
+            with connection.cursor() as cursor:
+                execute_values(
+                    cursor, UPDATE_POSTGRES.format(score=self.score_column, scored_at=self.scored_at_column),
+                    list(zip(ids, scores)), page_size=self.write_batch_size
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def write_neo4j(self, ids, scores):
+        rows = [{"id": transaction_id, "score": score} for transaction_id, score in zip(ids, scores)]
+        query = UPDATE_NEO4J.format(score=self.score_column)
+        with self.neo4j_driver.session() as session:
+            for start in range(0, len(rows), self.write_batch_size):
+                batch = rows[start:start + self.write_batch_size]
+                session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+
+    def write_chunk(self, ids, scores):
+        self.write_postgres(ids, scores)
+        if self.neo4j_driver:
+            self.write_neo4j(ids, scores)
+        return len(ids)
+
+    def run(self, score_chunk, checkpoint, select="stale", since=None, limit=None):
+        """Score and write selected transactions; returns ``(written, finished)``.
+
+        ``finished`` is False when ``limit`` stopped the run before the
+        selection was exhausted.
+        """
+        scored = checkpoint.scored
+        written, in_flight = 0, 0
+        finished = True
+        start = time.perf_counter()
+        # Chunks being written, oldest first, as (future, last id, rows)
+        pending = deque()
+
+        def advance():
+            nonlocal scored, written, in_flight
+            future, last_id, size = pending.popleft()
+            future.result()
+            scored += size
+            written += size
+            in_flight -= size
+            checkpoint.save(last_id, scored)
+
+        with ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix="score-writer") as executor:
+            for chunk in self.iter_chunks(select, since, checkpoint.last_id):
+                if limit is not None:
+                    remaining = limit - written - in_flight
+                    if remaining <= 0:
+                        finished = False
+                        break
+                    chunk = chunk.iloc[:remaining]
+                scores = np.round(np.asarray(score_chunk(chunk), dtype=np.float64), 6)
+                ids = chunk["id"].tolist()
+                pending.append((executor.submit(self.write_chunk, ids, scores.tolist()), ids[-1], len(ids)))
+                in_flight += len(ids)
+
+                # Checkpoint in order, and bound how far scoring may run ahead of the writers
+                while pending and (pending[0][0].done() or len(pending) > self.writers * 2):
+                    advance()
+                elapsed = time.perf_counter() - start
+                logger.info(
+                    f"Scored {written + in_flight} transactions, {written} written "
+                    f"({written / max(elapsed, 1e-9):,.0f} rows/s)"
+                )
+            while pending:
+                advance()
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Wrote {written} fraud scores in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} rows/s)")
+        return written, finished
+
+
+def gnn_chunk_scorer(model_dir, version=None, backend="numpy"):
+    """Score chunks with a stored GNN checkpoint through the online scorer."""
+    store = ModelStore(model_dir)
+    state = store.load_scorer_state(version)
+    head = None
+    if backend in ("torchscript", "int8"):
+        import torch
+        head = torch.jit.load(str(store.head_path(state["version"], quantized=backend == "int8")))
+    scorer = GNNScorer()
+    scorer.load_state(state, head=head)
+
+    def score(chunk):
+        timestamps = (pd.to_datetime(chunk["timestamp"]) - pd.Timestamp(0)).dt.total_seconds()
+        return scorer.score_batch(
+            chunk["id"].tolist(), chunk["customer_id"].tolist(), chunk["merchant_id"].tolist(),
+            chunk["amount"].fillna(0.0).to_numpy(dtype=np.float64), timestamps.fillna(0.0).tolist()
+        )
+    return score, state["version"]
+
+
+def rule_chunk_scorer(rules_path, customer_aggregates):
+    """Score chunks with the rule engine, building its features from stored aggregates.
+
+    ``similar_fraud_patterns`` needs a vector search per transaction and is
+    left at zero here; every other feature matches ``GraphRAG._build_features``.
+    """
+    engine = RuleEngine(config_path=rules_path)
+
+    def score(chunk):
+        amount = chunk["amount"].fillna(0.0).to_numpy(dtype=np.float64)
+        customer = customer_aggregates.reindex(chunk["customer_id"])
+        count = customer["count"].fillna(0).to_numpy(dtype=np.float64)
+        mean = customer["mean_amount"].fillna(0.0).to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(mean > 0, amount / mean, 0.0)
+        return engine.score_batch({
+            "amount": amount,
+            "related_count": np.maximum(count - 1, 0),
+            "similar_fraud_patterns": np.zeros(len(chunk)),
+            "customer_risk_score": chunk["customer_risk_score"].fillna(0.0).to_numpy(dtype=np.float64),
+            "merchant_risk_score": chunk["merchant_risk_score"].fillna(0.0).to_numpy(dtype=np.float64),
+            "customer_mean_amount": mean,
+            "customer_max_amount": customer["max_amount"].fillna(0.0).to_numpy(dtype=np.float64),
+            "amount_to_customer_mean": ratio,
+        })
+    return score
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-score stored transactions and write the scores back')
+    parser.add_argument('--db-url', type=str, required=True, help='PostgreSQL database URL')
+    parser.add_argument('--neo4j-uri', type=str, default=None, help='Neo4j URI; omit to update Postgres only')
+    parser.add_argument('--neo4j-user', type=str, default=None, help='Neo4j username')
+    parser.add_argument('--neo4j-password', type=str, default=None, help='Neo4j password')
+    parser.add_argument('--scorer', choices=['gnn', 'rules'], default='gnn', help='Score with a GNN checkpoint or the rule engine')
+    parser.add_argument('--model-dir', type=str, default=os.getenv('MODEL_DIR', './data/models'), help='GNN checkpoint directory')
+    parser.add_argument('--model-version', type=str, default=None, help='Checkpoint version (default: latest)')
+    parser.add_argument('--backend', choices=['numpy', 'torchscript', 'int8'], default=os.getenv('GNN_SCORER_BACKEND', 'numpy'), help='GNN scoring backend')
+    parser.add_argument('--rules-path', type=str, default=os.getenv('FRAUD_RULES_PATH', './data/fraud_rules.json'), help='Fraud rules file')
+    parser.add_argument('--select', choices=['stale', 'unscored', 'all'], default='stale', help='Score transactions without a current score, only those without any score, or all')
+    parser.add_argument('--since', type=str, default=None, help='Only transactions at or after this ISO timestamp')
+    parser.add_argument('--limit', type=int, default=None, help='Stop after this many transactions')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Transactions read and scored per chunk')
+    parser.add_argument('--write-batch-size', type=int, default=2000, help='Rows per UPDATE statement / Neo4j transaction')
+    parser.add_argument('--writers', type=int, default=2, help='Concurrent writer threads')
+    parser.add_argument('--checkpoint', type=str, default='./data/score_checkpoint.json', help='Progress file for resuming; empty to disable')
+    parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint')
+
+    args = parser.parse_args()
+
+    bulk_scorer = BulkScorer(
+        args.db_url, args.neo4j_uri, args.neo4j_user, args.neo4j_password,
+        chunk_size=args.chunk_size, write_batch_size=args.write_batch_size, writers=args.writers,
+        scorer=args.scorer
+    )
+
+    try:
+        if args.scorer == 'gnn':
+            score_chunk, version = gnn_chunk_scorer(args.model_dir, args.model_version, args.backend)
+            logger.info(f"Scoring with GNN checkpoint {version} ({args.backend})")
+        else:
+            logger.info("Loading customer aggregates for rule features...")
+            score_chunk = rule_chunk_scorer(args.rules_path, bulk_scorer.load_customer_aggregates())
+            version = 'rules'
+
+        run_key = {'select': args.select, 'since': args.since, 'scorer': args.scorer, 'version': version}
+        if args.checkpoint:
+            Path(args.checkpoint).parent.mkdir(parents=True, exist_ok=True)
+        if args.restart and args.checkpoint:
+            Path(args.checkpoint).unlink(missing_ok=True)
+        checkpoint = Checkpoint(args.checkpoint or None, run_key)
+
+        _, finished = bulk_scorer.run(score_chunk, checkpoint, select=args.select, since=args.since, limit=args.limit)
+        # A finished run leaves nothing to resume
+        if finished:
+            checkpoint.clear()
+        logger.info("Bulk scoring completed successfully")
+
+    except Exception as e:
+        logger.error(f"Error during bulk scoring: {str(e)}")
+        raise
+    finally:
+        bulk_scorer.close()
+
+if __name__ == '__main__':
+    main()
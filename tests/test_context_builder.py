@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from backend.context_builder import ContextBuilder
+
+NOW = datetime(2024, 1, 1, 12, 0)
+
+
+def graph_data(num_related=20):
+    return {
+        "transaction": {"id": "T0", "amount": 120.0, "timestamp": NOW, "status": "pending"},
+        "customer": {"id": "C1", "risk_score": 0.25},
+        "merchant": {"id": "M1", "category": "retail", "risk_score": 0.5},
+        "customer_features": {"count": 30, "mean": 80.0, "max_amount": 900.0},
+        "related_count": 250,
+        "related_transactions": [
+            {
+                "id": f"T{i}",
+                "amount": 10.0 * i,
+                "timestamp": NOW - timedelta(hours=i),
+                "merchant_category": "travel" if i % 3 else "retail",
+                "is_fraudulent": i == 17,
+            }
+            for i in range(1, num_related + 1)
+        ],
+    }
+
+
+def test_context_summarises_related_activity():
+    context = ContextBuilder(max_chars=5000, top_n=3).build(graph_data())
+    lines = context.splitlines()
+    assert lines[0] == "transaction id=T0 amount=120.00 hour=12 status=pending"
+    assert "related count=250 sampled=20 fraudulent=1" in lines
+    assert "velocity 1h:1 24h:20 7d:20" in lines
+    assert "category_mix travel:14 retail:6" in lines
+    # Known fraud ranks first, then the closest amounts on a log scale
+    top = [line for line in lines if line.startswith("- ")]
+    assert [line.split()[1] for line in top] == ["id=T17", "id=T12", "id=T13"]
+
+
+def test_context_is_bounded_and_deterministic():
+    builder = ContextBuilder(max_chars=300, top_n=50)
+    context = builder.build(graph_data(num_related=500))
+    assert len(context) <= 300
+    assert context == builder.build(graph_data(num_related=500))
+    # Whole lines are kept, most important first
+    assert context.startswith("transaction id=T0")
+    assert all(line in builder.build(graph_data(500)).splitlines() for line in context.splitlines())
+
+
+def test_context_handles_missing_data():
+    context = ContextBuilder().build({})
+    assert "hour=n/a" in context
+    assert "related count=0 sampled=0 fraudulent=0" in context
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+
+from dataset_io import batch_to_records, cypher_columns, detect_format, iter_batches
+from generate_test_data import generate_dataset
+
+
+def generate(output_dir, data_format):
+    generate_dataset(output_dir, 200, 20, 5, 0.1, seed=0, chunk_size=100, data_format=data_format)
+
+
+def test_regenerating_in_another_format_removes_the_old_files(tmp_path):
+    generate(tmp_path, "csv")
+    assert detect_format(tmp_path) == "csv"
+
+    generate(tmp_path, "parquet")
+    assert not list(tmp_path.glob("*.csv"))
+    assert detect_format(tmp_path) == "parquet"
+
+    generate(tmp_path, "csv")
+    assert not (tmp_path / "transactions").exists()
+    assert detect_format(tmp_path) == "csv"
+
+
+def test_detect_format_rejects_mixed_datasets(tmp_path):
+    generate(tmp_path, "parquet")
+    (tmp_path / "transactions.csv").write_text("id\n")
+    with pytest.raises(ValueError, match="Both CSV and Parquet"):
+        detect_format(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        detect_format(tmp_path / "missing")
+
+
+def test_cypher_columns_convert_timestamps_and_labels(tmp_path):
+    generate(tmp_path, "parquet")
+    batch = next(iter_batches(tmp_path, "transactions"))
+
+    converted = cypher_columns(batch, ["id", "timestamp", "status"])
+    assert converted.schema.names == ["id", "timestamp", "status"]
+    assert str(converted.schema.field("timestamp").type) == "string"
+    assert str(converted.schema.field("status").type) == "string"
+    # Record dicts for Cypher parameters use the same conversion
+    record = batch_to_records(batch)[0]
+    assert record["timestamp"] == converted.column(1)[0].as_py()
+    assert record["status"] == converted.column(2)[0].as_py()
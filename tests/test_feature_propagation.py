@@ -0,0 +1,44 @@
+import numpy as np
+
+from backend.feature_propagation import PropagatedFeatureCache, normalized_adjacency, propagate_features
+
+# Path graph 0 - 1 - 2, both directions
+EDGE_INDEX = np.array([[0, 1, 1, 2], [1, 0, 2, 1]])
+
+
+def dense_adjacency():
+    a = np.eye(3)
+    a[EDGE_INDEX[1], EDGE_INDEX[0]] = 1.0
+    inv_sqrt = 1.0 / np.sqrt(a.sum(axis=1))
+    return a * inv_sqrt[:, None] * inv_sqrt[None, :]
+
+
+def test_normalized_adjacency_matches_gcn_normalisation():
+    adjacency = normalized_adjacency(EDGE_INDEX, 3)
+    assert adjacency.dtype == np.float32
+    assert np.allclose(adjacency.toarray(), dense_adjacency())
+
+
+def test_propagate_features_stacks_hops_for_selected_rows():
+    x = np.arange(6, dtype=np.float32).reshape(3, 2)
+    a = dense_adjacency()
+    features = propagate_features(x, EDGE_INDEX, hops=2, rows=[0, 2])
+    expected = np.concatenate([x, a @ x, a @ a @ x], axis=1)[[0, 2]]
+    assert features.shape == (2, 6)
+    assert np.allclose(features, expected, atol=1e-5)
+
+
+def test_cache_hits_on_same_graph_and_misses_on_changes(tmp_path):
+    cache = PropagatedFeatureCache(tmp_path, max_entries=2)
+    x = np.ones((3, 2), dtype=np.float32)
+    rows = np.arange(3)
+
+    first, hit = cache.get_or_compute(x, EDGE_INDEX, 1, rows)
+    assert not hit
+    again, hit = cache.get_or_compute(x, EDGE_INDEX, 1, rows)
+    assert hit and np.array_equal(first, again)
+
+    assert not cache.get_or_compute(x, EDGE_INDEX, 2, rows)[1]
+    assert not cache.get_or_compute(x * 2, EDGE_INDEX, 1, rows)[1]
+    # Only the newest max_entries matrices are kept
+    assert len(list(tmp_path.glob("*-h*.npy"))) == 2
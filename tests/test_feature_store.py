@@ -0,0 +1,176 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from backend.feature_store import FeatureStore
+
+
+class FakeNeo4jDriver:
+    """Returns fixed aggregates; ``during_read`` runs while the first query is being read."""
+
+    def __init__(self, customers, merchants, during_read=None):
+        self.results = {"Customer": customers, "Merchant": merchants}
+        self.during_read = during_read
+
+    def session(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query):
+        if self.during_read is not None:
+            self.during_read()
+            self.during_read = None
+        label = "Customer" if "(c:Customer)" in query else "Merchant"
+        return self.results[label]
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execution_options(self, **options):
+        self.engine.options = options
+        return self
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        if "ANY(:ids)" in sql:
+            self.engine.counted_queries.append(list(params["ids"]))
+            if self.engine.during_counted is not None:
+                self.engine.during_counted()
+                self.engine.during_counted = None
+            return [(i,) for i in params["ids"] if i in self.engine.visible_ids]
+        if self.engine.during_read is not None:
+            self.engine.during_read()
+            self.engine.during_read = None
+        return self.engine.rows["customer_id" if "GROUP BY customer_id" in sql else "merchant_id"]
+
+
+class FakeEngine:
+    def __init__(self, rows, visible_ids, during_read=None, during_counted=None):
+        self.rows = rows
+        self.visible_ids = visible_ids
+        self.during_read = during_read
+        self.during_counted = during_counted
+        self.counted_queries = []
+        self.options = None
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+def aggregate(entity_id, count, total):
+    return {"id": entity_id, "count": count, "total": total, "max_amount": total, "last_seen": datetime(2024, 1, 1)}
+
+
+def transaction(transaction_id, customer_id, merchant_id, amount):
+    return SimpleNamespace(
+        id=transaction_id, customer_id=customer_id, merchant_id=merchant_id,
+        amount=amount, timestamp=datetime(2024, 1, 2)
+    )
+
+
+def test_incremental_updates():
+    store = FeatureStore()
+    store.on_transaction_created(transaction(1, "C1", "M1", 10.0))
+    store.on_transaction_created(transaction(2, "C1", "M2", 30.0))
+
+    customer = store.get_customer("C1")
+    assert customer["count"] == 2
+    assert customer["mean"] == 20.0
+    assert customer["max_amount"] == 30.0
+    assert store.get_merchant("M2")["sum"] == 30.0
+    assert store.get_customer("missing") is None
+
+
+def test_writes_during_neo4j_rebuild_are_replayed():
+    store = FeatureStore()
+    driver = FakeNeo4jDriver(
+        customers=[aggregate("C1", 2, 20.0)],
+        merchants=[aggregate("M1", 2, 20.0)],
+        during_read=lambda: store.on_transaction_created(transaction(7, "C1", "M1", 5.0)),
+    )
+    store.rebuild_from_neo4j(driver)
+
+    assert store.ready
+    assert store.get_customer("C1")["count"] == 3
+    assert store.get_merchant("M1")["sum"] == 25.0
+
+    # Once the rebuild is over, writes go straight to the new tables
+    store.on_transaction_created(transaction(8, "C1", "M1", 1.0))
+    assert store.get_customer("C1")["count"] == 4
+
+
+def test_postgres_rebuild_skips_writes_it_already_counted():
+    store = FeatureStore()
+
+    def concurrent_writes():
+        # Transaction 5 committed before the aggregates' snapshot, 6 after it
+        store.on_transaction_created(transaction(5, "C1", "M1", 10.0))
+        store.on_transaction_created(transaction(6, "C1", "M1", 4.0))
+
+    engine = FakeEngine(
+        rows={
+            "customer_id": [("C1", 3, 30.0, 10.0, datetime(2024, 1, 1))],
+            "merchant_id": [("M1", 3, 30.0, 10.0, datetime(2024, 1, 1))],
+        },
+        visible_ids={5},
+        during_read=concurrent_writes,
+    )
+    store.rebuild_from_postgres(engine)
+
+    assert engine.options == {"isolation_level": "REPEATABLE READ"}
+    assert store.get_customer("C1")["count"] == 4
+    assert store.get_merchant("M1")["sum"] == 34.0
+
+
+def test_postgres_rebuild_checks_counted_ids_outside_the_lock():
+    store = FeatureStore()
+
+    def write_during_check():
+        # A request-path write must not wait for the check to finish
+        assert not store._lock.locked()
+        store.on_transaction_created(transaction(6, "C1", "M1", 4.0))
+
+    engine = FakeEngine(
+        rows={
+            "customer_id": [("C1", 3, 30.0, 10.0, datetime(2024, 1, 1))],
+            "merchant_id": [("M1", 3, 30.0, 10.0, datetime(2024, 1, 1))],
+        },
+        visible_ids={5},
+        during_read=lambda: store.on_transaction_created(transaction(5, "C1", "M1", 10.0)),
+        during_counted=write_during_check,
+    )
+    store.rebuild_from_postgres(engine)
+
+    # The write that arrived during the first check is checked and replayed on a second pass
+    assert engine.counted_queries == [[5], [6]]
+    assert store.get_customer("C1")["count"] == 4
+    assert store.get_merchant("M1")["sum"] == 34.0
+
+
+def test_failed_rebuild_keeps_tables_and_stops_buffering():
+    store = FeatureStore()
+    store.on_transaction_created(transaction(1, "C1", "M1", 10.0))
+
+    def fail():
+        raise RuntimeError("neo4j unavailable")
+
+    with pytest.raises(RuntimeError):
+        store.rebuild_from_neo4j(FakeNeo4jDriver([], [], during_read=fail))
+    assert store.get_customer("C1")["count"] == 1
+    assert store._pending is None
@@ -0,0 +1,80 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend.gnn_scorer import GNNScorer, _TransactionIdSet, build_scorer_state
+from backend.graph_builder import build_graph_arrays
+
+
+def make_scorer(hidden=8):
+    columns = {
+        "transaction_id": np.array(["T1", "T2", "T3"], dtype=object),
+        "customer_id": np.array(["C1", "C1", "C2"], dtype=object),
+        "merchant_id": np.array(["M1", "M2", "M1"], dtype=object),
+        "amount": np.array([10.0, 250.0, 40.0]),
+        "timestamp": np.array([1.7e9, 1.7e9 + 3600, 1.7e9 + 7200]),
+    }
+    arrays = build_graph_arrays(columns)
+    rng = np.random.default_rng(0)
+    num_features = arrays["x"].shape[1]
+    weights = {
+        "conv1_weight": rng.normal(size=(hidden, num_features)).astype(np.float32),
+        "conv1_bias": rng.normal(size=hidden).astype(np.float32),
+        "conv2_weight": rng.normal(size=(hidden, hidden)).astype(np.float32),
+        "conv2_bias": rng.normal(size=hidden).astype(np.float32),
+        "classifier_weight": rng.normal(size=(2, hidden)).astype(np.float32),
+        "classifier_bias": rng.normal(size=2).astype(np.float32),
+    }
+    state = build_scorer_state(
+        weights, arrays["x"], arrays["edge_index"],
+        {"customer": arrays["customer_ids"], "merchant": arrays["merchant_ids"]},
+        {"customer": arrays["customer_nodes"], "merchant": arrays["merchant_nodes"]},
+        arrays["transaction_ids"], arrays["feature_stats"]
+    )
+    scorer = GNNScorer()
+    scorer.load_state(state)
+    return scorer
+
+
+def test_transaction_id_set_merges_recent_ids():
+    ids = _TransactionIdSet(["T1", "T2"], merge_every=2)
+    assert ids.contains(["T1", "T3", "T2"]).tolist() == [True, False, True]
+
+    ids.add("T3")
+    assert ids.recent and ids.contains(["T3"]).tolist() == [True]
+    ids.add("T4")
+    assert not ids.recent
+    assert ids.hashes.dtype == np.uint64 and len(ids) == 4
+    assert ids.contains(["T1", "T3", "T4", "T5"]).tolist() == [True, True, True, False]
+    assert _TransactionIdSet([]).contains(["T1"]).tolist() == [False]
+
+
+def test_known_transactions_are_not_counted_twice():
+    scorer = make_scorer()
+    args = (["C1"], ["M1"], [10.0], [1.7e9])
+    # A trained transaction scores as already in the graph, an unsaved one as new
+    assert scorer.score_batch(["T1"], *args) != scorer.score_batch([None], *args)
+
+    new = SimpleNamespace(id="T9", customer_id="C1", merchant_id="M1", amount=10.0, timestamp=1.7e9)
+    before = scorer.score_batch(["T9"], *args)
+    scorer.on_transaction_created(new)
+    scorer.on_transaction_created(new)
+    assert scorer.updates == 1
+    assert scorer.stats()["known_transactions"] == 4
+    assert np.allclose(scorer.score_batch(["T9"], *args), before, atol=1e-6)
+
+
+def test_scored_counter_is_exact_under_concurrency():
+    scorer = make_scorer()
+
+    def score():
+        for _ in range(200):
+            scorer.score_batch([None, "T1"], ["C1", "C2"], ["M1", "M2"], [5.0, 6.0], [1.7e9, 1.7e9])
+
+    threads = [threading.Thread(target=score) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert scorer.stats()["scored"] == 8 * 200 * 2
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("torch_geometric")
+pytest.importorskip("neo4j")
+
+from backend.gnn_trainer import GNNTrainer
+
+
+def make_trainer(**options):
+    # Skip __init__, which opens a Neo4j driver and the model/snapshot directories
+    trainer = GNNTrainer.__new__(GNNTrainer)
+    trainer.options = {"mode": "full", "epochs": 100, **options}
+    return trainer
+
+
+def test_resolve_options_rejects_zero_epochs():
+    trainer = make_trainer()
+    assert trainer._resolve_options({"epochs": 1})["epochs"] == 1
+    with pytest.raises(ValueError, match="at least one epoch"):
+        trainer._resolve_options({"epochs": 0})
+    with pytest.raises(ValueError, match="at least one epoch"):
+        make_trainer(epochs=0)._resolve_options({})
@@ -0,0 +1,16 @@
+import warnings
+
+import numpy as np
+
+from backend.graph_builder import FEATURE_NAMES, MERCHANT_CATEGORIES, merchant_features
+
+
+def test_merchant_features_map_unknown_categories_to_other():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        x = merchant_features(np.zeros(4, dtype=np.float32), ["travel", "other", None, "casino"])
+
+    first = FEATURE_NAMES.index(f"category_{MERCHANT_CATEGORIES[0]}")
+    categories = x[:, first:first + len(MERCHANT_CATEGORIES) + 1]
+    assert categories.argmax(axis=1).tolist() == [MERCHANT_CATEGORIES.index("travel")] + [len(MERCHANT_CATEGORIES)] * 3
+    assert categories.sum(axis=1).tolist() == [1.0] * 4
@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("neo4j")
+pytest.importorskip("langchain")
+
+from backend.context_builder import ContextBuilder
+from backend.graph_rag import GraphRAG, HashingEmbeddings
+from backend.rule_engine import RuleEngine
+
+# Neighbourhoods in the fake graph; "T404" is not in it
+GRAPH = {
+    "T1": {"amount": 20000.0, "related_count": 0},
+    "T2": {"amount": 10.0, "related_count": 50},
+    "T3": {"amount": 20000.0, "related_count": 50},
+    "T4": {"amount": 10.0, "related_count": 5},
+}
+
+
+class FakeResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+    async def consume(self):
+        return None
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def run(self, query, transaction_ids=None, **params):
+        if transaction_ids is None:
+            return FakeResult([])
+        self.driver.requested.append(list(transaction_ids))
+        # The graph returns found rows only, in its own order
+        return FakeResult([
+            {
+                "transaction_id": tid,
+                "transaction": {"id": tid, "amount": GRAPH[tid]["amount"], "timestamp": datetime(2024, 1, 1), "status": "ok"},
+                "customer": {"id": "C1", "risk_score": 0.0},
+                "merchant": {"id": "M1", "category": "retail", "risk_score": 0.0},
+                "related": [],
+                "related_count": None if "null AS related_count" in query else GRAPH[tid]["related_count"],
+            }
+            for tid in reversed(transaction_ids) if tid in GRAPH
+        ])
+
+
+class FakeDriver:
+    def __init__(self):
+        self.requested = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+class FakeVectorStore:
+    def similarity_search_by_vectors(self, vectors, k=4):
+        return [[] for _ in vectors]
+
+
+def make_graph_rag():
+    # Skip __init__, which connects to Neo4j and opens the configured vector store
+    graph_rag = GraphRAG.__new__(GraphRAG)
+    graph_rag.neo4j_driver = FakeDriver()
+    graph_rag.embeddings = HashingEmbeddings(dim=16)
+    graph_rag._vector_store = FakeVectorStore()
+    graph_rag.similar_patterns_k = 3
+    graph_rag.lookback_days = 90
+    graph_rag.max_related = 200
+    graph_rag._schema_ready = False
+    graph_rag.feature_store = None
+    graph_rag.score_cache = None
+    graph_rag.rule_engine = RuleEngine()
+    graph_rag.context_builder = ContextBuilder()
+    graph_rag.executor = ThreadPoolExecutor(max_workers=2)
+    graph_rag.max_concurrency = 4
+    graph_rag._semaphore = None
+    return graph_rag
+
+
+def test_analyze_transactions_keeps_input_order_with_duplicates_and_missing_ids():
+    graph_rag = make_graph_rag()
+    scores = asyncio.run(graph_rag.analyze_transactions(["T3", "T404", "T1", "T2", "T3", "T1"]))
+
+    # high_amount (0.3) and high_related_activity (0.2) from the default rules
+    assert scores == pytest.approx([0.5, None, 0.3, 0.2, 0.5, 0.3])
+    assert scores[1] is None
+    # Each id is fetched once, in first-seen order
+    assert graph_rag.neo4j_driver.requested == [["T3", "T404", "T1", "T2"]]
+
+
+def test_analyze_transactions_handles_empty_and_all_missing_batches():
+    graph_rag = make_graph_rag()
+    assert asyncio.run(graph_rag.analyze_transactions([])) == []
+    assert asyncio.run(graph_rag.analyze_transactions(["T404", "T404"])) == [None, None]
+    assert asyncio.run(graph_rag.analyze_transaction(type("Row", (), {"id": "T404"})())) == 0.0
+
+
+def test_related_count_does_not_depend_on_feature_store_readiness():
+    class ReadyFeatureStore:
+        ready = True
+
+        def get_customer(self, customer_id):
+            return {"count": 1000, "mean": 50.0, "max_amount": 500.0}
+
+    graph_rag = make_graph_rag()
+    assert asyncio.run(graph_rag.analyze_transactions(["T4"])) == [0.0]
+    graph_rag.feature_store = ReadyFeatureStore()
+    # The windowed graph count is used either way, not the customer's all-time count
+    assert asyncio.run(graph_rag.analyze_transactions(["T4"])) == [0.0]
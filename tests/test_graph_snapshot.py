@@ -0,0 +1,198 @@
+import multiprocessing
+
+import numpy as np
+
+from backend.graph_snapshot import GraphSnapshot
+from backend.training_data import TRAINING_COLUMNS, Neo4jTrainingDataReader
+
+
+def make_columns(start, count, base_time=1_700_000_000):
+    ids = np.arange(start, start + count)
+    return {
+        "transaction_id": np.array([f"TXN_{i:08d}" for i in ids], dtype=object),
+        "customer_id": np.array([f"CUST_{i % 5:06d}" for i in ids], dtype=object),
+        "merchant_id": np.array([f"MERCH_{i % 3:06d}" for i in ids], dtype=object),
+        "amount": (ids * 10.0 + 1.0).astype(np.float64),
+        "timestamp": (base_time + ids * 60).astype(np.float64),
+        "is_fraudulent": ids % 7 == 0,
+        "customer_risk_score": np.full(count, 0.2, dtype=np.float32),
+        "merchant_risk_score": np.full(count, 0.4, dtype=np.float32),
+        "merchant_category": np.array(["retail"] * count, dtype=object),
+    }
+
+
+class FakeReader:
+    """Serves transactions newer than ``since``, rejecting non-integer watermarks like Neo4j does."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.calls = []
+
+    def read(self, since=None):
+        self.calls.append(since)
+        if since is not None and not isinstance(since, int):
+            raise TypeError(f"epochSeconds must be an integer, got {since!r}")
+        keep = np.ones(len(self.columns["transaction_id"]), dtype=bool)
+        if since is not None:
+            keep = self.columns["timestamp"] > since
+        return {name: values[keep] for name, values in self.columns.items()}
+
+
+def test_consecutive_delta_exports(tmp_path):
+    snapshot = GraphSnapshot(tmp_path)
+    reader = FakeReader(make_columns(0, 20))
+    assert snapshot.export(reader)["num_transactions"] == 20
+
+    watermark = snapshot.stats()["watermark"]
+    assert isinstance(watermark, int)
+
+    # A second export with nothing new reads past the watermark and adds no segment
+    assert snapshot.export(reader) is None
+    assert reader.calls == [None, watermark]
+
+    reader.columns = make_columns(0, 30)
+    segment = snapshot.export(reader)
+    assert segment["num_transactions"] == 10
+    stats = snapshot.stats()
+    assert stats["segments"] == 2
+    assert stats["num_transactions"] == 30
+    assert stats["watermark"] > watermark
+
+
+def test_delta_reuses_known_entities(tmp_path):
+    snapshot = GraphSnapshot(tmp_path)
+    snapshot.append(make_columns(0, 20))
+    segment = snapshot.append(make_columns(20, 10))
+
+    # Customers and merchants were all seen in the first segment
+    assert segment["num_customers"] == 0
+    assert segment["num_merchants"] == 0
+    assert segment["num_nodes"] == 10
+    arrays = snapshot.load_graph_arrays()
+    assert len(arrays["transaction_ids"]) == 30
+    assert arrays["edge_index"].max() < snapshot.stats()["num_nodes"]
+
+
+def test_compact_preserves_graph(tmp_path):
+    snapshot = GraphSnapshot(tmp_path)
+    snapshot.append(make_columns(0, 20))
+    snapshot.append(make_columns(20, 10))
+    before = snapshot.load_graph_arrays()
+
+    snapshot.compact()
+    after = snapshot.load_graph_arrays()
+    assert after["build_stats"]["snapshot_segments"] == 1
+    np.testing.assert_array_equal(before["x"], after["x"])
+    np.testing.assert_array_equal(before["edge_index"], after["edge_index"])
+    assert sorted(p.name for p in tmp_path.glob("segment-*")) == ["segment-000002"]
+
+
+def test_snapshot_shared_between_instances(tmp_path):
+    # Two handles on one directory, as the API process and a training worker hold
+    first, second = GraphSnapshot(tmp_path), GraphSnapshot(tmp_path)
+    first.append(make_columns(0, 10))
+    second.append(make_columns(10, 10))
+    first.append(make_columns(20, 10))
+
+    stats = GraphSnapshot(tmp_path).stats()
+    assert stats["segments"] == 3
+    assert stats["num_transactions"] == 30
+
+
+def _append_worker(args):
+    path, start = args
+    return GraphSnapshot(path).append(make_columns(start, 50))["name"]
+
+
+def test_concurrent_appends_from_processes(tmp_path):
+    # The API server and training workers append from separate processes
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        names = pool.map(_append_worker, [(str(tmp_path), start) for start in range(0, 400, 50)])
+
+    assert len(set(names)) == 8
+    snapshot = GraphSnapshot(tmp_path)
+    stats = snapshot.stats()
+    assert stats["segments"] == 8
+    assert stats["num_transactions"] == 400
+    assert sorted(segment["name"] for segment in snapshot.manifest["segments"]) == sorted(names)
+    offsets = [segment["node_offset"] for segment in snapshot.manifest["segments"]]
+    assert offsets == sorted(offsets)
+
+
+def test_clear_resets_snapshot(tmp_path):
+    snapshot = GraphSnapshot(tmp_path)
+    snapshot.append(make_columns(0, 10))
+    snapshot.clear()
+
+    assert not snapshot.exists
+    assert [p.name for p in tmp_path.iterdir()] == [".lock"]
+    assert snapshot.append(make_columns(0, 10))["name"] == "segment-000000"
+
+
+class FakeResult:
+    def __init__(self, rows, cuts=None):
+        self.rows = rows
+        self.cuts = cuts
+
+    def single(self):
+        return {"count": len(self.rows), "cuts": self.cuts}
+
+    def values(self, *keys):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows, params):
+        self.rows = rows
+        self.params = params
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        self.params.append(params)
+        if "AS cuts" in query:
+            ids = sorted(row[0] for row in self.rows)
+            cuts = [ids[i * params["step"]] if i * params["step"] < len(ids) else None
+                    for i in range(1, params["partitions"])]
+            return FakeResult(self.rows, cuts)
+        if params.get("after") is not None:
+            return FakeResult([])
+        return FakeResult(self.rows)
+
+
+class FakeDriver:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = []
+
+    def session(self):
+        return FakeSession(self.rows, self.params)
+
+
+def test_reader_binds_watermark_to_every_query():
+    row = ["TXN_1", "CUST_1", "MERCH_1", 10.0, 1_700_000_060, False, 0.1, 0.2, "retail"]
+    assert len(row) == len(TRAINING_COLUMNS)
+    driver = FakeDriver([row])
+    columns = Neo4jTrainingDataReader(driver, page_size=10).read(since=1_700_000_000)
+
+    assert list(columns["transaction_id"]) == ["TXN_1"]
+    assert {params["since"] for params in driver.params} == {1_700_000_000}
+
+
+def test_partition_bounds_come_from_one_query():
+    rows = [[f"TXN_{i:03d}"] for i in range(100)]
+    driver = FakeDriver(rows)
+    reader = Neo4jTrainingDataReader(driver, page_size=10, partitions=4)
+
+    assert reader.partition_bounds(100) == [
+        (None, "TXN_025", 25), ("TXN_025", "TXN_050", 25), ("TXN_050", "TXN_075", 25), ("TXN_075", None, 25)
+    ]
+    assert len(driver.params) == 1
+
+    # Rows deleted after the count shorten the last partitions instead of failing
+    driver.rows = rows[:60]
+    assert reader.partition_bounds(100) == [(None, "TXN_025", 25), ("TXN_025", "TXN_050", 25), ("TXN_050", None, 50)]
@@ -0,0 +1,34 @@
+from backend.metrics import LatencyHistogram, MetricsRegistry
+
+
+def test_histogram_buckets_and_window_quantiles():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0), window=4)
+    for value in (0.05, 0.5, 0.5, 5.0, 5.0):
+        histogram.observe(value)
+    assert histogram.bucket_counts == [1, 2, 2]
+    assert histogram.count == 5
+    # Only the last four samples are kept for quantiles
+    assert histogram.quantiles((0.0, 1.0)) == {0.0: 0.5, 1.0: 5.0}
+    assert LatencyHistogram().quantiles((0.5,)) == {0.5: 0.0}
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(namespace="test")
+    registry.observe("stage_duration_seconds", 0.002, stage="fetch")
+    registry.inc("neo4j_rows", 10, query="training_data")
+    registry.inc("neo4j_rows", 5, query="training_data")
+    with registry.in_flight("analyze"):
+        assert registry.snapshot()["gauges"][("in_flight", (("operation", "analyze"),))] == 1
+    registry.register_collector(lambda: [("cache_entries", 3, {"cache": 'score"s'})])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_stage_duration_seconds histogram" in lines
+    assert 'test_stage_duration_seconds_bucket{stage="fetch",le="0.001"} 0' in lines
+    assert 'test_stage_duration_seconds_bucket{stage="fetch",le="0.0025"} 1' in lines
+    assert 'test_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 1' in lines
+    assert 'test_stage_duration_seconds_count{stage="fetch"} 1' in lines
+    assert 'test_neo4j_rows_total{query="training_data"} 15' in lines
+    assert 'test_in_flight{operation="analyze"} 0' in lines
+    assert 'test_operation_duration_seconds_count{operation="analyze"} 1' in lines
+    assert 'test_cache_entries{cache="score\\"s"} 3' in lines
+    assert lines.count("# TYPE test_stage_duration_seconds_window summary") == 1
@@ -0,0 +1,106 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from backend.gnn_scorer import GNNScorer, build_scorer_state
+from backend.graph_builder import build_graph_arrays
+from backend.model_store import ModelStore
+
+torch = pytest.importorskip("torch")
+
+
+def scorer_state():
+    entity = {
+        "ids": np.array(["A", "B"]),
+        "projection": np.zeros((2, 4), dtype=np.float32),
+        "neighbour_sum": np.zeros((2, 4), dtype=np.float32),
+        "degree": np.ones(2, dtype=np.float32),
+    }
+    return {
+        "weights": {"classifier_weight": np.zeros((2, 4), dtype=np.float32)},
+        "customer": entity,
+        "merchant": dict(entity),
+        "transaction_ids": np.array(["T1"]),
+        "feature_stats": {},
+    }
+
+
+def test_export_runs_before_version_is_published(tmp_path):
+    store = ModelStore(tmp_path)
+    seen = {}
+
+    def export(directory, version):
+        seen["latest"] = store.latest_version()
+        seen["published"] = store.version_path(version).exists()
+        (directory / "head_fp32.pt").write_bytes(b"head")
+
+    version = store.save(torch.nn.Linear(4, 2), {"num_features": 4}, scorer_state(), export=export)
+
+    assert seen == {"latest": None, "published": False}
+    assert store.latest_version() == version
+    assert store.head_path(version).read_bytes() == b"head"
+    assert store.load_scorer_state(version)["customer"]["ids"].tolist() == ["A", "B"]
+
+
+def _save_worker(path):
+    return ModelStore(path, keep=100).save(torch.nn.Linear(4, 2), {"num_features": 4}, scorer_state())
+
+
+def test_concurrent_saves_from_processes(tmp_path):
+    # Training jobs run in spawned processes and may finish at the same time
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        versions = pool.map(_save_worker, [str(tmp_path)] * 8)
+
+    assert sorted(versions) == [f"v{i:06d}" for i in range(1, 9)]
+    store = ModelStore(tmp_path)
+    assert store.versions() == sorted(versions)
+    for version in versions:
+        assert store.load_metadata(version)["version"] == version
+
+
+def trained_scorer_state(hidden=8):
+    columns = {
+        "transaction_id": np.array(["T1", "T2", "T3"], dtype=object),
+        "customer_id": np.array(["C1", "C1", "C2"], dtype=object),
+        "merchant_id": np.array(["M1", "M2", "M1"], dtype=object),
+        "amount": np.array([10.0, 250.0, 40.0]),
+        "timestamp": np.array([1.7e9, 1.7e9 + 3600, 1.7e9 + 7200]),
+    }
+    arrays = build_graph_arrays(columns)
+    rng = np.random.default_rng(0)
+    num_features = arrays["x"].shape[1]
+    weights = {
+        "conv1_weight": rng.normal(size=(hidden, num_features)).astype(np.float32),
+        "conv1_bias": rng.normal(size=hidden).astype(np.float32),
+        "conv2_weight": rng.normal(size=(hidden, hidden)).astype(np.float32),
+        "conv2_bias": rng.normal(size=hidden).astype(np.float32),
+        "classifier_weight": rng.normal(size=(2, hidden)).astype(np.float32),
+        "classifier_bias": rng.normal(size=2).astype(np.float32),
+    }
+    return build_scorer_state(
+        weights, arrays["x"], arrays["edge_index"],
+        {"customer": arrays["customer_ids"], "merchant": arrays["merchant_ids"]},
+        {"customer": arrays["customer_nodes"], "merchant": arrays["merchant_nodes"]},
+        arrays["transaction_ids"], arrays["feature_stats"]
+    )
+
+
+@pytest.mark.parametrize("quantized, tolerance", [(False, 1e-5), (True, 0.05)])
+def test_exported_heads_match_numpy_scorer(tmp_path, quantized, tolerance):
+    from backend.model_export import export_scoring_heads
+
+    state = trained_scorer_state()
+    store = ModelStore(tmp_path)
+    version = store.save(
+        torch.nn.Linear(4, 2), {"num_features": 4}, state,
+        export=lambda directory, version: export_scoring_heads(state["weights"], directory)
+    )
+
+    loaded = store.load_scorer_state(version)
+    numpy_scorer, head_scorer = GNNScorer(), GNNScorer()
+    numpy_scorer.load_state(loaded)
+    head_scorer.load_state(loaded, head=torch.jit.load(str(store.head_path(version, quantized=quantized))))
+
+    batch = (["T1", None, None], ["C1", "C2", "C9"], ["M1", "M1", "M9"], [10.0, 75.0, 5000.0], [1.7e9] * 3)
+    assert np.allclose(head_scorer.score_batch(*batch), numpy_scorer.score_batch(*batch), atol=tolerance)
@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from backend.rule_engine import DEFAULT_RULES, FEATURES, RuleEngine
+
+
+def write_rules(path, rules, max_score=1.0, mtime=None):
+    path.write_text(json.dumps({"max_score": max_score, "rules": rules}))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def batch(**columns):
+    n = len(next(iter(columns.values())))
+    return {name: columns.get(name, np.zeros(n)) for name in FEATURES}
+
+
+def test_default_rules_match_original_heuristic():
+    engine = RuleEngine()
+    scores = engine.score_batch(batch(
+        amount=[50.0, 20000.0, 20000.0],
+        related_count=[0, 0, 11],
+        similar_fraud_patterns=[0, 1, 3],
+    ))
+    np.testing.assert_allclose(scores, [0.0, 0.4, 0.8])
+    assert engine.stats()["rules"] == [rule["name"] for rule in DEFAULT_RULES["rules"]]
+
+
+def test_operators_and_cap(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [
+        {"name": "mid", "feature": "amount", "op": "between", "value": [10, 20], "weight": 0.1},
+        {"name": "risky", "feature": "customer_risk_score", "op": "in", "value": [0.9], "weight": 0.2},
+        {"name": "ratio", "feature": "amount_to_customer_mean", "op": "scale", "weight": 0.5, "cap": 0.3},
+    ], max_score=0.5)
+    engine = RuleEngine(config_path=str(path))
+    scores = engine.score_batch(batch(
+        amount=[15.0, 100.0, 15.0],
+        customer_risk_score=[0.0, 0.9, 0.9],
+        amount_to_customer_mean=[0.2, 0.0, 10.0],
+    ))
+    np.testing.assert_allclose(scores, [0.2, 0.2, 0.5])
+    assert engine.stats()["fired"] == {"mid": 2, "risky": 2, "ratio": 2}
+
+
+def test_unknown_feature_rejected_at_startup(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"name": "typo", "feature": "ammount", "op": ">", "value": 1, "weight": 0.1}])
+    with pytest.raises(ValueError, match="ammount"):
+        RuleEngine(config_path=str(path))
+
+
+def test_reload_keeps_rules_when_feature_is_unknown(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"name": "big", "feature": "amount", "op": ">", "value": 100, "weight": 0.5}], mtime=1000)
+    engine = RuleEngine(config_path=str(path), reload_interval=0)
+
+    write_rules(path, [{"name": "typo", "feature": "ammount", "op": ">", "value": 1, "weight": 0.1}], mtime=2000)
+    assert not engine.reload_if_changed()
+    np.testing.assert_allclose(engine.score_batch(batch(amount=[50.0, 500.0])), [0.0, 0.5])
+    assert engine.features == ["amount"]
+
+    write_rules(path, [{"name": "risky", "feature": "merchant_risk_score", "op": ">=", "value": 0.5, "weight": 0.4}], mtime=3000)
+    assert engine.reload_if_changed()
+    assert engine.features == ["merchant_risk_score"]
+    np.testing.assert_allclose(engine.score_batch(batch(merchant_risk_score=[0.1, 0.7])), [0.0, 0.4])
+
+
+def test_reload_retries_a_file_that_failed_to_load(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"name": "big", "feature": "amount", "op": ">", "value": 100, "weight": 0.5}], mtime=1000)
+    engine = RuleEngine(config_path=str(path), reload_interval=0)
+
+    path.write_text("{not json")
+    os.utime(path, (2000, 2000))
+    assert not engine.reload_if_changed()
+
+    # Fixed within the same mtime tick, e.g. on a filesystem with coarse timestamps
+    write_rules(path, [{"name": "big", "feature": "amount", "op": ">", "value": 100, "weight": 0.3}], mtime=2000)
+    assert engine.reload_if_changed()
+    np.testing.assert_allclose(engine.score_batch(batch(amount=[50.0, 500.0])), [0.0, 0.3])
+
+
+def test_unknown_operator_rejected(tmp_path):
+    path = tmp_path / "rules.json"
+    write_rules(path, [{"name": "odd", "feature": "amount", "op": "~", "value": 1}])
+    with pytest.raises(ValueError, match="Unknown operator"):
+        RuleEngine(config_path=str(path))
@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+from backend.score_cache import ScoreCache
+
+
+def test_is_current_tracks_writes_since_generation():
+    cache = ScoreCache()
+    generation = cache.generation
+    assert cache.is_current("C1", "M1", generation)
+
+    cache.on_transaction_created(SimpleNamespace(customer_id="C2", merchant_id="M1"))
+    assert not cache.is_current("C1", "M1", generation)
+    assert cache.is_current("C1", "M2", generation)
+    assert cache.is_current("C1", "M1", cache.generation)
+
+
+def test_get_put_and_neighbourhood_invalidation():
+    cache = ScoreCache()
+    cache.put("T1", 0.9, "C1", "M1", cache.generation)
+    cache.put("T2", 0.1, "C2", "M2", cache.generation)
+    assert cache.get("T1") == 0.9
+    assert cache.get("missing") is None
+
+    cache.invalidate_neighbourhood(merchant_id="M1")
+    assert cache.get("T1") is None
+    assert cache.get("T2") == 0.1
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 2, "hit_rate": 0.5, "invalidations": 1}
+
+
+def test_score_computed_before_a_write_is_not_served():
+    cache = ScoreCache()
+    generation = cache.generation
+    cache.invalidate_neighbourhood("C1", "M1")
+    # A write raced with the computation, so the result is stored but never served
+    cache.put("T1", 0.5, "C1", "M1", generation)
+    assert cache.get("T1") is None
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("backend.score_cache.time.monotonic", lambda: now[0])
+    cache = ScoreCache(max_entries=2, ttl_seconds=10)
+    cache.put("T1", 0.1, "C1", "M1", 0)
+    cache.put("T2", 0.2, "C2", "M2", 0)
+    assert cache.get("T1") == 0.1
+    cache.put("T3", 0.3, "C3", "M3", 0)
+    assert cache.get("T2") is None
+    assert cache.get("T1") == 0.1
+
+    now[0] += 11
+    assert cache.get("T3") is None
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,49 @@
+import os
+import time
+
+from backend.training_jobs import TrainingJobManager
+
+
+def fake_training(options, events, cancel_event):
+    events.put({"type": "started", "time": time.time()})
+    if options.get("crash"):
+        # Dies the way an OOM-killed or segfaulted torch worker does
+        os._exit(1)
+    return {"status": "success", "epochs": options.get("epochs", 1)}
+
+
+def wait_until_finished(manager, job, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not (job.finished and job.drained):
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.05)
+
+
+def test_job_succeeds_and_reports_result():
+    results = []
+    manager = TrainingJobManager(target=fake_training, on_success=results.append)
+    try:
+        job = manager.submit({"epochs": 3})
+        wait_until_finished(manager, job)
+        assert job.status == "succeeded"
+        assert job.result == {"status": "success", "epochs": 3}
+        assert results == [job.result]
+        assert job.started_at is not None
+    finally:
+        manager.shutdown()
+
+
+def test_pool_recovers_after_worker_dies():
+    manager = TrainingJobManager(target=fake_training)
+    try:
+        crashed = manager.submit({"crash": True})
+        wait_until_finished(manager, crashed)
+        assert crashed.status == "failed"
+        assert "died" in crashed.error
+
+        job = manager.submit({"epochs": 2})
+        wait_until_finished(manager, job)
+        assert job.status == "succeeded"
+        assert manager.stats() == {"failed": 1, "succeeded": 1}
+    finally:
+        manager.shutdown()
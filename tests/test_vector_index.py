@@ -0,0 +1,128 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain")
+
+from backend.vector_index import MmapVectorIndex
+
+
+class FakeEmbeddings:
+    """Deterministic embeddings: each text maps to a fixed random unit vector."""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+
+    def _vector(self, text):
+        return np.random.default_rng(abs(hash(text)) % (2 ** 32)).normal(size=self.dim)
+
+    def embed_documents(self, texts):
+        return np.stack([self._vector(text) for text in texts])
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def random_vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_exact_search_finds_each_vector(tmp_path):
+    index = MmapVectorIndex(tmp_path, FakeEmbeddings())
+    vectors = random_vectors(50)
+    ids = index.add_vectors(vectors, [f"doc {i}" for i in range(50)], [{"i": i} for i in range(50)])
+    assert ids == list(range(50))
+
+    scores, found = index.search(vectors[[3, 17]], k=2)
+    assert found[:, 0].tolist() == [3, 17]
+    assert np.all(scores[:, 0] >= scores[:, 1])
+    assert [doc.metadata["i"] for doc in index.get_documents(found[:, 0])] == [3, 17]
+
+
+def test_reopen_and_append(tmp_path):
+    index = MmapVectorIndex(tmp_path, FakeEmbeddings())
+    index.add_vectors(random_vectors(10, seed=1), [f"a{i}" for i in range(10)])
+
+    reopened = MmapVectorIndex(tmp_path, FakeEmbeddings())
+    reopened.add_vectors(random_vectors(5, seed=2), [f"b{i}" for i in range(5)])
+    assert reopened.count == 15
+    assert reopened.get_documents([12])[0].page_content == "b2"
+
+
+def test_append_after_crashed_append_stays_aligned(tmp_path):
+    index = MmapVectorIndex(tmp_path, FakeEmbeddings())
+    index.add_vectors(random_vectors(10, seed=1), [f"a{i}" for i in range(10)])
+
+    # An append that wrote its rows but died before committing the manifest
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(random_vectors(3, seed=9).tobytes())
+    with open(tmp_path / "documents.jsonl", "ab") as f:
+        f.write(b'{"page_content": "lost", "metadata": {}}\n')
+    with open(tmp_path / "offsets.u64", "ab") as f:
+        f.write(np.array([999], dtype=np.uint64).tobytes())
+
+    index = MmapVectorIndex(tmp_path, FakeEmbeddings())
+    vectors = random_vectors(4, seed=2)
+    assert index.add_vectors(vectors, [f"b{i}" for i in range(4)]) == [10, 11, 12, 13]
+
+    _, found = index.search(vectors, k=1)
+    assert found[:, 0].tolist() == [10, 11, 12, 13]
+    assert [doc.page_content for doc in index.get_documents(found[:, 0])] == ["b0", "b1", "b2", "b3"]
+    assert (tmp_path / "vectors.f32").stat().st_size == 14 * 8 * 4
+
+
+def test_ivf_search_after_threshold(tmp_path):
+    index = MmapVectorIndex(tmp_path, FakeEmbeddings(), ivf_threshold=200, nlist=8, nprobe=8)
+    vectors = random_vectors(300, seed=3)
+    index.add_vectors(vectors, [str(i) for i in range(300)])
+    assert index._state[4] is not None
+
+    # Probing every list makes IVF search exact
+    _, found = index.search(vectors[:20], k=1)
+    assert found[:, 0].tolist() == list(range(20))
+
+    more = random_vectors(10, seed=4)
+    index.add_vectors(more, [f"m{i}" for i in range(10)])
+    _, found = index.search(more, k=1)
+    assert found[:, 0].tolist() == list(range(300, 310))
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    # Switch threads as often as possible so readers land between writer statements
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_search_during_concurrent_appends(tmp_path, frequent_thread_switches):
+    index = MmapVectorIndex(tmp_path, FakeEmbeddings(), ivf_threshold=100, nlist=4, nprobe=2, scan_chunk_size=32)
+    index.add_vectors(random_vectors(50, seed=5), [str(i) for i in range(50)])
+    errors = []
+    done = threading.Event()
+
+    def search():
+        queries = random_vectors(4, seed=6)
+        while not done.is_set():
+            try:
+                scores, ids = index.search(queries, k=3)
+                assert ids.shape == (4, 3) and (ids < index.count).all()
+                index.get_documents(ids[0])
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Crosses the IVF threshold, so readers see the index switch from exact to IVF
+    for batch in range(20):
+        index.add_vectors(random_vectors(10, seed=100 + batch), [f"{batch}-{i}" for i in range(10)])
+    done.set()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert index.count == 250